@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+
+import deadline
+from metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS, CHAT_TURNS_IN_FLIGHT
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"chat is overloaded: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionOptions:
+    max_concurrent: int = 0
+    max_per_room: int = 0
+    max_queue: int = 64
+    max_wait_seconds: float = 10.0
+
+
+class AdmissionController:
+    # Caps how many chat turns run at once, overall and per room. Turns over
+    # the cap wait in a bounded FIFO queue; a waiter held back only by its
+    # room's cap does not block waiters for other rooms. When the queue is
+    # full, or a turn waits longer than max_wait_seconds, it is shed.
+    def __init__(self, options: AdmissionOptions) -> None:
+        self.options = options
+        self.running = 0
+        self.per_room: dict[str, int] = {}
+        self._waiters: deque[tuple[str, asyncio.Future]] = deque()
+        self._turn_seconds = 1.0
+
+    def _has_capacity(self, room_id: str) -> bool:
+        if self.options.max_concurrent and self.running >= self.options.max_concurrent:
+            return False
+        return not self.options.max_per_room or self.per_room.get(room_id, 0) < self.options.max_per_room
+
+    def _admit(self, room_id: str) -> None:
+        self.running += 1
+        self.per_room[room_id] = self.per_room.get(room_id, 0) + 1
+        CHAT_TURNS_IN_FLIGHT.inc()
+
+    def _release(self, room_id: str, seconds: float | None = None) -> None:
+        self.running -= 1
+        left = self.per_room[room_id] - 1
+        if left:
+            self.per_room[room_id] = left
+        else:
+            del self.per_room[room_id]
+        CHAT_TURNS_IN_FLIGHT.dec()
+        if seconds is not None:
+            # Moving average of turn duration, used to estimate Retry-After.
+            self._turn_seconds += 0.2 * (seconds - self._turn_seconds)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for waiter in list(self._waiters):
+            room_id, future = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+                continue
+            if self.options.max_concurrent and self.running >= self.options.max_concurrent:
+                return
+            if self._has_capacity(room_id):
+                self._waiters.remove(waiter)
+                self._admit(room_id)
+                future.set_result(None)
+
+    def retry_after(self) -> float:
+        slots = self.options.max_concurrent or 1
+        return max(1.0, self._turn_seconds * (len(self._waiters) / slots + 1))
+
+    @asynccontextmanager
+    async def slot(self, room_id: str, shed: bool = True):
+        # shed=False waits as long as it takes; background jobs already sit in
+        # a durable queue, so failing them here would only lose work.
+        if self._has_capacity(room_id):
+            self._admit(room_id)
+        else:
+            max_wait = None
+            if shed:
+                if len(self._waiters) >= self.options.max_queue:
+                    ADMISSION_REJECTIONS.labels("queue_full").inc()
+                    raise Overloaded("queue full", self.retry_after())
+                max_wait = self.options.max_wait_seconds
+                left = deadline.remaining()
+                if left is not None and left < max_wait:
+                    max_wait = max(0.0, left)
+            waiter = (room_id, asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            ADMISSION_QUEUE_DEPTH.inc()
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(waiter[1], max_wait)
+            except asyncio.TimeoutError:
+                ADMISSION_REJECTIONS.labels("timeout").inc()
+                raise Overloaded("queue timeout", self.retry_after()) from None
+            except BaseException:
+                # Cancelled just after being admitted: hand the slot on.
+                if waiter[1].done() and not waiter[1].cancelled():
+                    self._release(room_id)
+                raise
+            finally:
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+                ADMISSION_QUEUE_DEPTH.dec()
+                ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started)
+        admitted = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(room_id, time.monotonic() - admitted)
+
+
+_controller = AdmissionController(AdmissionOptions())
+
+
+def configure(settings) -> None:
+    global _controller
+    _controller = AdmissionController(
+        AdmissionOptions(
+            max_concurrent=settings.chat_max_concurrent_turns,
+            max_per_room=settings.chat_max_turns_per_room,
+            max_queue=settings.chat_admission_max_queue,
+            max_wait_seconds=settings.chat_admission_max_wait_seconds,
+        )
+    )
+
+
+def slot(room_id: str, shed: bool = True):
+    return _controller.slot(room_id, shed)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any
+
+import httpx
+import jwt
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+logger = logging.getLogger(__name__)
+
+
+def _max_age(cache_control: str | None, default: int) -> int:
+    match = MAX_AGE_PATTERN.search(cache_control or "")
+    return int(match.group(1)) if match else default
+
+
+# Remote JWKS kept in memory for as long as the publisher's Cache-Control
+# max-age allows. Once expired, the cached keys keep answering while a
+# background task refetches; if that refetch fails the stale set stays in use.
+# Only a kid that is not cached at all waits on the network.
+class JWKSCache:
+    def __init__(self, url: str, default_max_age: int = 3600, timeout: float = 10.0) -> None:
+        self.url = url
+        self.default_max_age = default_max_age
+        self.timeout = timeout
+        self._keys: dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._refresh_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self) -> None:
+        async with self._lock:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.get(self.url)
+            response.raise_for_status()
+            keys = {}
+            for key_data in response.json().get("keys", []):
+                try:
+                    keys[key_data.get("kid")] = jwt.PyJWK(key_data).key
+                except jwt.PyJWTError:
+                    continue
+            self._keys = keys
+            self._expires_at = time.monotonic() + _max_age(
+                response.headers.get("cache-control"), self.default_max_age
+            )
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self._fetch()
+        except Exception:
+            # The stale keys keep answering; the next expired hit retries.
+            logger.exception("background refresh of %s failed", self.url)
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def get_key(self, kid: str | None) -> Any:
+        if kid in self._keys:
+            if time.monotonic() >= self._expires_at:
+                self._schedule_refresh()
+            return self._keys[kid]
+        try:
+            await self._fetch()
+        except httpx.HTTPError:
+            if not self._keys:
+                raise
+        if kid not in self._keys:
+            raise KeyError(f"unknown key id: {kid}")
+        return self._keys[kid]
@@ -5,8 +5,17 @@ from typing import Any
 
 import jwt
 
+from auth.keys import SigningKeyStore
 
-def issue_jwt(secret: str, issuer: str, ttl_seconds: int, subject: str) -> tuple[str, int]:
+
+# Reading chat history needs a signed-in admin's consent (authorization_code),
+# never just a self-registered client's secret.
+CHAT_READ_SCOPE = "chat:read"
+
+
+def issue_jwt(
+    keys: SigningKeyStore, issuer: str, ttl_seconds: int, subject: str, scope: str | None = None
+) -> tuple[str, int]:
     now = int(time.time())
     exp = now + ttl_seconds
     payload = {
@@ -15,9 +24,23 @@ def issue_jwt(secret: str, issuer: str, ttl_seconds: int, subject: str) -> tuple
         "iat": now,
         "exp": exp,
     }
-    token = jwt.encode(payload, secret, algorithm="HS256")
+    if scope:
+        payload["scope"] = scope
+    key = keys.active_key()
+    headers = {"kid": key.kid} if key.kid else None
+    token = jwt.encode(payload, key.private_key, algorithm=key.algorithm, headers=headers)
     return token, exp
 
 
-def verify_jwt(token: str, secret: str, issuer: str) -> dict[str, Any]:
-    return jwt.decode(token, secret, algorithms=["HS256"], issuer=issuer)
+def has_scope(claims: dict[str, Any], scope: str) -> bool:
+    return scope in (claims.get("scope") or "").split()
+
+
+def verify_jwt(token: str, keys: SigningKeyStore, issuer: str) -> dict[str, Any]:
+    kid = jwt.get_unverified_header(token).get("kid")
+    return jwt.decode(
+        token,
+        keys.verification_key(kid),
+        algorithms=[keys.algorithm],
+        issuer=issuer,
+    )
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+import sqlite3
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jwt.algorithms import ECAlgorithm
+
+SUPPORTED_ALGORITHMS = {"ES256", "HS256"}
+# How long a process trusts its in-memory key set before re-reading the table,
+# which bounds how long it can keep signing with a key another process retired.
+KEY_RELOAD_SECONDS = 60
+# A token with an unknown kid triggers a reload at most this often, so random
+# kids cannot make every request re-read and re-parse the key table.
+KEY_MISS_RELOAD_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str | None
+    algorithm: str
+    private_key: Any
+    public_key: Any
+    public_jwk: dict | None
+    created_at: int
+
+
+def _generate_key(algorithm: str) -> tuple[str, str, dict]:
+    kid = uuid.uuid4().hex
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode("utf-8")
+    public_jwk = ECAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    public_jwk.update({"kid": kid, "use": "sig", "alg": algorithm})
+    return kid, private_pem, public_jwk
+
+
+def _row_to_key(row) -> SigningKey:
+    private_key = serialization.load_pem_private_key(
+        row["private_key_pem"].encode("utf-8"), password=None
+    )
+    return SigningKey(
+        kid=row["kid"],
+        algorithm=row["algorithm"],
+        private_key=private_key,
+        public_key=private_key.public_key(),
+        public_jwk=json.loads(row["public_jwk_json"]),
+        created_at=row["created_at"],
+    )
+
+
+# The newest unretired key signs new tokens. Superseded keys stay published in
+# the JWKS for retention_seconds so tokens they signed verify until they expire.
+# HS256 keeps the legacy shared-secret behaviour and publishes no keys.
+class SigningKeyStore:
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        algorithm: str,
+        rotation_seconds: int,
+        retention_seconds: int,
+        secret: str = "",
+    ) -> None:
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            raise ValueError(f"unsupported jwt algorithm: {algorithm}")
+        self.conn = conn
+        self.algorithm = algorithm
+        self.rotation_seconds = rotation_seconds
+        self.retention_seconds = retention_seconds
+        self._secret = secret
+        self._keys: dict[str, SigningKey] = {}
+        self._active: SigningKey | None = None
+        self._loaded_at = 0
+        if self.is_symmetric:
+            self._active = SigningKey(None, algorithm, secret, secret, None, 0)
+        else:
+            self._load()
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm.startswith("HS")
+
+    @property
+    def _publish_seconds(self) -> int:
+        return self.retention_seconds + KEY_RELOAD_SECONDS
+
+    def _load(self) -> None:
+        now = int(time.time())
+        cutoff = now - self._publish_seconds
+        rows = self.conn.execute(
+            """
+            SELECT kid, algorithm, private_key_pem, public_jwk_json, created_at, retired_at
+            FROM jwt_signing_keys
+            WHERE algorithm = ? AND (retired_at IS NULL OR retired_at > ?)
+            ORDER BY created_at DESC
+            """,
+            (self.algorithm, cutoff),
+        ).fetchall()
+        # Keys already parsed are reused; only new rows are deserialized.
+        self._keys = {row["kid"]: self._keys.get(row["kid"]) or _row_to_key(row) for row in rows}
+        active_rows = [row for row in rows if row["retired_at"] is None]
+        self._active = self._keys[active_rows[0]["kid"]] if active_rows else None
+        self._loaded_at = now
+
+    def rotate(self) -> SigningKey:
+        now = int(time.time())
+        kid, private_pem, public_jwk = _generate_key(self.algorithm)
+        self.conn.execute(
+            "UPDATE jwt_signing_keys SET retired_at = ? WHERE algorithm = ? AND retired_at IS NULL",
+            (now, self.algorithm),
+        )
+        self.conn.execute(
+            """
+            INSERT INTO jwt_signing_keys (
+                kid,
+                algorithm,
+                private_key_pem,
+                public_jwk_json,
+                created_at,
+                retired_at
+            ) VALUES (?, ?, ?, ?, ?, NULL)
+            """,
+            (kid, self.algorithm, private_pem, json.dumps(public_jwk), now),
+        )
+        self.conn.execute(
+            "DELETE FROM jwt_signing_keys WHERE retired_at IS NOT NULL AND retired_at <= ?",
+            (now - self._publish_seconds,),
+        )
+        self.conn.commit()
+        self._load()
+        return self._active
+
+    def active_key(self) -> SigningKey:
+        if self.is_symmetric:
+            return self._active
+        now = int(time.time())
+        if now - self._loaded_at >= KEY_RELOAD_SECONDS or self._needs_rotation(now):
+            # Another process may already have rotated; only generate a key if
+            # the shared table still has nothing current.
+            self._load()
+        if self._needs_rotation(now):
+            self.rotate()
+        return self._active
+
+    def _needs_rotation(self, now: int) -> bool:
+        return self._active is None or now - self._active.created_at >= self.rotation_seconds
+
+    def verification_key(self, kid: str | None) -> Any:
+        if self.is_symmetric:
+            return self._secret
+        if not kid:
+            raise KeyError("token has no kid")
+        if kid not in self._keys and int(time.time()) - self._loaded_at >= KEY_MISS_RELOAD_SECONDS:
+            self._load()
+        return self._keys[kid].public_key
+
+    def jwks(self) -> dict:
+        if self.is_symmetric:
+            return {"keys": []}
+        # active_key() reloads once the set is KEY_RELOAD_SECONDS old.
+        self.active_key()
+        return {"keys": [key.public_jwk for key in self._keys.values()]}
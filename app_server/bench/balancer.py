@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+
+
+# Connection-level round robin: every new TCP connection goes to the next
+# backend and stays there. Clients that keep connections alive stick to one
+# replica, so spreading load needs several clients.
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int, backends: list[tuple[str, int]]) -> None:
+    targets = itertools.cycle(backends)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        backend_host, backend_port = next(targets)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(backend_host, backend_port)
+        except OSError:
+            writer.close()
+            return
+        await asyncio.gather(_pipe(reader, upstream_writer), _pipe(upstream_reader, writer))
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def _backend(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Round-robin TCP load balancer for local benchmarks.")
+    parser.add_argument("backends", nargs="+", type=_backend, help="host:port of each replica")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.backends))
+
+
+if __name__ == "__main__":
+    main()
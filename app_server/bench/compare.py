@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+# (label, path into a scenario result, True when higher is better)
+METRICS = [
+    ("throughput req/s", ("throughput_rps",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+    ("error rate", ("error_rate",), False),
+]
+PROCESS_METRICS = [("rss peak MB", "rss_peak_mb"), ("cpu s", "cpu_seconds")]
+
+
+def _load(path: Path) -> dict[str, dict]:
+    report = json.loads(path.read_text())
+    return {result["scenario"]: result for result in report["results"]}
+
+
+def _lookup(result: dict, keys: tuple[str, ...]) -> float:
+    value = result
+    for key in keys:
+        value = value[key]
+    return float(value)
+
+
+def _change(old: float, new: float) -> float:
+    if old == 0:
+        return 0.0 if new == 0 else float("inf")
+    return (new - old) / old
+
+
+def compare(baseline: dict[str, dict], candidate: dict[str, dict], threshold: float) -> list[str]:
+    regressions = []
+    for scenario in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[scenario], candidate[scenario]
+        print(f"\n{scenario}")
+        rows = [(label, _lookup(old, keys), _lookup(new, keys), higher_is_better) for label, keys, higher_is_better in METRICS]
+        for process in sorted(old["processes"].keys() & new["processes"].keys()):
+            for label, key in PROCESS_METRICS:
+                rows.append((f"{process} {label}", old["processes"][process][key], new["processes"][process][key], False))
+        for label, before, after, higher_is_better in rows:
+            change = _change(before, after)
+            worse = -change if higher_is_better else change
+            flag = ""
+            # The fake upstream is not the system under test.
+            if worse > threshold and not label.startswith("upstream"):
+                flag = "  REGRESSION"
+                regressions.append(f"{scenario}: {label}")
+            print(f"  {label:<28} {before:>12.2f} {after:>12.2f} {change:>+9.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+    regressions = compare(_load(args.baseline), _load(args.candidate), args.threshold)
+    if regressions:
+        raise SystemExit(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
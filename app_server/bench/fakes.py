@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode, urlsplit
+
+from common.capture import decode_body, scrub_query
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+
+@dataclass(frozen=True)
+class UpstreamProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+@dataclass(frozen=True)
+class Profile:
+    calendar: UpstreamProfile = field(default_factory=UpstreamProfile)
+    oauth: UpstreamProfile = field(default_factory=UpstreamProfile)
+    gemini: UpstreamProfile = field(default_factory=UpstreamProfile)
+    events_per_page: int = 10
+    description_bytes: int = 200
+    reply_chars: int = 200
+    token_expires_in: int = 3600
+
+
+_REALISTIC = Profile(
+    calendar=UpstreamProfile(latency_ms=120, jitter_ms=40),
+    oauth=UpstreamProfile(latency_ms=80, jitter_ms=20),
+    gemini=UpstreamProfile(latency_ms=900, jitter_ms=300),
+)
+
+PROFILES = {
+    "instant": Profile(),
+    "realistic": _REALISTIC,
+    "flaky": replace(
+        _REALISTIC,
+        calendar=replace(_REALISTIC.calendar, error_rate=0.05),
+        gemini=replace(_REALISTIC.gemini, error_rate=0.05, error_status=429),
+    ),
+    "large": replace(_REALISTIC, events_per_page=250, description_bytes=4000, reply_chars=4000),
+    # expires_in below the app's 60s refresh margin forces a token refresh on every call.
+    "refresh": replace(_REALISTIC, token_expires_in=30),
+}
+
+
+def load_profile(name_or_path: str) -> Profile:
+    if name_or_path in PROFILES:
+        return PROFILES[name_or_path]
+    with open(name_or_path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    base = PROFILES[data.pop("base", "instant")]
+    upstreams = {
+        key: replace(getattr(base, key), **data.pop(key))
+        for key in ("calendar", "oauth", "gemini")
+        if key in data
+    }
+    return replace(base, **upstreams, **data)
+
+
+def profile_dict(profile: Profile) -> dict:
+    return asdict(profile)
+
+
+async def _upstream_delay(upstream: UpstreamProfile) -> Response | None:
+    delay = random.gauss(upstream.latency_ms, upstream.jitter_ms) if upstream.jitter_ms else upstream.latency_ms
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if upstream.error_rate and random.random() < upstream.error_rate:
+        return JSONResponse(
+            {"error": {"code": upstream.error_status, "message": "injected failure"}},
+            status_code=upstream.error_status,
+        )
+    return None
+
+
+def _event(profile: Profile, index: int, start: datetime) -> dict:
+    begin = start + timedelta(hours=index)
+    return {
+        "kind": "calendar#event",
+        "id": uuid.uuid4().hex,
+        "status": "confirmed",
+        "summary": f"Event {index + 1}",
+        "description": "x" * profile.description_bytes,
+        "location": "Room A",
+        "start": {"dateTime": begin.isoformat()},
+        "end": {"dateTime": (begin + timedelta(minutes=30)).isoformat()},
+        "htmlLink": f"https://calendar.example/event/{index}",
+    }
+
+
+def _function_call(prompt: str) -> dict | None:
+    # A prompt naming a tool ("gcal.list_events ...") gets that tool called;
+    # anything else is answered with text only.
+    for word in prompt.split():
+        if word.startswith("gcal."):
+            args = {"calendar_id": "primary"}
+            if word == "gcal.availability":
+                now = datetime.now(timezone.utc)
+                args.update(time_min=now.isoformat(), time_max=(now + timedelta(days=1)).isoformat())
+            return {"functionCall": {"name": word, "args": args}}
+    return None
+
+
+def _request_key(method: str, path: str, query: str, body) -> tuple[str, str, str, str]:
+    digest = hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return method, path, query, digest
+
+
+def _encode_body(body, content_type: str) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, str):
+        return body
+    if "json" in content_type:
+        return json.dumps(body, ensure_ascii=False)
+    if "x-www-form-urlencoded" in content_type:
+        return urlencode(body)
+    # Truncated capture: only the leading text survived.
+    return body.get("text", "")
+
+
+class UpstreamRecording:
+    # Serves the app server's captured Google/Gemini exchanges. A request matching
+    # a recorded one exactly (method, path, query and scrubbed body) gets that
+    # response; otherwise recordings for the same method and path are cycled.
+    def __init__(self, records: list[dict], speed: float = 1.0) -> None:
+        self.speed = speed
+        self.exact: dict[tuple, deque] = defaultdict(deque)
+        self.by_path: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self.cursor: dict[tuple[str, str], int] = defaultdict(int)
+        for record in records:
+            if record.get("kind") != "upstream" or record.get("service") != "app-server":
+                continue
+            request = record["request"]
+            path = urlsplit(request["url"]).path
+            self.exact[_request_key(request["method"], path, request["query"], request["body"])].append(record)
+            self.by_path[(request["method"], path)].append(record)
+
+    @classmethod
+    def load(cls, path: str, speed: float = 1.0) -> UpstreamRecording:
+        with open(path, encoding="utf-8") as handle:
+            return cls([json.loads(line) for line in handle if line.strip()], speed)
+
+    def match(self, method: str, path: str, query: str, body) -> dict | None:
+        exact = self.exact.get(_request_key(method, path, query, body))
+        if exact:
+            exact.rotate(-1)
+            return exact[-1]
+        records = self.by_path.get((method, path))
+        if not records:
+            return None
+        index = self.cursor[(method, path)]
+        self.cursor[(method, path)] = index + 1
+        return records[index % len(records)]
+
+    async def respond(self, record: dict) -> Response:
+        await asyncio.sleep(record["duration_ms"] / 1000 / self.speed)
+        response = record["response"]
+        content_type = response["headers"].get("content-type", "application/json")
+        return Response(
+            _encode_body(response["body"], content_type),
+            status_code=response["status"],
+            media_type=content_type,
+        )
+
+
+def create_app(profile: Profile, recording: UpstreamRecording | None = None) -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+
+    if recording is not None:
+
+        @app.middleware("http")
+        async def replay_recorded(request: Request, call_next):
+            body = decode_body(await request.body(), request.headers.get("content-type", ""))
+            record = recording.match(request.method, request.url.path, scrub_query(request.url.query), body)
+            if record is None:
+                return await call_next(request)
+            return await recording.respond(record)
+
+    @app.post("/token")
+    async def token():
+        if failure := await _upstream_delay(profile.oauth):
+            return failure
+        return {
+            "access_token": f"fake-{uuid.uuid4().hex}",
+            "expires_in": profile.token_expires_in,
+            "token_type": "Bearer",
+        }
+
+    @app.get("/calendar/v3/users/me/calendarList")
+    async def calendar_list():
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        return {
+            "kind": "calendar#calendarList",
+            "items": [
+                {"id": "primary", "summary": "Primary", "primary": True},
+                {"id": "team@example.com", "summary": "Team"},
+            ],
+        }
+
+    @app.get("/calendar/v3/calendars/{calendar_id}/events")
+    async def list_events(calendar_id: str, maxResults: int | None = None):
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        count = min(maxResults or profile.events_per_page, profile.events_per_page)
+        return {"kind": "calendar#events", "items": [_event(profile, i, start) for i in range(count)]}
+
+    @app.get("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+    async def get_event(calendar_id: str, event_id: str):
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        return {**_event(profile, 0, datetime.now(timezone.utc)), "id": event_id}
+
+    @app.post("/calendar/v3/calendars/{calendar_id}/events")
+    async def create_event(calendar_id: str, request: Request):
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        body = await request.json()
+        return {**_event(profile, 0, datetime.now(timezone.utc)), **body}
+
+    @app.patch("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+    async def update_event(calendar_id: str, event_id: str, request: Request):
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        body = await request.json()
+        return {**_event(profile, 0, datetime.now(timezone.utc)), **body, "id": event_id}
+
+    @app.delete("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+    async def delete_event(calendar_id: str, event_id: str):
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        return Response(status_code=204)
+
+    @app.post("/calendar/v3/freeBusy")
+    async def free_busy(request: Request):
+        if failure := await _upstream_delay(profile.calendar):
+            return failure
+        body = await request.json()
+        start = datetime.fromisoformat(body["timeMin"])
+        busy = [
+            {"start": (start + timedelta(hours=i)).isoformat(), "end": (start + timedelta(hours=i, minutes=30)).isoformat()}
+            for i in range(0, profile.events_per_page * 2, 2)
+        ]
+        return {
+            "kind": "calendar#freeBusy",
+            "timeMin": body["timeMin"],
+            "timeMax": body["timeMax"],
+            "calendars": {item["id"]: {"busy": busy} for item in body.get("items", [])},
+        }
+
+    @app.post("/v1beta/models/{model}:{method}")
+    async def gemini(model: str, method: str, request: Request):
+        if failure := await _upstream_delay(profile.gemini):
+            return failure
+        body = await request.json()
+        if method == "embedContent":
+            return {"embedding": {"values": [random.random() for _ in range(64)]}}
+        contents = body.get("contents", [])
+        answered = any("functionResponse" in part for item in contents for part in item.get("parts", []))
+        prompt = " ".join(
+            part.get("text", "") for item in contents if item.get("role") == "user" for part in item.get("parts", [])
+        )
+        call = None if answered or not body.get("tools") else _function_call(prompt)
+        part = call or {"text": ("了解しました。" * profile.reply_chars)[: profile.reply_chars]}
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": len(prompt), "candidatesTokenCount": profile.reply_chars},
+            "modelVersion": model,
+            "responseId": uuid.uuid4().hex,
+            "createTime": time.time(),
+        }
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve stand-in Google Calendar, OAuth and Gemini APIs.")
+    parser.add_argument("--profile", default="instant", help=f"one of {sorted(PROFILES)} or a JSON file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--capture", help="serve recorded upstream exchanges from this capture file first")
+    parser.add_argument("--speed", type=float, default=1.0, help="divide recorded upstream latency by this factor")
+    args = parser.parse_args()
+    recording = UpstreamRecording.load(args.capture, args.speed) if args.capture else None
+    uvicorn.run(create_app(load_profile(args.profile), recording), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from fastmcp import Client
+
+from bench.fakes import load_profile, profile_dict
+from bench.run import RESULTS_DIR, _git_revision, _print_result, summarize
+from bench.scenarios import StatusError
+from bench.stack import Seed, Stack, add_room
+from db import connect
+
+DEFAULT_PATHS = ("/chat/", "/api/")
+ROOM_PATH = re.compile(r"^/chat/([^/]+)")
+CREDENTIAL_PATH = re.compile(r"^/api/(google_calendar|gemini)/([^/]+)/")
+
+
+def load_capture(paths: list[Path]) -> list[dict]:
+    records = []
+    for path in paths:
+        with path.open(encoding="utf-8") as handle:
+            records.extend(json.loads(line) for line in handle if line.strip())
+    return sorted(records, key=lambda record: record["ts"])
+
+
+@dataclass
+class Call:
+    offset: float
+    group: str
+    recorded_ms: float
+    request: dict
+    session: str = ""
+
+
+@dataclass
+class Outcome:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+
+
+def _is_tool_call(record: dict) -> bool:
+    body = record["request"].get("body")
+    return isinstance(body, dict) and body.get("method") == "tools/call"
+
+
+def select_calls(records: list[dict], services: set[str], prefixes: tuple[str, ...]) -> list[Call]:
+    inbound = [record for record in records if record["kind"] == "inbound" and record["service"] in services]
+    if not inbound:
+        return []
+    start = inbound[0]["ts"]
+    calls = []
+    for record in inbound:
+        request = record["request"]
+        if record["service"] == "mcp-server":
+            # Only tool calls are replayed; the client re-does its own handshake.
+            if not _is_tool_call(record):
+                continue
+            group = f"mcp {request['body']['params']['name']}"
+            session = request["headers"].get("mcp-session-id", "")
+        elif request["path"].startswith(prefixes):
+            group = f"{request['method']} {request.get('route') or request['path']}"
+            session = ""
+        else:
+            continue
+        calls.append(Call(record["ts"] - start, group, record["duration_ms"], request, session))
+    return calls
+
+
+class IdMap:
+    # Captured room and credential ids do not exist in the bench database: every
+    # captured room gets a fresh bench room, credentials map onto the seeded ones.
+    def __init__(self, database_path: str, seed: Seed) -> None:
+        self.database_path = database_path
+        self.seed = seed
+        self.rooms: dict[str, str] = {}
+
+    def prepare(self, calls: list[Call]) -> None:
+        conn = connect(self.database_path)
+        for call in calls:
+            match = ROOM_PATH.match(call.request.get("path", ""))
+            if match and match.group(1) not in self.rooms:
+                self.rooms[match.group(1)] = add_room(conn, f"replay {match.group(1)}")
+        conn.close()
+
+    def credential(self, provider: str) -> str:
+        return self.seed.gemini_credential_id if provider.startswith("gemini") else self.seed.calendar_credential_id
+
+    def path(self, path: str) -> str:
+        if match := ROOM_PATH.match(path):
+            return f"/chat/{self.rooms[match.group(1)]}{path[match.end():]}"
+        if match := CREDENTIAL_PATH.match(path):
+            return f"/api/{match.group(1)}/{self.credential(match.group(1))}/{path[match.end():]}"
+        return path
+
+    def tool_arguments(self, name: str, arguments: dict) -> dict:
+        if "credential_id" in arguments:
+            return {**arguments, "credential_id": self.credential(name)}
+        return arguments
+
+
+class Replayer:
+    def __init__(self, stack: Stack, seed: Seed, ids: IdMap) -> None:
+        self.ids = ids
+        self.http = httpx.AsyncClient(
+            base_url=stack.app_url,
+            timeout=120.0,
+            cookies={"admin_session": seed.session_id},
+            headers={"Authorization": f"Bearer {seed.jwt}"},
+        )
+        self.mcp_url = stack.mcp_url
+        self.jwt = seed.jwt
+        self.sessions: dict[str, asyncio.Task] = {}
+
+    async def _mcp_client(self, session: str) -> Client:
+        # One MCP session per captured session, opened on first use.
+        if session not in self.sessions:
+
+            async def open_client() -> Client:
+                client = Client(self.mcp_url, auth=self.jwt)
+                await client.__aenter__()
+                return client
+
+            self.sessions[session] = asyncio.create_task(open_client())
+        return await self.sessions[session]
+
+    async def send(self, call: Call) -> None:
+        request = call.request
+        if call.group.startswith("mcp "):
+            params = request["body"]["params"]
+            client = await self._mcp_client(call.session)
+            await client.call_tool(params["name"], self.ids.tool_arguments(params["name"], params.get("arguments") or {}))
+            return
+        content_type = request["headers"].get("content-type", "")
+        body = request.get("body")
+        kwargs = {}
+        if isinstance(body, dict) and "x-www-form-urlencoded" in content_type:
+            kwargs["data"] = body
+        elif body is not None and "json" in content_type:
+            kwargs["json"] = body
+        elif isinstance(body, str):
+            kwargs["content"] = body
+        resp = await self.http.request(
+            request["method"], self.ids.path(request["path"]), params=request["query"] or None, **kwargs
+        )
+        if resp.status_code >= 400:
+            raise StatusError(f"HTTP {resp.status_code}")
+
+    async def aclose(self) -> None:
+        for task in self.sessions.values():
+            with suppress(Exception):
+                client = await task
+                await client.__aexit__(None, None, None)
+        await self.http.aclose()
+
+
+async def replay(calls: list[Call], replayer: Replayer, speed: float) -> tuple[Outcome, float]:
+    outcome = Outcome()
+    started = time.perf_counter()
+
+    async def fire(call: Call) -> None:
+        # Open loop: each request leaves at its (scaled) captured offset, whether
+        # or not earlier ones have finished.
+        await asyncio.sleep(max(0.0, started + call.offset / speed - time.perf_counter()))
+        begin = time.perf_counter()
+        try:
+            await replayer.send(call)
+        except Exception as exc:
+            outcome.errors[call.group][str(exc) if isinstance(exc, StatusError) else type(exc).__name__] += 1
+        else:
+            outcome.latencies[call.group].append((time.perf_counter() - begin) * 1000)
+
+    await asyncio.gather(*(fire(call) for call in calls))
+    return outcome, time.perf_counter() - started
+
+
+def build_results(calls: list[Call], outcome: Outcome, elapsed: float, processes: dict) -> list[dict]:
+    recorded: dict[str, list[float]] = defaultdict(list)
+    for call in calls:
+        recorded[call.group].append(call.recorded_ms)
+    results = []
+    for group in sorted(recorded):
+        latencies, errors = outcome.latencies[group], outcome.errors[group]
+        total = len(latencies) + sum(errors.values())
+        results.append(
+            {
+                "scenario": group,
+                "duration_seconds": elapsed,
+                "requests": total,
+                "errors": dict(errors),
+                "error_rate": sum(errors.values()) / total if total else 0.0,
+                "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+                "latency_ms": summarize(latencies),
+                "recorded_latency_ms": summarize(recorded[group]),
+                "processes": {},
+            }
+        )
+    all_latencies = [value for values in outcome.latencies.values() for value in values]
+    failed = sum(sum(counter.values()) for counter in outcome.errors.values())
+    total = len(all_latencies) + failed
+    results.append(
+        {
+            "scenario": "total",
+            "duration_seconds": elapsed,
+            "requests": total,
+            "errors": {},
+            "error_rate": failed / total if total else 0.0,
+            "throughput_rps": len(all_latencies) / elapsed if elapsed else 0.0,
+            "latency_ms": summarize(all_latencies),
+            "recorded_latency_ms": summarize([call.recorded_ms for call in calls]),
+            "processes": processes,
+        }
+    )
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    records = load_capture(args.capture)
+    calls = select_calls(records, set(args.services), tuple(args.paths))
+    if not calls:
+        raise SystemExit("no replayable inbound requests in the capture")
+    stack = Stack(profile=args.profile, mcp_python=args.mcp_python)
+    upstream_capture = stack.workdir / "upstream.jsonl"
+    upstream_capture.write_text(
+        "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records if record["kind"] == "upstream")
+    )
+    stack.upstream_args = ["--capture", str(upstream_capture), "--speed", str(args.speed)]
+    seed = stack.start()
+    ids = IdMap(stack.database_path, seed)
+    ids.prepare(calls)
+    replayer = Replayer(stack, seed, ids)
+    try:
+        before = stack.usage()
+        outcome, elapsed = await replay(calls, replayer, args.speed)
+        after = stack.usage()
+    finally:
+        await replayer.aclose()
+        stack.stop()
+    processes = {
+        process: {
+            "rss_mb": after[process].get("rss_mb", 0.0),
+            "rss_peak_mb": after[process].get("rss_peak_mb", 0.0),
+            "cpu_seconds": after[process].get("cpu_seconds", 0.0) - before[process].get("cpu_seconds", 0.0),
+        }
+        for process in after
+        if after[process]
+    }
+    results = build_results(calls, outcome, elapsed, processes)
+    for result in results:
+        _print_result(result)
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "capture": [str(path) for path in args.capture],
+        "speed": args.speed,
+        "profile_name": args.profile,
+        "profile": profile_dict(load_profile(args.profile)),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay captured traffic against the stand-in upstreams.")
+    parser.add_argument("capture", nargs="+", type=Path, help="capture files written with CAPTURE_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = original pacing, 10 = ten times faster")
+    parser.add_argument("--services", nargs="+", default=["app-server"], choices=["app-server", "mcp-server"])
+    parser.add_argument("--paths", nargs="+", default=list(DEFAULT_PATHS), help="app server path prefixes to replay")
+    parser.add_argument("--profile", default="instant", help="fake upstream profile for requests not in the capture")
+    parser.add_argument("--mcp-python", default=Stack.mcp_python)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    report = asyncio.run(main_async(args))
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-replay.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench.fakes import load_profile, profile_dict
+from bench.scenarios import SCENARIOS, StatusError, Target, Worker
+from bench.stack import APP_DIR, Stack
+
+RESULTS_DIR = APP_DIR / "bench" / "results"
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+async def _drive(scenario, workers: list[Worker], seconds: float) -> tuple[list[float], Counter]:
+    latencies: list[float] = []
+    errors: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+
+    async def loop(worker: Worker) -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await scenario(worker)
+            except Exception as exc:
+                errors[str(exc) if isinstance(exc, StatusError) else type(exc).__name__] += 1
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(loop(worker) for worker in workers))
+    return latencies, errors
+
+
+async def _sample_usage(stack: Stack, peaks: dict[str, float], interval: float = 0.5) -> None:
+    while True:
+        for name, usage in stack.usage().items():
+            if usage:
+                peaks[name] = max(peaks.get(name, 0.0), usage["rss_mb"])
+        await asyncio.sleep(interval)
+
+
+async def run_scenario(name: str, stack: Stack, target: Target, concurrency: int, duration: float, warmup: float) -> dict:
+    scenario = SCENARIOS[name]
+    workers = [Worker(target) for _ in range(concurrency)]
+    try:
+        if warmup:
+            await _drive(scenario, workers, warmup)
+        before = stack.usage()
+        peaks: dict[str, float] = {}
+        sampler = asyncio.create_task(_sample_usage(stack, peaks))
+        started = time.perf_counter()
+        latencies, errors = await _drive(scenario, workers, duration)
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        after = stack.usage()
+    finally:
+        for worker in workers:
+            await worker.aclose()
+    total = len(latencies) + sum(errors.values())
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "duration_seconds": elapsed,
+        "requests": total,
+        "errors": dict(errors),
+        "error_rate": sum(errors.values()) / total if total else 0.0,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "processes": {
+            process: {
+                "rss_mb": after[process].get("rss_mb", 0.0),
+                "rss_peak_mb": peaks.get(process, 0.0),
+                "cpu_seconds": after[process].get("cpu_seconds", 0.0) - before[process].get("cpu_seconds", 0.0),
+            }
+            for process in after
+            if after[process]
+        },
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _print_result(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario']:<20} {result['throughput_rps']:>8.1f} req/s  "
+        f"p50 {latency['p50']:>8.1f}  p95 {latency['p95']:>8.1f}  p99 {latency['p99']:>8.1f} ms  "
+        f"errors {result['error_rate']:.1%}"
+    )
+    for process, usage in result["processes"].items():
+        print(f"  {process:<12} rss {usage['rss_mb']:>7.1f} MB (peak {usage['rss_peak_mb']:.1f})  cpu {usage['cpu_seconds']:.2f}s")
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    stack = Stack(profile=args.profile, mcp_python=args.mcp_python, app_env=args.app_env, mcp_env=args.mcp_env)
+    seed = stack.start()
+    try:
+        target = Target(
+            app_url=stack.app_url,
+            mcp_url=stack.mcp_url,
+            room_id=seed.room_id,
+            session_id=seed.session_id,
+            jwt=seed.jwt,
+            calendar_credential_id=seed.calendar_credential_id,
+        )
+        results = []
+        for name in args.scenarios:
+            result = await run_scenario(name, stack, target, args.concurrency, args.duration, args.warmup)
+            _print_result(result)
+            results.append(result)
+    finally:
+        stack.stop()
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "profile_name": args.profile,
+        "profile": profile_dict(load_profile(args.profile)),
+        "app_env": args.app_env,
+        "mcp_env": args.mcp_env,
+        "results": results,
+    }
+
+
+def _env_pair(value: str) -> tuple[str, str]:
+    name, sep, setting = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {value!r}")
+    return name, setting
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the app and MCP servers against stand-in upstreams.")
+    parser.add_argument("scenarios", nargs="*", default=["api_list_events", "mcp_list_events", "chat_tool"])
+    parser.add_argument("--profile", default="realistic", help="fake upstream profile name or JSON file")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mcp-python", default=Stack.mcp_python, help="interpreter for mcp_server/main.py")
+    parser.add_argument("--app-env", type=_env_pair, action="append", default=[], help="extra app server setting, e.g. MCP_COLOCATED=true")
+    parser.add_argument("--output", type=Path, help=f"result file (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--mcp-env", type=_env_pair, action="append", default=[], help="extra MCP server setting, e.g. MCP_DIRECT_GOOGLE=true")
+    args = parser.parse_args()
+    args.app_env = dict(args.app_env)
+    args.mcp_env = dict(args.mcp_env)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {sorted(SCENARIOS)}")
+
+    report = asyncio.run(main_async(args))
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{Path(args.profile).stem}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
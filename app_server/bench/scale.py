@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench.run import RESULTS_DIR, _git_revision, _print_result, run_scenario
+from bench.scenarios import SCENARIOS, Target
+from bench.stack import Stack
+
+
+async def measure(replicas: int, args: argparse.Namespace) -> dict:
+    stack = Stack(
+        profile=args.profile,
+        mcp_python=args.mcp_python,
+        app_workers=args.app_workers,
+        mcp_env={"MCP_STATELESS": "false" if args.stateful else "true"},
+        mcp_replicas=replicas,
+        balance_mcp=True,
+    )
+    seed = stack.start()
+    try:
+        target = Target(
+            app_url=stack.app_url,
+            mcp_url=stack.mcp_url,
+            room_id=seed.room_id,
+            session_id=seed.session_id,
+            jwt=seed.jwt,
+            calendar_credential_id=seed.calendar_credential_id,
+        )
+        # Offered load grows with the replica count so every step can saturate.
+        result = await run_scenario(
+            args.scenario, stack, target, args.concurrency * replicas, args.duration, args.warmup
+        )
+    finally:
+        stack.stop()
+    result["scenario"] = f"{args.scenario} x{replicas}"
+    result["replicas"] = replicas
+    return result
+
+
+def _print_scaling(results: list[dict]) -> None:
+    base = results[0]["throughput_rps"] / results[0]["replicas"]
+    print(f"\n{'replicas':>8} {'req/s':>9} {'speedup':>8} {'efficiency':>10} {'mcp cpu s':>10}")
+    for result in results:
+        speedup = result["throughput_rps"] / base if base else 0.0
+        mcp_cpu = sum(usage["cpu_seconds"] for name, usage in result["processes"].items() if name.startswith("mcp_server"))
+        print(
+            f"{result['replicas']:>8} {result['throughput_rps']:>9.1f} {speedup:>7.2f}x "
+            f"{speedup / result['replicas']:>9.0%} {mcp_cpu:>10.2f}"
+        )
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    results = []
+    for replicas in args.replicas:
+        result = await measure(replicas, args)
+        _print_result(result)
+        results.append(result)
+    _print_scaling(results)
+    cores = os.cpu_count() or 1
+    if cores < max(args.replicas) + args.app_workers:
+        print(f"note: {cores} CPU core(s) for up to {max(args.replicas)} replicas plus {args.app_workers} app worker(s); scaling is CPU-bound here")
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "cpu_count": cores,
+        "profile_name": args.profile,
+        "mode": "stateful" if args.stateful else "stateless",
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure MCP tool-call throughput across 1..N replicas behind a load balancer.")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--scenario", default="mcp_list_events", choices=[name for name in SCENARIOS if name.startswith("mcp_")])
+    parser.add_argument("--profile", default="realistic")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per replica")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--app-workers", type=int, default=4, help="app server workers, sized so it is not the bottleneck")
+    parser.add_argument("--stateful", action="store_true", help="run the replicas without MCP_STATELESS (expect session errors)")
+    parser.add_argument("--mcp-python", default=Stack.mcp_python)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+    args.replicas = sorted(set(args.replicas))
+
+    report = asyncio.run(main_async(args))
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-scale.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import httpx
+from fastmcp import Client
+
+
+@dataclass
+class Target:
+    app_url: str
+    mcp_url: str
+    room_id: str
+    session_id: str
+    jwt: str
+    calendar_credential_id: str
+
+
+# One instance per concurrent worker, so HTTP connections and MCP sessions are
+# reused across iterations the way a long-lived client would.
+class Worker:
+    def __init__(self, target: Target) -> None:
+        self.target = target
+        self.http = httpx.AsyncClient(
+            base_url=target.app_url,
+            timeout=60.0,
+            cookies={"admin_session": target.session_id},
+            headers={"Authorization": f"Bearer {target.jwt}"},
+        )
+        self.mcp: Client | None = None
+
+    async def mcp_client(self) -> Client:
+        if self.mcp is None:
+            client = Client(self.target.mcp_url, auth=self.target.jwt)
+            await client.__aenter__()
+            self.mcp = client
+        return self.mcp
+
+    async def aclose(self) -> None:
+        if self.mcp is not None:
+            with suppress(Exception):
+                await self.mcp.__aexit__(None, None, None)
+        await self.http.aclose()
+
+
+def _window() -> tuple[str, str]:
+    now = datetime.now(timezone.utc)
+    return now.isoformat(), (now + timedelta(days=1)).isoformat()
+
+
+class StatusError(RuntimeError):
+    pass
+
+
+def _check(resp: httpx.Response) -> None:
+    # Chat posts answer with a redirect back to the room.
+    if resp.status_code >= 400:
+        raise StatusError(f"HTTP {resp.status_code}")
+
+
+async def chat_text(worker: Worker) -> None:
+    resp = await worker.http.post(f"/chat/{worker.target.room_id}/message", data={"prompt": "こんにちは"})
+    _check(resp)
+
+
+async def chat_tool(worker: Worker) -> None:
+    resp = await worker.http.post(
+        f"/chat/{worker.target.room_id}/message", data={"prompt": "gcal.list_events 今日の予定は?"}
+    )
+    _check(resp)
+
+
+async def chat_job(worker: Worker) -> None:
+    # Needs CHAT_JOBS_ENABLED=true; times the whole turn, not just the 202.
+    resp = await worker.http.post(
+        f"/chat/{worker.target.room_id}/message", data={"prompt": "gcal.list_events 今日の予定は?"}
+    )
+    _check(resp)
+    if resp.status_code != 202:
+        raise StatusError(f"HTTP {resp.status_code} (CHAT_JOBS_ENABLED is off?)")
+    status_url = resp.json()["status_url"]
+    while True:
+        job = await worker.http.get(status_url, params={"wait": 25})
+        _check(job)
+        status = job.json()["status"]
+        if status == "failed":
+            raise StatusError("job failed")
+        if status == "done":
+            return
+
+
+def _api_path(worker: Worker, action: str) -> str:
+    return f"/api/google_calendar/{worker.target.calendar_credential_id}/{action}"
+
+
+async def api_list_calendars(worker: Worker) -> None:
+    _check(await worker.http.get(_api_path(worker, "list_calendars")))
+
+
+async def api_list_events(worker: Worker) -> None:
+    _check(await worker.http.get(_api_path(worker, "list_events"), params={"calendar_id": "primary"}))
+
+
+async def api_availability(worker: Worker) -> None:
+    time_min, time_max = _window()
+    _check(
+        await worker.http.post(
+            _api_path(worker, "availability"),
+            json={"calendar_id": "primary", "time_min": time_min, "time_max": time_max},
+        )
+    )
+
+
+async def api_create_event(worker: Worker) -> None:
+    time_min, time_max = _window()
+    _check(
+        await worker.http.post(
+            _api_path(worker, "create_event"),
+            json={
+                "calendar_id": "primary",
+                "event": {"summary": "bench", "start": {"dateTime": time_min}, "end": {"dateTime": time_max}},
+            },
+        )
+    )
+
+
+async def mcp_list_events(worker: Worker) -> None:
+    client = await worker.mcp_client()
+    await client.call_tool(
+        "gcal.list_events",
+        {"credential_id": worker.target.calendar_credential_id, "calendar_id": "primary"},
+    )
+
+
+async def mcp_availability(worker: Worker) -> None:
+    client = await worker.mcp_client()
+    time_min, time_max = _window()
+    await client.call_tool(
+        "gcal.availability",
+        {
+            "credential_id": worker.target.calendar_credential_id,
+            "calendar_id": "primary",
+            "time_min": time_min,
+            "time_max": time_max,
+        },
+    )
+
+
+SCENARIOS: dict[str, Callable[[Worker], Awaitable[None]]] = {
+    "chat_text": chat_text,
+    "chat_tool": chat_tool,
+    "chat_job": chat_job,
+    "api_list_calendars": api_list_calendars,
+    "api_list_events": api_list_events,
+    "api_availability": api_availability,
+    "api_create_event": api_create_event,
+    "mcp_list_events": mcp_list_events,
+    "mcp_availability": mcp_availability,
+}
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from auth.jwt import issue_jwt
+from auth.keys import SigningKeyStore
+from auth.session import create_session
+from db import connect, init_db
+
+APP_DIR = Path(__file__).resolve().parent.parent
+MCP_DIR = APP_DIR.parent / "mcp_server"
+JWT_ISSUER = "app-server"
+JWT_TTL_SECONDS = 3600
+CALENDAR_CREDENTIAL_ID = "bench-google-calendar"
+GEMINI_CREDENTIAL_ID = "bench-gemini"
+MCP_CLIENT_ID = "bench-mcp-server"
+MCP_CLIENT_SECRET = "bench-mcp-secret"
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            time.sleep(0.2)
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").glob("*/children"):
+        for child in task.read_text().split():
+            pids.extend(_process_tree(int(child)))
+    return pids
+
+
+def process_usage(pid: int) -> dict:
+    # Linux only; other platforms report nothing rather than guessing. Worker
+    # processes (uvicorn --workers) are added to their parent.
+    usage = {"rss_mb": 0.0, "rss_peak_mb": 0.0, "cpu_seconds": 0.0}
+    try:
+        for member in _process_tree(pid):
+            status = Path(f"/proc/{member}/status").read_text()
+            stat = Path(f"/proc/{member}/stat").read_text().rsplit(")", 1)[1].split()
+            fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+            usage["rss_mb"] += int(fields["VmRSS"].split()[0]) / 1024
+            usage["rss_peak_mb"] += int(fields["VmHWM"].split()[0]) / 1024
+            usage["cpu_seconds"] += (int(stat[11]) + int(stat[12])) / CLK_TCK
+    except OSError:
+        return {}
+    return usage
+
+
+@dataclass
+class Seed:
+    room_id: str
+    session_id: str
+    jwt: str
+    calendar_credential_id: str = CALENDAR_CREDENTIAL_ID
+    gemini_credential_id: str = GEMINI_CREDENTIAL_ID
+
+
+def add_room(conn, name: str) -> str:
+    room_id = f"bench-{uuid.uuid4().hex[:12]}"
+    now = int(time.time())
+    conn.execute(
+        "INSERT INTO chat_rooms (id, name, llm_provider, llm_credential_id, llm_cache_enabled, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (room_id, name, "gemini", GEMINI_CREDENTIAL_ID, 0, now),
+    )
+    conn.execute(
+        "INSERT INTO chat_room_providers (room_id, provider, credential_id, created_at) VALUES (?, ?, ?, ?)",
+        (room_id, "google_calendar", CALENDAR_CREDENTIAL_ID, now),
+    )
+    conn.commit()
+    return room_id
+
+
+def seed_database(database_path: str) -> Seed:
+    conn = connect(database_path)
+    init_db(conn)
+    now = int(time.time())
+    for credential_id, provider, refresh_token in (
+        (CALENDAR_CREDENTIAL_ID, "google_calendar", "bench-refresh"),
+        (GEMINI_CREDENTIAL_ID, "gemini", None),
+    ):
+        conn.execute(
+            "REPLACE INTO credentials (id, provider, name, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (credential_id, provider, credential_id, "connected", now),
+        )
+        conn.execute(
+            "REPLACE INTO oauth_tokens (credential_id, access_token, refresh_token, expiry, updated_at) VALUES (?, ?, ?, ?, ?)",
+            # The calendar token starts expired so the first call exercises the refresh path.
+            (credential_id, "bench-token", refresh_token, now - 1 if refresh_token else None, now),
+        )
+    conn.commit()
+    room_id = add_room(conn, "bench")
+    conn.execute(
+        "REPLACE INTO oauth_clients (client_id, client_secret, client_name, redirect_uris_json, grant_types_json,"
+        " response_types_json, scope, token_endpoint_auth_method, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (MCP_CLIENT_ID, MCP_CLIENT_SECRET, "bench mcp_server", "[]", '["client_credentials"]', '["none"]', "mcp", "client_secret_post", now, now),
+    )
+    conn.commit()
+    session_id = create_session(conn, "bench@example.com", JWT_TTL_SECONDS)
+    keys = SigningKeyStore(conn, "ES256", 604800, JWT_TTL_SECONDS)
+    jwt, _exp = issue_jwt(keys, JWT_ISSUER, JWT_TTL_SECONDS, "bench")
+    conn.close()
+    return Seed(room_id=room_id, session_id=session_id, jwt=jwt)
+
+
+@dataclass
+class Stack:
+    profile: str
+    mcp_python: str = sys.executable
+    app_env: dict = field(default_factory=dict)
+    upstream_args: list[str] = field(default_factory=list)
+    app_workers: int = 1
+    mcp_env: dict = field(default_factory=dict)
+    mcp_replicas: int = 1
+    # Put the MCP replicas behind bench.balancer (also with a single replica,
+    # so scaling runs compare like with like).
+    balance_mcp: bool = False
+    workdir: Path = field(default_factory=lambda: Path(tempfile.mkdtemp(prefix="bench-")))
+    processes: dict[str, subprocess.Popen] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.upstream_port = free_port()
+        self.app_port = free_port()
+        self.mcp_replica_ports = [free_port() for _ in range(self.mcp_replicas)]
+        self.mcp_port = free_port() if self.balance_mcp else self.mcp_replica_ports[0]
+        self.database_path = str(self.workdir / "app.db")
+
+    @property
+    def upstream_url(self) -> str:
+        return f"http://127.0.0.1:{self.upstream_port}"
+
+    @property
+    def app_url(self) -> str:
+        return f"http://127.0.0.1:{self.app_port}"
+
+    @property
+    def mcp_url(self) -> str:
+        return f"http://127.0.0.1:{self.mcp_port}/mcp"
+
+    def _spawn(self, name: str, args: list[str], cwd: Path, env: dict) -> None:
+        log = open(self.workdir / f"{name}.log", "w")
+        self.processes[name] = subprocess.Popen(
+            args, cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+        )
+
+    def start(self) -> Seed:
+        seed = seed_database(self.database_path)
+        self._spawn(
+            "upstream",
+            [sys.executable, "-m", "bench.fakes", "--profile", self.profile, "--port", str(self.upstream_port), *self.upstream_args],
+            APP_DIR,
+            {},
+        )
+        self._spawn(
+            "app_server",
+            [
+                sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.app_port),
+                "--workers", str(self.app_workers), "--log-level", "warning",
+            ],
+            APP_DIR,
+            {
+                "DATABASE_PATH": self.database_path,
+                "GEMINI_BASE_URL": f"{self.upstream_url}/v1beta",
+                "GOOGLE_CALENDAR_BASE_URL": f"{self.upstream_url}/calendar/v3",
+                "GOOGLE_TOKEN_URL": f"{self.upstream_url}/token",
+                "GOOGLE_CLIENT_ID": "bench-client",
+                "GOOGLE_CLIENT_SECRET": "bench-secret",
+                "MCP_SERVER_URL": self.mcp_url,
+                "JWT_ISSUER": JWT_ISSUER,
+                "JWT_ALGORITHM": "ES256",
+                "JWT_TTL_SECONDS": str(JWT_TTL_SECONDS),
+                # The stand-ins enforce no quota; measure the servers, not the limiter.
+                "GOOGLE_RATE_LIMIT_PER_CREDENTIAL": "0",
+                "GOOGLE_RATE_LIMIT_GLOBAL": "0",
+                "TOKEN_VENDING_CLIENT_IDS": MCP_CLIENT_ID,
+                **self.app_env,
+            },
+        )
+        for index, port in enumerate(self.mcp_replica_ports):
+            self._spawn(
+                "mcp_server" if self.mcp_replicas == 1 else f"mcp_server_{index + 1}",
+                [self.mcp_python, "main.py"],
+                MCP_DIR,
+                {
+                    "APP_SERVER_URL": self.app_url,
+                    "MCP_PORT": str(port),
+                    "GOOGLE_CALENDAR_BASE_URL": f"{self.upstream_url}/calendar/v3",
+                    "JWT_ISSUER": JWT_ISSUER,
+                    "JWT_ALGORITHM": "ES256",
+                    "MCP_CLIENT_ID": MCP_CLIENT_ID,
+                    "MCP_CLIENT_SECRET": MCP_CLIENT_SECRET,
+                    **self.mcp_env,
+                },
+            )
+        if self.balance_mcp:
+            self._spawn(
+                "balancer",
+                [
+                    sys.executable, "-m", "bench.balancer", "--port", str(self.mcp_port),
+                    *(f"127.0.0.1:{port}" for port in self.mcp_replica_ports),
+                ],
+                APP_DIR,
+                {},
+            )
+        wait_for(f"{self.upstream_url}/docs")
+        wait_for(f"{self.app_url}/.well-known/jwks.json")
+        for port in self.mcp_replica_ports:
+            wait_for(f"http://127.0.0.1:{port}/metrics")
+        wait_for(f"http://127.0.0.1:{self.mcp_port}/metrics")
+        return seed
+
+    def usage(self) -> dict[str, dict]:
+        return {name: process_usage(process.pid) for name, process in self.processes.items()}
+
+    def stop(self) -> None:
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+import uuid
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC = "zlib"
+THRESHOLD_BYTES = 4096
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def configure(settings) -> None:
+    global CODEC, THRESHOLD_BYTES
+    codec = settings.blob_codec
+    if codec == "auto":
+        codec = "zstd" if zstandard is not None else "zlib"
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("BLOB_CODEC=zstd requires the zstandard package")
+    if codec not in ("zstd", "zlib"):
+        raise RuntimeError(f"unknown BLOB_CODEC {settings.blob_codec!r}")
+    CODEC = codec
+    THRESHOLD_BYTES = settings.blob_threshold_bytes
+
+
+def compress(data: bytes) -> tuple[str, bytes]:
+    packed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data) if CODEC == "zstd" else zlib.compress(data, ZLIB_LEVEL)
+    if len(packed) >= len(data):
+        # Already dense (say, base64); storing it as-is saves the decompression.
+        return "none", data
+    return CODEC, packed
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown blob codec {codec!r}")
+
+
+def store(conn, text: str) -> str:
+    data = text.encode("utf-8")
+    codec, packed = compress(data)
+    blob_id = str(uuid.uuid4())
+    conn.execute(
+        "INSERT INTO blobs (id, codec, size, data, created_at) VALUES (?, ?, ?, ?, ?)",
+        (blob_id, codec, len(data), packed, int(time.time())),
+    )
+    return blob_id
+
+
+def load(conn, blob_id: str) -> str:
+    row = conn.execute("SELECT codec, data FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+    if not row:
+        raise KeyError(blob_id)
+    return decompress(row["codec"], row["data"]).decode("utf-8")
+
+
+def delete(conn, blob_id: str | None) -> None:
+    if blob_id:
+        conn.execute("DELETE FROM blobs WHERE id = ?", (blob_id,))
+
+
+def split(conn, text: str | None, keep_chars: int = 0) -> tuple[str | None, str | None]:
+    # Small values stay inline. Large ones move to a compressed blob and keep
+    # only their first keep_chars inline, enough for listings to show a preview.
+    if text is None or (keep_chars and len(text) <= keep_chars) or len(text.encode("utf-8")) <= THRESHOLD_BYTES:
+        return text, None
+    return (text[:keep_chars] if keep_chars else None), store(conn, text)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+
+import blobs
+from metrics import CHAT_WS_CONNECTIONS, CHAT_WS_RESYNCS
+
+MAX_PENDING_FRAMES = 256
+PREVIEW_CHARS = 2000
+
+
+def configure(settings) -> None:
+    global PREVIEW_CHARS
+    PREVIEW_CHARS = settings.chat_message_preview_chars
+
+
+class RoomHub:
+    # Fans chat events out to every WebSocket open on a room in this process.
+    # A subscriber that falls MAX_PENDING_FRAMES behind gets its backlog
+    # replaced by a single "resync" frame, so one slow tab cannot hold memory
+    # or block the turn that publishes.
+    def __init__(self) -> None:
+        self._rooms: dict[str, set[asyncio.Queue]] = {}
+
+    def subscribe(self, room_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(MAX_PENDING_FRAMES)
+        self._rooms.setdefault(room_id, set()).add(queue)
+        CHAT_WS_CONNECTIONS.inc()
+        return queue
+
+    def unsubscribe(self, room_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._rooms.get(room_id)
+        if subscribers is None or queue not in subscribers:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._rooms[room_id]
+        CHAT_WS_CONNECTIONS.dec()
+
+    def publish(self, room_id: str, frame: dict) -> None:
+        for queue in self._rooms.get(room_id, ()):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+                CHAT_WS_RESYNCS.inc()
+
+
+HUB = RoomHub()
+
+# Frames of messages inserted but not committed yet. The connection is shared
+# by the whole process, so they go out with its next commit() and not before:
+# a tab never shows a message that is rolled back or lost.
+_unsent: list[tuple[str, dict]] = []
+
+
+def message_frame(
+    seq: int, message_id: str, role: str, content: str, created_at: int, length: int | None = None, full: bool = False
+) -> dict:
+    # Long bodies (tool results with debug JSON) are cut to PREVIEW_CHARS; the
+    # page fetches the rest when asked. length is the stored body's length
+    # when content was already cut in SQL.
+    truncated = not full and (length if length is not None else len(content)) > PREVIEW_CHARS
+    return {
+        "type": "message",
+        "seq": seq,
+        "id": message_id,
+        "role": role,
+        "content": content[:PREVIEW_CHARS] if truncated else content,
+        "truncated": truncated,
+        "created_at": created_at,
+    }
+
+
+def store_message(conn, room_id: str, role: str, content: str) -> str:
+    message_id = str(uuid.uuid4())
+    created_at = int(time.time())
+    inline, blob_id = blobs.split(conn, content, PREVIEW_CHARS)
+    cursor = conn.execute(
+        "INSERT INTO chat_messages (id, room_id, role, content, content_length, content_blob_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (message_id, room_id, role, inline, len(content) if blob_id else None, blob_id, created_at),
+    )
+    _unsent.append((room_id, message_frame(cursor.lastrowid, message_id, role, content, created_at)))
+    return message_id
+
+
+def commit(conn) -> None:
+    conn.commit()
+    frames = _unsent[:]
+    _unsent.clear()
+    for room_id, frame in frames:
+        HUB.publish(room_id, frame)
+
+
+def rollback(conn) -> None:
+    conn.rollback()
+    _unsent.clear()
+
+
+def message_body(conn, row) -> str:
+    # Full text of a chat_messages row selected with content and content_blob_id.
+    return blobs.load(conn, row["content_blob_id"]) if row["content_blob_id"] else row["content"]
+
+
+def publish_status(room_id: str, state: str, **details) -> None:
+    HUB.publish(room_id, {"type": "status", "state": state, **details})
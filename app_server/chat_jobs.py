@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import suppress
+from typing import Awaitable, Callable
+
+import admission
+import chat_hub
+import deadline
+from metrics import CHAT_JOB_QUEUE_SECONDS, CHAT_JOB_WORKER_ERRORS, CHAT_JOBS, CHAT_JOBS_RUNNING
+
+logger = logging.getLogger(__name__)
+MAX_BACKOFF_SECONDS = 30.0
+
+# A job is claimable when it is the oldest unfinished job of its room, so turns
+# in one room run one at a time in the order they were posted while different
+# rooms run in parallel. A running job whose lease has expired belongs to a
+# worker that died; it is claimed again.
+CLAIM_SQL = """
+    UPDATE chat_jobs
+    SET status = 'running', attempts = attempts + 1, lease_until = ?, started_at = ?, updated_at = ?
+    WHERE seq = (
+        SELECT j.seq FROM chat_jobs j
+        WHERE (j.status = 'queued' OR (j.status = 'running' AND j.lease_until < ?))
+          AND NOT EXISTS (
+              SELECT 1 FROM chat_jobs o
+              WHERE o.room_id = j.room_id AND o.status IN ('queued', 'running') AND o.seq < j.seq
+          )
+        ORDER BY j.seq
+        LIMIT 1
+    )
+    RETURNING id, room_id, prompt, attempts, created_at
+"""
+
+_wake = asyncio.Event()
+_finished = asyncio.Event()
+
+
+def enqueue(conn, room_id: str, message_id: str, prompt: str) -> str:
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    conn.execute(
+        "INSERT INTO chat_jobs (id, room_id, message_id, prompt, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+        (job_id, room_id, message_id, prompt, now, now),
+    )
+    return job_id
+
+
+def notify() -> None:
+    # Workers in this process start right away; other processes find the job on their next poll.
+    _wake.set()
+
+
+def get(conn, job_id: str):
+    return conn.execute("SELECT * FROM chat_jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def pending(conn, room_id: str) -> list:
+    return conn.execute(
+        "SELECT id, status FROM chat_jobs WHERE room_id = ? AND status IN ('queued', 'running') ORDER BY seq",
+        (room_id,),
+    ).fetchall()
+
+
+def describe(conn, job) -> dict:
+    message = None
+    if job["result_message_id"]:
+        row = conn.execute(
+            "SELECT id, content, content_blob_id, created_at FROM chat_messages WHERE id = ?",
+            (job["result_message_id"],),
+        ).fetchone()
+        if row:
+            message = {"id": row["id"], "content": chat_hub.message_body(conn, row), "created_at": row["created_at"]}
+    return {
+        "id": job["id"],
+        "room_id": job["room_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "message": message,
+    }
+
+
+async def wait_for(conn, job_id: str, wait: float, poll_seconds: float):
+    stop_at = time.monotonic() + wait
+    while True:
+        job = get(conn, job_id)
+        left = stop_at - time.monotonic()
+        if not job or job["status"] in ("done", "failed") or left <= 0:
+            return job
+        # Jobs finished in this process wake the poll early; others are seen on the next poll.
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_finished.wait(), min(poll_seconds, left))
+
+
+def _finish(conn, job_id: str, status: str, message_id: str | None, error: str | None = None) -> None:
+    global _finished
+    now = time.time()
+    conn.execute(
+        "UPDATE chat_jobs SET status = ?, result_message_id = ?, error = ?, lease_until = NULL, finished_at = ?, updated_at = ? WHERE id = ?",
+        (status, message_id, error, now, now, job_id),
+    )
+    chat_hub.commit(conn)
+    CHAT_JOBS.labels(status).inc()
+    # The room's next job is claimable now.
+    _wake.set()
+    _finished.set()
+    _finished = asyncio.Event()
+
+
+def _fail(conn, job, error: str) -> None:
+    # The room shows the failure like any other answer.
+    message_id = chat_hub.store_message(conn, job["room_id"], "assistant", f"Request failed: {error}")
+    _finish(conn, job["id"], "failed", message_id, error)
+    chat_hub.publish_status(job["room_id"], "idle")
+
+
+def _claim(conn, lease_seconds: float):
+    now = time.time()
+    job = conn.execute(CLAIM_SQL, (now + lease_seconds, now, now, now)).fetchone()
+    conn.commit()
+    return job
+
+
+async def _renew_lease(conn, job, lease_seconds: float) -> None:
+    # A turn can wait for an admission slot and then use its whole deadline, so
+    # the lease is extended while it runs rather than sized to outlast both.
+    # The attempts check keeps a worker that lost the job from reclaiming it.
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        now = time.time()
+        try:
+            conn.execute(
+                "UPDATE chat_jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (now + lease_seconds, now, job["id"], job["attempts"]),
+            )
+            chat_hub.commit(conn)
+        except Exception:
+            logger.exception("could not renew the lease of chat job %s", job["id"])
+
+
+async def _run(state, job, handler: Callable[[object, str, str], Awaitable[str]]) -> None:
+    conn = state.db
+    settings = state.settings
+    if job["attempts"] > settings.chat_job_max_attempts:
+        _fail(conn, job, f"gave up after {settings.chat_job_max_attempts} attempts")
+        return
+    CHAT_JOB_QUEUE_SECONDS.observe(max(0.0, time.time() - job["created_at"]))
+    CHAT_JOBS_RUNNING.inc()
+    heartbeat = asyncio.create_task(_renew_lease(conn, job, settings.chat_job_lease_seconds))
+    try:
+        async with admission.slot(job["room_id"], shed=False):
+            with deadline.budget(settings.request_deadline_seconds):
+                message_id = await handler(state, job["room_id"], job["prompt"])
+    except asyncio.CancelledError:
+        # Shutting down: hand the job straight back instead of waiting out the lease.
+        conn.execute(
+            "UPDATE chat_jobs SET status = 'queued', lease_until = NULL, updated_at = ? WHERE id = ?",
+            (time.time(), job["id"]),
+        )
+        conn.commit()
+        raise
+    except Exception as exc:
+        _fail(conn, job, str(exc) or type(exc).__name__)
+    else:
+        _finish(conn, job["id"], "done", message_id)
+    finally:
+        heartbeat.cancel()
+        CHAT_JOBS_RUNNING.dec()
+
+
+async def _worker(state, handler) -> None:
+    settings = state.settings
+    backoff = settings.chat_job_poll_seconds
+    while True:
+        _wake.clear()
+        try:
+            job = _claim(state.db, settings.chat_job_lease_seconds)
+            if job is not None:
+                await _run(state, job, handler)
+        except Exception:
+            # Say "database is locked" from another worker. The worker stays up,
+            # and a job it had claimed is picked up again once its lease runs out.
+            logger.exception("chat job worker failed; retrying in %.1fs", backoff)
+            CHAT_JOB_WORKER_ERRORS.inc()
+            # Whatever it wrote is dropped; a job it had finished runs again.
+            with suppress(Exception):
+                chat_hub.rollback(state.db)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+            continue
+        backoff = settings.chat_job_poll_seconds
+        if job is None:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(_wake.wait(), settings.chat_job_poll_seconds)
+
+
+def start(state, handler) -> list[asyncio.Task]:
+    if not state.settings.chat_jobs_enabled:
+        return []
+    return [asyncio.create_task(_worker(state, handler)) for _ in range(max(1, state.settings.chat_job_workers))]
+
+
+async def stop(workers: list[asyncio.Task]) -> None:
+    for worker in workers:
+        worker.cancel()
+    for worker in workers:
+        with suppress(asyncio.CancelledError):
+            await worker
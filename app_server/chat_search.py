@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import html
+
+# The trigram tokenizer matches any substring of three or more characters,
+# which also works for Japanese text that has no spaces between words.
+MIN_TERM_CHARS = 3
+MAX_LIMIT = 50
+# snippet() counts tokens, and a trigram token advances one character, so this
+# is roughly 64 characters around the match (FTS5 allows at most 64).
+SNIPPET_TOKENS = 64
+# Control characters cannot occur in stored text, so they are safe snippet markers.
+_OPEN, _CLOSE = "\x02", "\x03"
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _snippet_html(snippet: str) -> str:
+    return html.escape(snippet).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search(conn, query: str, room_id: str | None = None, limit: int = 20, offset: int = 0) -> dict:
+    # Every whitespace-separated term must appear. Terms of three characters or
+    # more go through the index; shorter ones only filter the rows it returns,
+    # or scan the index table when no term is long enough.
+    terms = query.split()
+    if not terms:
+        return {"results": [], "next_offset": None}
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_CHARS]
+    short_terms = [term for term in terms if len(term) < MIN_TERM_CHARS]
+    limit = max(1, min(limit, MAX_LIMIT))
+    where, params = [], []
+    if long_terms:
+        where.append("chat_messages_fts MATCH ?")
+        params.append(" ".join(_phrase(term) for term in long_terms))
+    for term in short_terms:
+        where.append("chat_messages_fts.content LIKE ? ESCAPE '\\'")
+        params.append(_like(term))
+    if room_id:
+        where.append("m.room_id = ?")
+        params.append(room_id)
+    order = "chat_messages_fts.rank" if long_terms else "m.created_at DESC, m.rowid DESC"
+    rows = conn.execute(
+        f"""
+        SELECT m.rowid AS seq, m.id, m.room_id, r.name AS room_name, m.role, m.created_at,
+               snippet(chat_messages_fts, 0, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM chat_messages_fts
+        JOIN chat_messages m ON m.rowid = chat_messages_fts.rowid
+        JOIN chat_rooms r ON r.id = m.room_id
+        WHERE {" AND ".join(where)}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+        """,
+        (*params, limit + 1, offset),
+    ).fetchall()
+    results = [
+        {
+            "message_id": row["id"],
+            "seq": row["seq"],
+            "room_id": row["room_id"],
+            "room_name": row["room_name"],
+            "role": row["role"],
+            "created_at": row["created_at"],
+            "snippet": row["snippet"].replace(_OPEN, "").replace(_CLOSE, ""),
+            "snippet_html": _snippet_html(row["snippet"]),
+        }
+        for row in rows[:limit]
+    ]
+    return {"results": results, "next_offset": offset + limit if len(rows) > limit else None}
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+import blobs
+from config import load_settings
+from db import connect, init_db
+
+# (table, value column, length column or None, blob id column, keeps a preview inline)
+TARGETS = [
+    ("chat_messages", "content", "content_length", "content_blob_id", True),
+    ("oauth_tokens", "extra_json", None, "extra_blob_id", False),
+]
+
+
+def _file_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def _used_bytes(conn) -> int:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    used = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return used * page_size
+
+
+def _migrate(conn, table: str, column: str, length_column, blob_column: str, keep_chars: int, batch: int, dry_run: bool):
+    rows_moved = bytes_before = bytes_after = 0
+    last = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, {column} AS value FROM {table} WHERE rowid > ? AND {blob_column} IS NULL"
+            f" AND length(CAST({column} AS BLOB)) > ? ORDER BY rowid LIMIT ?",
+            (last, blobs.THRESHOLD_BYTES, batch),
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            last = row["rowid"]
+            value = row["value"]
+            if keep_chars and len(value) <= keep_chars:
+                continue
+            inline = value[:keep_chars] if keep_chars else None
+            if dry_run:
+                packed = len(blobs.compress(value.encode("utf-8"))[1])
+            else:
+                inline, blob_id = blobs.split(conn, value, keep_chars)
+                packed = conn.execute("SELECT length(data) FROM blobs WHERE id = ?", (blob_id,)).fetchone()[0]
+                assignments = f"{column} = ?, {blob_column} = ?" + (f", {length_column} = ?" if length_column else "")
+                params = [inline, blob_id] + ([len(value)] if length_column else [])
+                conn.execute(f"UPDATE {table} SET {assignments} WHERE rowid = ?", (*params, row["rowid"]))
+            rows_moved += 1
+            bytes_before += len(value.encode("utf-8"))
+            bytes_after += len((inline or "").encode("utf-8")) + packed
+        if not dry_run:
+            conn.commit()
+    return rows_moved, bytes_before, bytes_after
+
+
+def _mb(value: int) -> str:
+    return f"{value / 1_000_000:.2f} MB"
+
+
+def main() -> None:
+    load_dotenv()
+    settings = load_settings()
+    parser = argparse.ArgumentParser(description="Move large chat messages and token responses into compressed blobs.")
+    parser.add_argument("--database", default=settings.database_path)
+    parser.add_argument("--batch", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be saved without writing")
+    parser.add_argument("--vacuum", action="store_true", help="rebuild the file afterwards so it actually shrinks")
+    args = parser.parse_args()
+
+    blobs.configure(settings)
+    conn = connect(args.database)
+    init_db(conn)
+    file_before = _file_bytes(args.database)
+    used_before = _used_bytes(conn)
+    print(f"codec {blobs.CODEC}, threshold {blobs.THRESHOLD_BYTES} bytes{' (dry run)' if args.dry_run else ''}")
+    for table, column, length_column, blob_column, keep_preview in TARGETS:
+        keep_chars = settings.chat_message_preview_chars if keep_preview else 0
+        moved, before, after = _migrate(
+            conn, table, column, length_column, blob_column, keep_chars, args.batch, args.dry_run
+        )
+        saved = before - after
+        ratio = f"{before / after:.1f}x" if after else "-"
+        print(f"{table}.{column:<12} {moved:>6} rows  {_mb(before):>10} -> {_mb(after):>10}  saved {_mb(saved)} ({ratio})")
+    if args.dry_run:
+        return
+    if args.vacuum:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    used_after = _used_bytes(conn)
+    conn.close()
+    file_after = _file_bytes(args.database)
+    print(f"pages in use {_mb(used_before)} -> {_mb(used_after)}, file {_mb(file_before)} -> {_mb(file_after)}")
+    if not args.vacuum and file_after >= file_before:
+        print("freed pages are reused by new writes; run with --vacuum to shrink the file now")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,20 @@ from pathlib import Path
 class Settings:
     app_host: str
     app_port: int
+    app_reload: bool
+    app_workers: int
+    app_loop: str
+    app_http: str
+    app_limit_concurrency: int
+    app_backlog: int
+    app_keepalive_seconds: int
+    app_graceful_shutdown_seconds: int
+    request_deadline_seconds: float
     database_path: str
     jwt_secret: str
     jwt_issuer: str
+    jwt_algorithm: str
+    jwt_key_rotation_seconds: int
     jwt_ttl_seconds: int
     oauth_refresh_ttl_seconds: int
     admin_session_ttl_seconds: int
@@ -21,28 +32,93 @@ class Settings:
     google_login_client_secret: str
     google_login_allowed_emails: tuple[str, ...]
     google_login_allowed_domain: str
+    google_certs_url: str
     google_client_id: str
     google_client_secret: str
+    google_calendar_base_url: str
+    google_token_url: str
+    google_coalesce_reads: bool
+    circuit_failure_threshold: int
+    circuit_open_seconds: float
+    adaptive_timeouts_enabled: bool
+    adaptive_timeout_multiplier: float
+    adaptive_timeout_floor_seconds: float
+    google_rate_limit_per_credential: float
+    google_rate_limit_burst: int
+    google_rate_limit_global: float
+    google_rate_limit_global_burst: int
+    google_rate_limit_max_queue: int
+    google_rate_limit_max_wait_seconds: float
     gemini_api_key: str
     gemini_base_url: str
     gemini_model: str
+    gemini_timeout_seconds: float
+    gemini_max_retries: int
+    gemini_max_concurrency_per_key: int
+    gemini_hedge_enabled: bool
+    gemini_embedding_model: str
+    llm_cache_enabled: bool
+    llm_cache_ttl_seconds: int
+    llm_cache_max_entries: int
+    llm_cache_semantic_enabled: bool
+    llm_cache_similarity_threshold: float
     mcp_server_url: str
+    mcp_colocated: bool
+    token_vending_enabled: bool
+    token_vending_client_ids: tuple[str, ...]
+    chat_llm_summary_enabled: bool
+    chat_max_concurrent_turns: int
+    chat_max_turns_per_room: int
+    chat_admission_max_queue: int
+    chat_admission_max_wait_seconds: float
+    chat_ws_poll_seconds: float
+    chat_room_context_ttl_seconds: float
+    blob_codec: str
+    blob_threshold_bytes: int
+    chat_history_page_size: int
+    chat_history_max_page_size: int
+    chat_message_preview_chars: int
+    chat_jobs_enabled: bool
+    chat_job_workers: int
+    chat_job_poll_seconds: float
+    chat_job_lease_seconds: float
+    chat_job_max_attempts: int
+    trace_export: str
+    trace_file: str
+    trace_sample_ratio: float
+    capture_file: str
 
 
 DEFAULT_DB_PATH = str(Path(__file__).resolve().parent / "data" / "app.db")
+DEFAULT_TRACE_FILE = str(Path(__file__).resolve().parent / "data" / "traces.jsonl")
 
 
 def _split_csv(value: str) -> tuple[str, ...]:
     return tuple(part.strip() for part in value.split(",") if part.strip())
 
 
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
 def load_settings() -> Settings:
     return Settings(
         app_host=os.getenv("APP_HOST", "127.0.0.1"),
         app_port=int(os.getenv("APP_PORT", "8000")),
+        app_reload=_env_flag("APP_RELOAD", "true"),
+        app_workers=int(os.getenv("APP_WORKERS", "1")),
+        app_loop=os.getenv("APP_LOOP", "auto"),
+        app_http=os.getenv("APP_HTTP", "auto"),
+        app_limit_concurrency=int(os.getenv("APP_LIMIT_CONCURRENCY", "0")),
+        app_backlog=int(os.getenv("APP_BACKLOG", "2048")),
+        app_keepalive_seconds=int(os.getenv("APP_KEEPALIVE_SECONDS", "5")),
+        app_graceful_shutdown_seconds=int(os.getenv("APP_GRACEFUL_SHUTDOWN_SECONDS", "30")),
+        request_deadline_seconds=float(os.getenv("REQUEST_DEADLINE_SECONDS", "60")),
         database_path=os.getenv("DATABASE_PATH", DEFAULT_DB_PATH),
         jwt_secret=os.getenv("JWT_SECRET", "change-me"),
         jwt_issuer=os.getenv("JWT_ISSUER", "app-server"),
+        jwt_algorithm=os.getenv("JWT_ALGORITHM", "ES256"),
+        jwt_key_rotation_seconds=int(os.getenv("JWT_KEY_ROTATION_SECONDS", "604800")),
         jwt_ttl_seconds=int(os.getenv("JWT_TTL_SECONDS", "900")),
         oauth_refresh_ttl_seconds=int(os.getenv("OAUTH_REFRESH_TTL_SECONDS", "2592000")),
         admin_session_ttl_seconds=int(os.getenv("ADMIN_SESSION_TTL_SECONDS", "3600")),
@@ -56,13 +132,72 @@ def load_settings() -> Settings:
             os.getenv("ALLOWED_GOOGLE_EMAILS", "")
         ),
         google_login_allowed_domain=os.getenv("ALLOWED_GOOGLE_DOMAIN", "").strip(),
+        google_certs_url=os.getenv(
+            "GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v3/certs"
+        ),
         google_client_id=os.getenv("GOOGLE_CLIENT_ID", ""),
         google_client_secret=os.getenv("GOOGLE_CLIENT_SECRET", ""),
+        google_calendar_base_url=os.getenv(
+            "GOOGLE_CALENDAR_BASE_URL", "https://www.googleapis.com/calendar/v3"
+        ),
+        google_token_url=os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token"),
+        google_coalesce_reads=_env_flag("GOOGLE_COALESCE_READS", "true"),
+        circuit_failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        circuit_open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+        adaptive_timeouts_enabled=_env_flag("ADAPTIVE_TIMEOUTS_ENABLED", "true"),
+        adaptive_timeout_multiplier=float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3")),
+        adaptive_timeout_floor_seconds=float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR_SECONDS", "2")),
+        # Google Calendar's default quotas: 600 queries/minute per user and
+        # 10,000/minute per project. 0 turns a limit off.
+        google_rate_limit_per_credential=float(os.getenv("GOOGLE_RATE_LIMIT_PER_CREDENTIAL", "10")),
+        google_rate_limit_burst=int(os.getenv("GOOGLE_RATE_LIMIT_BURST", "20")),
+        google_rate_limit_global=float(os.getenv("GOOGLE_RATE_LIMIT_GLOBAL", "150")),
+        google_rate_limit_global_burst=int(os.getenv("GOOGLE_RATE_LIMIT_GLOBAL_BURST", "300")),
+        google_rate_limit_max_queue=int(os.getenv("GOOGLE_RATE_LIMIT_MAX_QUEUE", "200")),
+        google_rate_limit_max_wait_seconds=float(os.getenv("GOOGLE_RATE_LIMIT_MAX_WAIT_SECONDS", "10")),
         gemini_api_key=os.getenv("GEMINI_API_KEY", ""),
         gemini_base_url=os.getenv(
             "GEMINI_BASE_URL",
             "https://generativelanguage.googleapis.com/v1beta",
         ),
         gemini_model=os.getenv("GEMINI_MODEL", "models/gemini-3-flash-preview"),
+        gemini_timeout_seconds=float(os.getenv("GEMINI_TIMEOUT_SECONDS", "15")),
+        gemini_max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "2")),
+        gemini_max_concurrency_per_key=int(os.getenv("GEMINI_MAX_CONCURRENCY_PER_KEY", "4")),
+        gemini_hedge_enabled=_env_flag("GEMINI_HEDGE_ENABLED"),
+        gemini_embedding_model=os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004"),
+        llm_cache_enabled=_env_flag("LLM_CACHE_ENABLED"),
+        llm_cache_ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", "300")),
+        llm_cache_max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+        llm_cache_semantic_enabled=_env_flag("LLM_CACHE_SEMANTIC_ENABLED"),
+        llm_cache_similarity_threshold=float(os.getenv("LLM_CACHE_SIMILARITY_THRESHOLD", "0.95")),
         mcp_server_url=os.getenv("MCP_SERVER_URL", "http://127.0.0.1:9001/mcp"),
+        mcp_colocated=_env_flag("MCP_COLOCATED"),
+        token_vending_enabled=_env_flag("TOKEN_VENDING_ENABLED"),
+        token_vending_client_ids=_split_csv(os.getenv("TOKEN_VENDING_CLIENT_IDS", "")),
+        chat_llm_summary_enabled=_env_flag("CHAT_LLM_SUMMARY_ENABLED"),
+        # Per worker process, like the SQLite connection the turns share. 0 turns a cap off.
+        chat_max_concurrent_turns=int(os.getenv("CHAT_MAX_CONCURRENT_TURNS", "32")),
+        chat_max_turns_per_room=int(os.getenv("CHAT_MAX_TURNS_PER_ROOM", "2")),
+        chat_admission_max_queue=int(os.getenv("CHAT_ADMISSION_MAX_QUEUE", "64")),
+        chat_admission_max_wait_seconds=float(os.getenv("CHAT_ADMISSION_MAX_WAIT_SECONDS", "10")),
+        chat_ws_poll_seconds=float(os.getenv("CHAT_WS_POLL_SECONDS", "2")),
+        # How long a worker may serve a room's settings after another worker changed them. 0 disables the cache.
+        chat_room_context_ttl_seconds=float(os.getenv("CHAT_ROOM_CONTEXT_TTL_SECONDS", "30")),
+        blob_codec=os.getenv("BLOB_CODEC", "auto").strip().lower(),
+        blob_threshold_bytes=int(os.getenv("BLOB_THRESHOLD_BYTES", "4096")),
+        chat_history_page_size=int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50")),
+        chat_history_max_page_size=int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "200")),
+        chat_message_preview_chars=int(os.getenv("CHAT_MESSAGE_PREVIEW_CHARS", "2000")),
+        chat_jobs_enabled=_env_flag("CHAT_JOBS_ENABLED"),
+        chat_job_workers=int(os.getenv("CHAT_JOB_WORKERS", "4")),
+        chat_job_poll_seconds=float(os.getenv("CHAT_JOB_POLL_SECONDS", "0.5")),
+        # Renewed every third of this while a turn runs, so it only bounds how
+        # long the job of a worker that died waits before it is picked up again.
+        chat_job_lease_seconds=float(os.getenv("CHAT_JOB_LEASE_SECONDS", "120")),
+        chat_job_max_attempts=int(os.getenv("CHAT_JOB_MAX_ATTEMPTS", "3")),
+        trace_export=os.getenv("TRACE_EXPORT", "").strip().lower(),
+        trace_file=os.getenv("TRACE_FILE", DEFAULT_TRACE_FILE),
+        trace_sample_ratio=float(os.getenv("TRACE_SAMPLE_RATIO", "1.0")),
+        capture_file=os.getenv("CAPTURE_FILE", "").strip(),
     )
@@ -3,14 +3,91 @@ from __future__ import annotations
 import sqlite3
 from pathlib import Path
 
+from metrics import observe_query
+from tracing import db_span
+
+BUSY_TIMEOUT_SECONDS = 5.0
+
+
+class TracedConnection(sqlite3.Connection):
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        with db_span(sql), observe_query(sql):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters, /) -> sqlite3.Cursor:
+        with db_span(sql), observe_query(sql):
+            return super().executemany(sql, parameters)
+
+    def commit(self) -> None:
+        with db_span("COMMIT"), observe_query("COMMIT"):
+            super().commit()
+
 
 def connect(db_path: str) -> sqlite3.Connection:
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn = sqlite3.connect(
+        db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False, factory=TracedConnection
+    )
     conn.row_factory = sqlite3.Row
+    # WAL lets worker processes read while another one writes; writers wait up
+    # to the busy timeout for the lock instead of failing straight away.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
 
+def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, ddl: str) -> None:
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in columns:
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        except sqlite3.OperationalError as exc:
+            # Another worker starting at the same time may have added it first.
+            if "duplicate column" not in str(exc):
+                raise
+
+
+def _ensure_chat_search(cursor: sqlite3.Cursor) -> None:
+    # Full-text index over chat_messages.content, kept in sync by triggers. It
+    # is an external-content table, so the text itself is not stored twice.
+    # Messages moved to blobs are indexed by their inline preview.
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_messages_fts'"
+    ).fetchone()
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5(
+            content, content='chat_messages', content_rowid='rowid', tokenize='trigram'
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (rowid, content) VALUES (new.rowid, new.content);
+        END
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+        END
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF content ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+            INSERT INTO chat_messages_fts (rowid, content) VALUES (new.rowid, new.content);
+        END
+        """
+    )
+    if not exists:
+        # First start with search: index the history written before it.
+        cursor.execute("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild')")
+
+
 def init_db(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     cursor.execute(
@@ -41,6 +118,7 @@ def init_db(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    _ensure_column(cursor, "oauth_tokens", "extra_blob_id", "TEXT")
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS oauth_states (
@@ -105,6 +183,18 @@ def init_db(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jwt_signing_keys (
+            kid TEXT PRIMARY KEY,
+            algorithm TEXT NOT NULL,
+            private_key_pem TEXT NOT NULL,
+            public_jwk_json TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            retired_at INTEGER
+        )
+        """
+    )
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS dummy_oauth_codes (
@@ -123,10 +213,12 @@ def init_db(conn: sqlite3.Connection) -> None:
             name TEXT NOT NULL,
             llm_provider TEXT NOT NULL,
             llm_credential_id TEXT,
+            llm_cache_enabled INTEGER NOT NULL DEFAULT 1,
             created_at INTEGER
         )
         """
     )
+    _ensure_column(cursor, "chat_rooms", "llm_cache_enabled", "INTEGER NOT NULL DEFAULT 1")
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS chat_messages (
@@ -139,6 +231,11 @@ def init_db(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    _ensure_column(cursor, "chat_messages", "content_length", "INTEGER")
+    _ensure_column(cursor, "chat_messages", "content_blob_id", "TEXT")
+    _ensure_chat_search(cursor)
+    # Room history is read newest first by (created_at, rowid); rowid is part of every index entry.
+    cursor.execute("CREATE INDEX IF NOT EXISTS chat_messages_room_created ON chat_messages (room_id, created_at)")
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS chat_room_providers (
@@ -151,4 +248,40 @@ def init_db(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    # Large values (long assistant messages, token responses) live here compressed;
+    # the referencing row keeps the blob id and at most a short inline preview.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+            id TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            created_at INTEGER
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_jobs (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            room_id TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            result_message_id TEXT,
+            lease_until REAL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            updated_at REAL NOT NULL,
+            FOREIGN KEY(room_id) REFERENCES chat_rooms(id)
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS chat_jobs_status ON chat_jobs (status, seq)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS chat_jobs_room ON chat_jobs (room_id, status, seq)")
     conn.commit()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import suppress
+
+# Shared with mcp_server through common; re-exported so callers keep using deadline.*.
+from common.deadline import (
+    HEADER,
+    DeadlineExceeded,
+    DeadlineTransport,
+    budget,
+    clear,
+    headers,
+    parse_header,
+    remaining,
+)
+
+from metrics import REQUESTS_CANCELLED
+
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DeadlineMiddleware:
+    # Sets the request's deadline (the caller's header, capped by
+    # default_seconds) and cancels the handler when the client disconnects
+    # before the response is complete, which also cancels every upstream call
+    # it is awaiting.
+    def __init__(self, app, default_seconds: float = 0.0) -> None:
+        self.app = app
+        self.default_seconds = default_seconds
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = next((v.decode("latin-1") for k, v in scope["headers"] if k.decode("latin-1").lower() == HEADER), None)
+        seconds = [s for s in (parse_header(header), self.default_seconds or None) if s is not None]
+        messages: asyncio.Queue = asyncio.Queue()
+        started = False
+        finished = False
+
+        async def send_and_track(message) -> None:
+            nonlocal started, finished
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+            await send(message)
+
+        async def pump() -> None:
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        with budget(min(seconds) if seconds else None):
+            handler = asyncio.create_task(self.app(scope, messages.get, send_and_track))
+        reader = asyncio.create_task(pump())
+        try:
+            await asyncio.wait({handler, reader}, return_when=asyncio.FIRST_COMPLETED)
+            disconnected = reader.done() and reader.exception() is None
+            if disconnected and not handler.done() and not finished:
+                # Disconnected mid-request: stop the work instead of finishing it for nobody.
+                handler.cancel()
+                with suppress(asyncio.CancelledError):
+                    await handler
+                REQUESTS_CANCELLED.inc()
+                if not started:
+                    # Nobody reads this; it gives the outer middleware a status to record.
+                    with suppress(Exception):
+                        await send({"type": "http.response.start", "status": CLIENT_CLOSED_REQUEST, "headers": []})
+                        await send({"type": "http.response.body", "body": b""})
+                return
+            await handler
+        finally:
+            reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await reader
+            if not handler.done():
+                handler.cancel()
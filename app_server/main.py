@@ -1,11 +1,36 @@
 from __future__ import annotations
 
+import asyncio
+import math
+from contextlib import asynccontextmanager, suppress
+
+from common.capture import CaptureMiddleware, configure as configure_capture
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+import admission
+from auth.jwks_cache import JWKSCache
+from auth.keys import SigningKeyStore
+import blobs
+import chat_hub
+import chat_jobs
 from config import load_settings
 from db import connect, init_db
+from deadline import DeadlineExceeded, DeadlineMiddleware
+import mcp_local
+from metrics import (
+    MetricsMiddleware,
+    mark_process_dead,
+    monitor_event_loop_lag,
+    prepare_multiprocess,
+)
+from providers import circuit, gemini, google_calendar, rate_limit
+from providers.http import aclose_clients
+from providers.llm_cache import ResponseCache
+import room_context
+from tracing import TracingMiddleware, configure as configure_tracing
 from routes import (
     admin,
     api,
@@ -13,6 +38,9 @@ from routes import (
     chat,
     dummy_oauth,
     google_login,
+    health,
+    jwks,
+    metrics,
     oauth,
     oauth_authorize,
     oauth_metadata,
@@ -20,16 +48,88 @@ from routes import (
 )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    job_workers = chat_jobs.start(app.state, chat.run_turn)
+    yield
+    await chat_jobs.stop(job_workers)
+    lag_monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await lag_monitor
+    await aclose_clients()
+    mark_process_dead()
+
+
 def create_app() -> FastAPI:
     load_dotenv()
     settings = load_settings()
-    app = FastAPI(title="App Server")
+    app = FastAPI(title="App Server", lifespan=lifespan)
+    app.add_middleware(DeadlineMiddleware, default_seconds=settings.request_deadline_seconds)
+    if configure_tracing(settings.trace_export, settings.trace_file, settings.trace_sample_ratio):
+        app.add_middleware(TracingMiddleware)
+    if configure_capture("app-server", settings.capture_file, skip_prefixes=("/static", "/metrics")):
+        app.add_middleware(CaptureMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
     conn = connect(settings.database_path)
     init_db(conn)
 
     app.state.db = conn
     app.state.settings = settings
+    app.state.signing_keys = SigningKeyStore(
+        conn,
+        settings.jwt_algorithm,
+        settings.jwt_key_rotation_seconds,
+        settings.jwt_ttl_seconds,
+        secret=settings.jwt_secret,
+    )
+    app.state.google_certs = JWKSCache(settings.google_certs_url)
+    gemini.configure(settings)
+    google_calendar.configure(settings)
+    rate_limit.configure(settings)
+    circuit.configure(settings)
+    admission.configure(settings)
+    chat_hub.configure(settings)
+    blobs.configure(settings)
+    room_context.configure(settings)
+    mcp_local.configure(conn, settings)
+    app.state.llm_cache = None
+    if settings.llm_cache_enabled:
+        app.state.llm_cache = ResponseCache(
+            settings.llm_cache_max_entries,
+            settings.llm_cache_ttl_seconds,
+            semantic_enabled=settings.llm_cache_semantic_enabled,
+            similarity_threshold=settings.llm_cache_similarity_threshold,
+        )
+
+    @app.exception_handler(rate_limit.RateLimited)
+    async def rate_limited(request: Request, exc: rate_limit.RateLimited):
+        return JSONResponse(
+            {"detail": str(exc)},
+            status_code=429,
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+
+    @app.exception_handler(admission.Overloaded)
+    async def overloaded(request: Request, exc: admission.Overloaded):
+        return JSONResponse(
+            {"detail": str(exc)},
+            status_code=503,
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+
+    @app.exception_handler(DeadlineExceeded)
+    async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+        return JSONResponse({"detail": str(exc)}, status_code=504)
+
+    @app.exception_handler(circuit.CircuitOpen)
+    async def circuit_open(request: Request, exc: circuit.CircuitOpen):
+        return JSONResponse(
+            {"detail": str(exc)},
+            status_code=503,
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after))), "X-Circuit-Open": exc.host},
+        )
 
     app.include_router(google_login.router)
     app.include_router(dummy_oauth.router)
@@ -37,6 +137,9 @@ def create_app() -> FastAPI:
     app.include_router(oauth.router)
     app.include_router(oauth_authorize.router)
     app.include_router(oauth_metadata.router)
+    app.include_router(jwks.router)
+    app.include_router(metrics.router)
+    app.include_router(health.router)
     app.include_router(oauth_registration.router)
     app.include_router(auth.router)
     app.include_router(chat.router)
@@ -53,11 +156,27 @@ def main() -> None:
     settings = load_settings()
     import uvicorn
 
+    if settings.app_reload:
+        uvicorn.run(
+            "main:app",
+            host=settings.app_host,
+            port=settings.app_port,
+            reload=True,
+        )
+        return
+    if settings.app_workers > 1:
+        prepare_multiprocess("app-metrics-")
     uvicorn.run(
         "main:app",
         host=settings.app_host,
         port=settings.app_port,
-        reload=True,
+        workers=settings.app_workers,
+        loop=settings.app_loop,
+        http=settings.app_http,
+        limit_concurrency=settings.app_limit_concurrency or None,
+        backlog=settings.app_backlog,
+        timeout_keep_alive=settings.app_keepalive_seconds,
+        timeout_graceful_shutdown=settings.app_graceful_shutdown_seconds,
     )
 
 
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from providers import google_calendar, rate_limit
+from routes.api import _get_token
+
+# Same tool names and arguments as mcp_server's gcal tools, the only ones the
+# chat route offers Gemini, but the tools call the provider layer directly.
+# The chat route talks to this server through fastmcp's in-memory transport
+# when MCP_COLOCATED is on, so a tool call never leaves the process;
+# mcp_server keeps serving outside clients.
+server = FastMCP("app-server-local")
+
+
+class RateLimitCredentialMiddleware(Middleware):
+    # Google quota is counted per credential, like the /api routes do.
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        with rate_limit.credential((context.message.arguments or {}).get("credential_id")):
+            return await call_next(context)
+
+
+server.add_middleware(RateLimitCredentialMiddleware())
+
+_conn = None
+_settings = None
+
+
+def configure(conn, settings) -> None:
+    global _conn, _settings
+    _conn = conn
+    _settings = settings
+
+
+async def _access_token(credential_id: str) -> str:
+    token_row = await _get_token(_conn, _settings, credential_id)
+    if not token_row:
+        raise ToolError("token not found")
+    return token_row["access_token"]
+
+
+@server.tool(name="gcal.list_calendars")
+async def gcal_list_calendars(
+    credential_id: str,
+    max_results: int | None = None,
+    page_token: str | None = None,
+    min_access_role: str | None = None,
+    fields: str | None = None,
+):
+    return await google_calendar.list_calendars(
+        await _access_token(credential_id),
+        max_results=max_results,
+        page_token=page_token,
+        min_access_role=min_access_role,
+        fields=fields,
+    )
+
+
+@server.tool(name="gcal.list_events")
+async def gcal_list_events(
+    credential_id: str,
+    calendar_id: str,
+    max_results: int | None = None,
+    page_token: str | None = None,
+    time_min: str | None = None,
+    time_max: str | None = None,
+    order_by: str | None = None,
+    single_events: bool | None = None,
+    q: str | None = None,
+    show_deleted: bool | None = None,
+    time_zone: str | None = None,
+    fields: str | None = None,
+):
+    return await google_calendar.list_events(
+        await _access_token(credential_id),
+        calendar_id,
+        max_results=max_results,
+        page_token=page_token,
+        time_min=time_min,
+        time_max=time_max,
+        order_by=order_by,
+        single_events=single_events,
+        q=q,
+        show_deleted=show_deleted,
+        time_zone=time_zone,
+        fields=fields,
+    )
+
+
+@server.tool(name="gcal.create_event")
+async def gcal_create_event(credential_id: str, payload: dict):
+    access_token = await _access_token(credential_id)
+    try:
+        return await google_calendar.create_event(access_token, payload)
+    except ValueError as exc:
+        raise ToolError(str(exc)) from exc
+
+
+@server.tool(name="gcal.get_event")
+async def gcal_get_event(credential_id: str, calendar_id: str, event_id: str, fields: str | None = None):
+    return await google_calendar.get_event(await _access_token(credential_id), calendar_id, event_id, fields=fields)
+
+
+@server.tool(name="gcal.update_event")
+async def gcal_update_event(credential_id: str, calendar_id: str, event_id: str, payload: dict):
+    # Mirrors /api/google_calendar/{id}/update_event, which reads the event
+    # body from a nested "payload" or "event" key.
+    event_payload = payload.get("payload") or payload.get("event") or {}
+    return await google_calendar.update_event(await _access_token(credential_id), calendar_id, event_id, event_payload)
+
+
+@server.tool(name="gcal.delete_event")
+async def gcal_delete_event(credential_id: str, calendar_id: str, event_id: str):
+    return await google_calendar.delete_event(await _access_token(credential_id), calendar_id, event_id)
+
+
+@server.tool(name="gcal.availability")
+async def gcal_availability(
+    credential_id: str,
+    calendar_id: str,
+    time_min: str,
+    time_max: str,
+    time_zone: str | None = None,
+):
+    return await google_calendar.availability(
+        await _access_token(credential_id),
+        calendar_id,
+        time_min,
+        time_max,
+        time_zone=time_zone,
+    )
+
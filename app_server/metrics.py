@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LAG_INTERVAL_SECONDS = 0.5
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "app_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "app_http_requests_in_flight", "HTTP requests currently being served.", multiprocess_mode="livesum"
+)
+REQUESTS_CANCELLED = Counter(
+    "app_http_requests_cancelled", "Requests whose handler was cancelled because the client disconnected."
+)
+UPSTREAM_SECONDS = Histogram(
+    "app_upstream_request_duration_seconds",
+    "Outgoing request latency to Google and Gemini by host.",
+    ["host", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "app_db_query_duration_seconds",
+    "SQLite statement latency by operation.",
+    ["operation"],
+    buckets=DB_BUCKETS,
+)
+CIRCUIT_STATE = Gauge(
+    "app_circuit_state",
+    "Upstream circuit breaker state by host (0 closed, 1 half-open, 2 open).",
+    ["host"],
+    multiprocess_mode="max",
+)
+CIRCUIT_REJECTIONS = Counter(
+    "app_circuit_rejections", "Upstream requests failed fast by an open circuit.", ["host"]
+)
+UPSTREAM_TIMEOUT_SECONDS = Gauge(
+    "app_upstream_timeout_seconds",
+    "Current adaptive read timeout by upstream host and operation.",
+    ["host", "operation"],
+    multiprocess_mode="max",
+)
+GOOGLE_COALESCED_REQUESTS = Counter(
+    "app_google_coalesced_requests",
+    "Google Calendar reads answered by an identical request already in flight.",
+    ["endpoint"],
+)
+RATE_LIMIT_QUEUE_DEPTH = Gauge(
+    "app_google_rate_limit_queue_depth",
+    "Google requests waiting for a rate limit token.",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "app_google_rate_limit_wait_seconds",
+    "Time Google requests spent waiting for a rate limit token.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "app_google_rate_limit_rejections", "Google requests rejected by the rate limiter.", ["reason"]
+)
+CHAT_TURNS_IN_FLIGHT = Gauge(
+    "app_chat_turns_in_flight", "Chat turns currently admitted.", multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "app_chat_admission_queue_depth", "Chat turns waiting for admission.", multiprocess_mode="livesum"
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "app_chat_admission_wait_seconds", "Time chat turns waited for admission.", buckets=LATENCY_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    "app_chat_admission_rejections", "Chat turns shed by admission control.", ["reason"]
+)
+CHAT_WS_CONNECTIONS = Gauge(
+    "app_chat_ws_connections", "Open chat room WebSockets.", multiprocess_mode="livesum"
+)
+CHAT_WS_RESYNCS = Counter(
+    "app_chat_ws_resyncs", "Chat WebSockets told to reload because they fell too far behind."
+)
+CHAT_JOBS = Counter("app_chat_jobs", "Chat turn jobs finished by outcome.", ["outcome"])
+CHAT_JOBS_RUNNING = Gauge(
+    "app_chat_jobs_running", "Chat turn jobs currently being processed.", multiprocess_mode="livesum"
+)
+CHAT_JOB_WORKER_ERRORS = Counter(
+    "app_chat_job_worker_errors", "Unexpected errors in chat job workers, which back off and carry on."
+)
+CHAT_JOB_QUEUE_SECONDS = Histogram(
+    "app_chat_job_queue_seconds",
+    "Time chat turn jobs waited in the queue before a worker picked them up.",
+    buckets=LATENCY_BUCKETS,
+)
+ROOM_CONTEXT_LOOKUPS = Counter(
+    "app_chat_room_context_lookups", "Chat room context cache lookups by result.", ["result"]
+)
+LLM_CACHE_LOOKUPS = Counter("app_llm_cache_lookups", "LLM response cache lookups by result.", ["result"])
+LLM_CACHE_ENTRIES = Gauge("app_llm_cache_entries", "LLM response cache entries.", multiprocess_mode="livesum")
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "app_event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer.",
+    buckets=LAG_BUCKETS,
+)
+# process_cpu_seconds_total is not available with several workers; this one
+# is, and keeps counting the CPU of workers that have exited.
+WORKER_CPU_SECONDS = Gauge(
+    "app_worker_cpu_seconds", "CPU time used by the server's worker processes.", multiprocess_mode="sum"
+)
+
+
+@contextmanager
+def observe_query(sql: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        operation = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "SQL"
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            UPSTREAM_SECONDS.labels(request.url.host, request.method, status).observe(
+                time.perf_counter() - start
+            )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Label by route template so path parameters do not explode cardinality.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+async def monitor_event_loop_lag(interval: float = LAG_INTERVAL_SECONDS) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
+        WORKER_CPU_SECONDS.set(time.process_time())
+
+
+# With several workers each process keeps its own samples; prometheus_client
+# shares them through files in PROMETHEUS_MULTIPROC_DIR, which has to be set
+# before the workers import this module.
+def prepare_multiprocess(prefix: str) -> None:
+    directory = Path(os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix=prefix)))
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.db"):
+        stale.unlink()
+
+
+def latest() -> bytes:
+    WORKER_CPU_SECONDS.set(time.process_time())
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead() -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+
+def _payload(result: dict) -> dict | None:
+    for key in ("structured_content", "data"):
+        value = result.get(key)
+        if isinstance(value, dict):
+            return value
+    for item in result.get("content") or []:
+        if isinstance(item, dict) and item.get("type") == "text":
+            try:
+                value = json.loads(item.get("text") or "")
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value
+    return None
+
+
+def _format_time(value: dict | str | None) -> str:
+    if isinstance(value, dict):
+        if value.get("date"):
+            return f"{value['date']} (終日)"
+        value = value.get("dateTime")
+    if not value:
+        return "?"
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M")
+    except ValueError:
+        return value
+
+
+def _event_line(event: dict) -> str:
+    line = f"- {_format_time(event.get('start'))} 〜 {_format_time(event.get('end'))} {event.get('summary') or '(タイトルなし)'}"
+    if event.get("location"):
+        line += f" @ {event['location']}"
+    return line
+
+
+def _render_events(payload: dict) -> str:
+    events = payload.get("items") or []
+    if not events:
+        return "該当する予定はありません。"
+    lines = [f"予定は {len(events)} 件です。"]
+    lines.extend(_event_line(event) for event in events)
+    if payload.get("nextPageToken"):
+        lines.append("(続きがあります)")
+    return "\n".join(lines)
+
+
+def _render_calendars(payload: dict) -> str:
+    calendars = payload.get("items") or []
+    if not calendars:
+        return "カレンダーはありません。"
+    lines = [f"カレンダーは {len(calendars)} 件です。"]
+    for calendar in calendars:
+        label = calendar.get("summaryOverride") or calendar.get("summary") or calendar.get("id")
+        suffix = " (メイン)" if calendar.get("primary") else ""
+        lines.append(f"- {label}{suffix} [{calendar.get('id')}]")
+    return "\n".join(lines)
+
+
+def _render_free_busy(payload: dict) -> str:
+    lines = [f"{_format_time(payload.get('timeMin'))} 〜 {_format_time(payload.get('timeMax'))} の空き状況:"]
+    for calendar_id, calendar in (payload.get("calendars") or {}).items():
+        busy = calendar.get("busy") or []
+        if calendar.get("errors"):
+            lines.append(f"- {calendar_id}: 取得できませんでした")
+        elif not busy:
+            lines.append(f"- {calendar_id}: 予定なし (終日空いています)")
+        else:
+            lines.append(f"- {calendar_id}: {len(busy)} 件の予定あり")
+            lines.extend(
+                f"  - {_format_time(slot.get('start'))} 〜 {_format_time(slot.get('end'))}" for slot in busy
+            )
+    return "\n".join(lines)
+
+
+def _render_event(tool_name: str, event: dict) -> str:
+    heading = {
+        "gcal.create_event": "予定を作成しました。",
+        "gcal.update_event": "予定を更新しました。",
+    }.get(tool_name, "予定の詳細です。")
+    lines = [heading, _event_line(event)]
+    if event.get("description"):
+        lines.append(event["description"])
+    if event.get("htmlLink"):
+        lines.append(event["htmlLink"])
+    return "\n".join(lines)
+
+
+# Deterministic text for common Calendar tool results, so the chat turn does
+# not need another model round trip when the function-result turn is empty.
+# Returns None for shapes it does not recognise.
+def render_tool_result(tool_name: str | None, result: dict) -> str | None:
+    if result.get("is_error"):
+        return None
+    payload = _payload(result)
+    if payload is None:
+        return None
+    kind = payload.get("kind")
+    if tool_name == "gcal.delete_event" and payload.get("deleted"):
+        return "予定を削除しました。"
+    if kind == "calendar#events":
+        return _render_events(payload)
+    if kind == "calendar#calendarList":
+        return _render_calendars(payload)
+    if kind == "calendar#freeBusy" or "calendars" in payload:
+        return _render_free_busy(payload)
+    if kind == "calendar#event":
+        return _render_event(tool_name, payload)
+    return None
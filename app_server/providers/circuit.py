@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from common import circuit as common_circuit
+from common.circuit import CircuitBreakerTransport, CircuitMetrics, CircuitOpen, CircuitOptions
+
+from metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE, UPSTREAM_TIMEOUT_SECONDS
+
+
+def configure(settings) -> None:
+    common_circuit.configure(
+        CircuitOptions(
+            failure_threshold=settings.circuit_failure_threshold,
+            open_seconds=settings.circuit_open_seconds,
+            adaptive_timeouts=settings.adaptive_timeouts_enabled,
+            timeout_multiplier=settings.adaptive_timeout_multiplier,
+            timeout_floor_seconds=settings.adaptive_timeout_floor_seconds,
+        ),
+        CircuitMetrics(CIRCUIT_STATE, CIRCUIT_REJECTIONS, UPSTREAM_TIMEOUT_SECONDS),
+    )
@@ -1,7 +1,48 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import time
+from collections import deque
+from dataclasses import dataclass
+
 import httpx
 
+from providers.circuit import CircuitOpen
+from providers.http import backoff_delay, get_client, retry_after_seconds
+from tracing import traced
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HEDGE_MIN_SAMPLES = 20
+
+
+@dataclass
+class GeminiOptions:
+    timeout: float = 15.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_cap: float = 8.0
+    max_concurrency_per_key: int = 4
+    hedge_enabled: bool = False
+
+
+_options = GeminiOptions()
+_semaphores: dict[str, asyncio.Semaphore] = {}
+_latencies: deque[float] = deque(maxlen=200)
+
+
+def configure(settings) -> None:
+    global _options
+    _options = GeminiOptions(
+        timeout=settings.gemini_timeout_seconds,
+        max_retries=settings.gemini_max_retries,
+        # The limit is per API key across the whole server, so each worker
+        # process gets its share.
+        max_concurrency_per_key=max(1, settings.gemini_max_concurrency_per_key // max(1, settings.app_workers)),
+        hedge_enabled=settings.gemini_hedge_enabled,
+    )
+    _semaphores.clear()
+
 
 def _extract_text(payload: dict) -> str:
     try:
@@ -31,21 +72,91 @@ def _normalize_model(model: str) -> str:
     return f"models/{model}"
 
 
+def _semaphore(api_key: str) -> asyncio.Semaphore:
+    key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    semaphore = _semaphores.get(key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_options.max_concurrency_per_key)
+        _semaphores[key] = semaphore
+    return semaphore
+
+
+def _hedge_delay() -> float | None:
+    if not _options.hedge_enabled or len(_latencies) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(_latencies)
+    return ordered[int(len(ordered) * 0.95) - 1]
+
+
+async def _send(url: str, body: dict, headers: dict) -> httpx.Response:
+    started = time.monotonic()
+    resp = await get_client("gemini", _options.timeout).post(url, json=body, headers=headers)
+    if resp.status_code < 400:
+        _latencies.append(time.monotonic() - started)
+    return resp
+
+
+async def _send_hedged(url: str, body: dict, headers: dict) -> httpx.Response:
+    delay = _hedge_delay()
+    if delay is None:
+        return await _send(url, body, headers)
+    first = asyncio.create_task(_send(url, body, headers))
+    done, _pending = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+    # The first attempt is slower than p95: race a second copy against it.
+    tasks = {first, asyncio.create_task(_send(url, body, headers))}
+    error: Exception | None = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                return await next_done
+            except httpx.HTTPError as exc:
+                error = exc
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _post(api_key: str, url: str, body: dict) -> httpx.Response:
+    headers = {"x-goog-api-key": api_key}
+    async with _semaphore(api_key):
+        for attempt in range(_options.max_retries + 1):
+            last_attempt = attempt == _options.max_retries
+            try:
+                resp = await _send_hedged(url, body, headers)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, _options.backoff_base, _options.backoff_cap))
+                continue
+            if resp.status_code not in RETRY_STATUSES or last_attempt:
+                return resp
+            delay = retry_after_seconds(resp)
+            if delay is None:
+                delay = backoff_delay(attempt, _options.backoff_base, _options.backoff_cap)
+            elif delay > _options.backoff_cap:
+                # Asked to back off longer than we hold a request open for.
+                return resp
+            await asyncio.sleep(delay)
+
+
+@traced("gemini.generate")
 async def generate(api_key: str, base_url: str, model: str, payload: dict) -> dict:
     if not api_key:
         return {"error": "GEMINI_API_KEY not set"}
     prompt = payload.get("prompt", "")
     model = _normalize_model(payload.get("model", model))
     body = {"contents": _build_contents(prompt)}
-    url = f"{base_url}/{model}:generateContent?key={api_key}"
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.post(url, json=body)
+    resp = await _post(api_key, f"{base_url}/{model}:generateContent", body)
     if resp.status_code >= 400:
         return {"error": "gemini request failed", "detail": resp.text}
     data = resp.json()
     return {"text": _extract_text(data), "raw": data}
 
 
+@traced("gemini.generate_with_tools")
 async def generate_with_tools(api_key: str, base_url: str, model: str, prompt: str, tools: list[dict]) -> dict:
     if not api_key:
         return {"error": "GEMINI_API_KEY not set"}
@@ -54,15 +165,14 @@ async def generate_with_tools(api_key: str, base_url: str, model: str, prompt: s
         "contents": _build_contents(prompt),
         "tools": tools,
     }
-    url = f"{base_url}/{model}:generateContent?key={api_key}"
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.post(url, json=body)
+    resp = await _post(api_key, f"{base_url}/{model}:generateContent", body)
     if resp.status_code >= 400:
         return {"error": "gemini request failed", "detail": resp.text}
     data = resp.json()
     return {"text": _extract_text(data), "function_call_part": _extract_function_call_part(data), "raw": data}
 
 
+@traced("gemini.generate_with_function_result")
 async def generate_with_function_result(
     api_key: str,
     base_url: str,
@@ -95,10 +205,23 @@ async def generate_with_function_result(
         "contents": contents,
         "tools": tools,
     }
-    url = f"{base_url}/{model}:generateContent?key={api_key}"
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.post(url, json=body)
+    resp = await _post(api_key, f"{base_url}/{model}:generateContent", body)
     if resp.status_code >= 400:
         return {"error": "gemini request failed", "detail": resp.text}
     data = resp.json()
     return {"text": _extract_text(data), "raw": data}
+
+
+@traced("gemini.embed")
+async def embed(api_key: str, base_url: str, model: str, text: str) -> list[float] | None:
+    if not api_key:
+        return None
+    model = _normalize_model(model)
+    body = {"content": {"parts": [{"text": text}]}}
+    try:
+        resp = await _post(api_key, f"{base_url}/{model}:embedContent", body)
+    except (httpx.HTTPError, CircuitOpen):
+        return None
+    if resp.status_code >= 400:
+        return None
+    return resp.json().get("embedding", {}).get("values")
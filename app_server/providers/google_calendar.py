@@ -1,15 +1,121 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hashlib
+import json
+
+from common.capture import CaptureTransport
 import httpx
 
+import deadline
+from deadline import DeadlineExceeded, DeadlineTransport
+from metrics import GOOGLE_COALESCED_REQUESTS, MetricsTransport
+from providers.circuit import CircuitBreakerTransport
+from providers import rate_limit
+from providers.rate_limit import RateLimitTransport
+from tracing import TracingTransport, traced
+
 BASE_URL = "https://www.googleapis.com/calendar/v3"
 TOKEN_URL = "https://oauth2.googleapis.com/token"
+COALESCE_READS = True
+
+# key -> [shared task, number of callers waiting on it]
+_in_flight: dict[tuple, list] = {}
+
+
+def configure(settings) -> None:
+    global BASE_URL, TOKEN_URL, COALESCE_READS
+    BASE_URL = settings.google_calendar_base_url.rstrip("/")
+    TOKEN_URL = settings.google_token_url
+    COALESCE_READS = settings.google_coalesce_reads
 
 
 def _auth_headers(access_token: str) -> dict:
     return {"Authorization": f"Bearer {access_token}"}
 
 
+def _client() -> httpx.AsyncClient:
+    # The breaker sits below the rate limiter so its latency samples (and
+    # adaptive timeouts) see only Google's time, not the wait for quota.
+    return httpx.AsyncClient(
+        timeout=10.0,
+        transport=TracingTransport(
+            RateLimitTransport(CircuitBreakerTransport(DeadlineTransport(MetricsTransport(CaptureTransport()))))
+        ),
+    )
+
+
+def _flight_key(access_token: str, method: str, url: str, params: dict | None, body: dict | None) -> tuple:
+    return (
+        hashlib.sha256(access_token.encode("utf-8")).hexdigest(),
+        # Batch reads never share a call with interactive ones, which would wait in the batch queue.
+        rate_limit.current_priority(),
+        method,
+        url,
+        json.dumps(params or {}, sort_keys=True),
+        json.dumps(body or {}, sort_keys=True),
+    )
+
+
+async def _read(
+    endpoint: str, access_token: str, method: str, url: str, params: dict | None = None, body: dict | None = None
+) -> dict:
+    # Single flight for reads: identical concurrent requests for the same
+    # credential share one upstream call and its result (or error). Never
+    # used for mutations.
+    async def fetch() -> dict:
+        async with _client() as client:
+            resp = await client.request(
+                method,
+                url,
+                headers=_auth_headers(access_token),
+                params=params,
+                json=body,
+                extensions={"operation": endpoint},
+            )
+        resp.raise_for_status()
+        return resp.json()
+
+    if not COALESCE_READS:
+        return await fetch()
+    key = _flight_key(access_token, method, url, params, body)
+    flight = _in_flight.get(key)
+    if flight is None:
+        # Runs without the first caller's deadline: each waiter applies its own
+        # below, so a caller with a longer budget is not cut short by it.
+        context = contextvars.copy_context()
+        context.run(deadline.clear)
+        task = asyncio.create_task(fetch(), context=context)
+        flight = _in_flight[key] = [task, 0]
+        task.add_done_callback(lambda done: _in_flight.pop(key, None) if _in_flight.get(key) is flight else None)
+        # Keeps "exception never retrieved" quiet when every waiter was cancelled.
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    else:
+        GOOGLE_COALESCED_REQUESTS.labels(endpoint).inc()
+    task = flight[0]
+    flight[1] += 1
+    try:
+        # A cancelled waiter must not cancel the call the others are waiting on.
+        left = deadline.remaining()
+        if left is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(left, 0))
+        except TimeoutError:
+            if task.done():
+                raise
+            raise DeadlineExceeded(f"deadline exceeded waiting for {endpoint}") from None
+    finally:
+        flight[1] -= 1
+        if flight[1] == 0 and not task.done():
+            # Every caller is gone; nobody needs the answer.
+            task.cancel()
+            if _in_flight.get(key) is flight:
+                del _in_flight[key]
+
+
+@traced("google_calendar.list_calendars")
 async def list_calendars(
     access_token: str,
     max_results: int | None = None,
@@ -26,16 +132,10 @@ async def list_calendars(
         params["minAccessRole"] = min_access_role
     if fields:
         params["fields"] = fields
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(
-            f"{BASE_URL}/users/me/calendarList",
-            headers=_auth_headers(access_token),
-            params=params or None,
-        )
-    resp.raise_for_status()
-    return resp.json()
+    return await _read("list_calendars", access_token, "GET", f"{BASE_URL}/users/me/calendarList", params=params or None)
 
 
+@traced("google_calendar.list_events")
 async def list_events(
     access_token: str,
     calendar_id: str,
@@ -71,64 +171,62 @@ async def list_events(
         params["timeZone"] = time_zone
     if fields:
         params["fields"] = fields
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(
-            f"{BASE_URL}/calendars/{calendar_id}/events",
-            headers=_auth_headers(access_token),
-            params=params or None,
-        )
-    resp.raise_for_status()
-    return resp.json()
+    return await _read(
+        "list_events", access_token, "GET", f"{BASE_URL}/calendars/{calendar_id}/events", params=params or None
+    )
 
 
+@traced("google_calendar.get_event")
 async def get_event(access_token: str, calendar_id: str, event_id: str, fields: str | None = None) -> dict:
     params = {"fields": fields} if fields else None
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(
-            f"{BASE_URL}/calendars/{calendar_id}/events/{event_id}",
-            headers=_auth_headers(access_token),
-            params=params,
-        )
-    resp.raise_for_status()
-    return resp.json()
+    return await _read(
+        "get_event", access_token, "GET", f"{BASE_URL}/calendars/{calendar_id}/events/{event_id}", params=params
+    )
 
 
+@traced("google_calendar.create_event")
 async def create_event(access_token: str, payload: dict) -> dict:
     calendar_id = payload.get("calendar_id")
     if not calendar_id:
         raise ValueError("calendar_id required")
     body = payload.get("event") or payload
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with _client() as client:
         resp = await client.post(
             f"{BASE_URL}/calendars/{calendar_id}/events",
             headers=_auth_headers(access_token),
             json=body,
+            extensions={"operation": "create_event"},
         )
     resp.raise_for_status()
     return resp.json()
 
 
+@traced("google_calendar.update_event")
 async def update_event(access_token: str, calendar_id: str, event_id: str, payload: dict) -> dict:
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with _client() as client:
         resp = await client.patch(
             f"{BASE_URL}/calendars/{calendar_id}/events/{event_id}",
             headers=_auth_headers(access_token),
             json=payload,
+            extensions={"operation": "update_event"},
         )
     resp.raise_for_status()
     return resp.json()
 
 
+@traced("google_calendar.delete_event")
 async def delete_event(access_token: str, calendar_id: str, event_id: str) -> dict:
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with _client() as client:
         resp = await client.delete(
             f"{BASE_URL}/calendars/{calendar_id}/events/{event_id}",
             headers=_auth_headers(access_token),
+            extensions={"operation": "delete_event"},
         )
     resp.raise_for_status()
     return {"deleted": True}
 
 
+@traced("google_calendar.availability")
 async def availability(access_token: str, calendar_id: str, time_min: str, time_max: str, time_zone: str | None = None) -> dict:
     body = {
         "timeMin": time_min,
@@ -137,16 +235,11 @@ async def availability(access_token: str, calendar_id: str, time_min: str, time_
     }
     if time_zone:
         body["timeZone"] = time_zone
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.post(
-            f"{BASE_URL}/freeBusy",
-            headers=_auth_headers(access_token),
-            json=body,
-        )
-    resp.raise_for_status()
-    return resp.json()
+    # freeBusy is a POST but only reads, so it is coalesced too.
+    return await _read("availability", access_token, "POST", f"{BASE_URL}/freeBusy", body=body)
 
 
+@traced("google_calendar.refresh_access_token")
 async def refresh_access_token(refresh_token: str, client_id: str, client_secret: str) -> dict:
     data = {
         "client_id": client_id,
@@ -154,7 +247,7 @@ async def refresh_access_token(refresh_token: str, client_id: str, client_secret
         "refresh_token": refresh_token,
         "grant_type": "refresh_token",
     }
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.post(TOKEN_URL, data=data)
+    async with _client() as client:
+        resp = await client.post(TOKEN_URL, data=data, extensions={"operation": "token"})
     resp.raise_for_status()
     return resp.json()
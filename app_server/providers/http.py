@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from common.capture import CaptureTransport
+import httpx
+
+from deadline import DeadlineTransport
+from metrics import MetricsTransport
+from providers.circuit import CircuitBreakerTransport
+from tracing import TracingTransport
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(name: str, timeout: float) -> httpx.AsyncClient:
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=TracingTransport(
+                CircuitBreakerTransport(DeadlineTransport(MetricsTransport(CaptureTransport(transport))))
+            ),
+        )
+        _clients[name] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Full jitter: spreads retries from concurrent callers across the window.
+    return random.uniform(0, min(cap, base * (2**attempt)))
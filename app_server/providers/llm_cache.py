@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from metrics import LLM_CACHE_ENTRIES, LLM_CACHE_LOOKUPS
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return WHITESPACE.sub(" ", prompt).strip().casefold().rstrip("?!.。？！")
+
+
+def digest(value) -> str:
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _unit(vector: list[float]) -> list[float] | None:
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        return None
+    return [v / norm for v in vector]
+
+
+# LRU + TTL cache of LLM responses. The exact tier is keyed by model, tool set,
+# context and normalized prompt. The optional semantic tier keeps a unit
+# embedding per entry and answers a miss with the closest prompt in the same
+# model/tools/context scope when its cosine similarity clears the threshold.
+# It only serves calls without tools: prompts that differ in a single word
+# ("today" vs "tomorrow") embed close together but need different function
+# call arguments.
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        semantic_enabled: bool = False,
+        similarity_threshold: float = 0.95,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_enabled = semantic_enabled
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict[str, tuple[float, str, dict]] = OrderedDict()
+        self._vectors: dict[str, list[float]] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _scope, value = entry
+        if expires_at <= time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def _put(self, key: str, scope: str, value: dict, vector: list[float] | None) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, scope, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        if vector is not None:
+            self._vectors[key] = vector
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+        LLM_CACHE_ENTRIES.set(len(self._entries))
+
+    def _evict(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._vectors.pop(key, None)
+        LLM_CACHE_ENTRIES.set(len(self._entries))
+
+    def _nearest(self, scope: str, vector: list[float]) -> str | None:
+        best_key, best_score = None, self.similarity_threshold
+        for key, candidate in self._vectors.items():
+            if self._entries[key][1] != scope:
+                continue
+            score = sum(a * b for a, b in zip(vector, candidate))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    async def get_or_call(
+        self,
+        *,
+        model: str,
+        tools: list[dict],
+        prompt: str,
+        context,
+        call: Callable[[], Awaitable[dict]],
+        embed: Callable[[str], Awaitable[list[float] | None]] | None = None,
+    ) -> dict:
+        scope = digest([model, digest(tools), digest(context)])
+        normalized = normalize_prompt(prompt)
+        key = digest([scope, normalized])
+        cached = self._get(key)
+        if cached is not None:
+            self.hits += 1
+            LLM_CACHE_LOOKUPS.labels(result="hit").inc()
+            return cached
+
+        vector = None
+        if self.semantic_enabled and embed is not None and not tools:
+            embedding = await embed(normalized)
+            vector = _unit(embedding) if embedding else None
+            if vector is not None:
+                nearest = self._nearest(scope, vector)
+                cached = self._get(nearest) if nearest else None
+                if cached is not None:
+                    self.semantic_hits += 1
+                    LLM_CACHE_LOOKUPS.labels(result="semantic_hit").inc()
+                    return cached
+
+        self.misses += 1
+        LLM_CACHE_LOOKUPS.labels(result="miss").inc()
+        result = await call()
+        if not result.get("error"):
+            self._put(key, scope, result, vector)
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+import httpx
+
+import deadline
+from metrics import RATE_LIMIT_QUEUE_DEPTH, RATE_LIMIT_REJECTIONS, RATE_LIMIT_WAIT_SECONDS
+from providers.http import retry_after_seconds
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+MAX_IDLE_BUCKETS = 1024
+
+_priority: ContextVar[str] = ContextVar("google_request_priority", default="interactive")
+_credential: ContextVar[str | None] = ContextVar("google_request_credential", default=None)
+
+
+@contextmanager
+def priority(name: str):
+    token = _priority.set(name if name in PRIORITIES else "interactive")
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def credential(credential_id: str | None):
+    # Names the credential whose quota the Google requests made inside count against.
+    token = _credential.set(credential_id)
+    try:
+        yield
+    finally:
+        _credential.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class RateLimited(Exception):
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"Google rate limit: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class RateLimitOptions:
+    per_credential_rate: float = 0.0
+    per_credential_burst: int = 20
+    global_rate: float = 0.0
+    global_burst: int = 100
+    max_queue: int = 200
+    max_wait_seconds: float = 10.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        # When the next token is available; 0 when the bucket is unlimited.
+        if self.rate <= 0:
+            return self.blocked_until
+        self._refill(now)
+        refill_at = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(refill_at, self.blocked_until)
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        return self.ready_at(now) <= now and self.tokens >= self.burst
+
+
+class RateLimiter:
+    # A global bucket plus one bucket per credential. Requests that cannot go immediately wait in a bounded
+    # queue served in priority order; a waiter held back only by its own
+    # credential's bucket does not block waiters for other credentials.
+    def __init__(self, options: RateLimitOptions) -> None:
+        self.options = options
+        self.global_bucket = TokenBucket(options.global_rate, options.global_burst)
+        self.buckets: dict[str, TokenBucket] = {}
+        self._waiters: list[tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.options.per_credential_rate > 0 or self.options.global_rate > 0
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= MAX_IDLE_BUCKETS:
+                now = time.monotonic()
+                for idle_key in [k for k, b in self.buckets.items() if b.idle(now)]:
+                    del self.buckets[idle_key]
+            bucket = TokenBucket(self.options.per_credential_rate, self.options.per_credential_burst)
+            self.buckets[key] = bucket
+        return bucket
+
+    def _ready_at(self, key: str, now: float) -> tuple[float, float]:
+        return self.global_bucket.ready_at(now), self._bucket(key).ready_at(now)
+
+    def _take(self, key: str) -> None:
+        self.global_bucket.take()
+        self._bucket(key).take()
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        now = time.monotonic()
+        next_at = None
+        remaining = []
+        global_blocked = False
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            _rank, _seq, key, future = waiter
+            if future.done():
+                continue
+            global_at, key_at = self._ready_at(key, now)
+            if not global_blocked and global_at <= now and key_at <= now:
+                self._take(key)
+                future.set_result(None)
+                continue
+            # Once the global bucket is empty, lower priorities must not jump ahead.
+            global_blocked = global_blocked or global_at > now
+            ready = max(global_at, key_at)
+            next_at = ready if next_at is None else min(next_at, ready)
+            remaining.append(waiter)
+        for waiter in remaining:
+            heapq.heappush(self._waiters, waiter)
+        if next_at is not None:
+            self._timer = asyncio.get_running_loop().call_later(max(0.0, next_at - now), self._dispatch)
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    async def acquire(self, key: str, priority_name: str) -> None:
+        now = time.monotonic()
+        global_at, key_at = self._ready_at(key, now)
+        if not self._waiters and global_at <= now and key_at <= now:
+            self._take(key)
+            RATE_LIMIT_WAIT_SECONDS.labels(priority_name).observe(0.0)
+            return
+        wait = max(global_at, key_at) - now
+        max_wait = self.options.max_wait_seconds
+        left = deadline.remaining()
+        if left is not None and left < max_wait:
+            # Waiting past the request's deadline only to fail afterwards is pointless.
+            max_wait = max(0.0, left)
+        if wait > max_wait:
+            RATE_LIMIT_REJECTIONS.labels("retry_after").inc()
+            raise RateLimited("backing off", wait)
+        if len(self._waiters) >= self.options.max_queue:
+            RATE_LIMIT_REJECTIONS.labels("queue_full").inc()
+            raise RateLimited("queue full", max(wait, 1.0))
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES[priority_name], next(self._sequence), key, future))
+        self._schedule()
+        depth = RATE_LIMIT_QUEUE_DEPTH.labels(priority_name)
+        depth.inc()
+        try:
+            await asyncio.wait_for(future, max_wait)
+        except asyncio.TimeoutError:
+            RATE_LIMIT_REJECTIONS.labels("timeout").inc()
+            raise RateLimited("queue timeout", 1.0) from None
+        finally:
+            depth.dec()
+            RATE_LIMIT_WAIT_SECONDS.labels(priority_name).observe(time.monotonic() - now)
+
+    def back_off(self, key: str, seconds: float) -> None:
+        bucket = self._bucket(key)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+
+
+_limiter = RateLimiter(RateLimitOptions())
+
+
+def configure(settings) -> None:
+    global _limiter
+    workers = max(1, settings.app_workers)
+    # Quotas are per server, so each worker process gets its share.
+    _limiter = RateLimiter(
+        RateLimitOptions(
+            per_credential_rate=settings.google_rate_limit_per_credential / workers,
+            per_credential_burst=max(1, settings.google_rate_limit_burst // workers),
+            global_rate=settings.google_rate_limit_global / workers,
+            global_burst=max(1, settings.google_rate_limit_global_burst // workers),
+            max_queue=settings.google_rate_limit_max_queue,
+            max_wait_seconds=settings.google_rate_limit_max_wait_seconds,
+        )
+    )
+
+
+def _credential_key(request: httpx.Request) -> str | None:
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    # Keyed on the credential so a refreshed access token keeps its bucket;
+    # the token itself is only a fallback for callers that did not name one.
+    credential_id = _credential.get()
+    if credential_id:
+        return f"credential:{credential_id}"
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+
+class RateLimitTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _credential_key(request)
+        # Unauthenticated calls (the token endpoint) have their own quota.
+        if key is None or not _limiter.enabled:
+            return await self._transport.handle_async_request(request)
+        await _limiter.acquire(key, _priority.get())
+        response = await self._transport.handle_async_request(request)
+        if response.status_code not in (429, 503):
+            return response
+        delay = retry_after_seconds(response)
+        if delay is None:
+            return response
+        _limiter.back_off(key, delay)
+        if delay > _limiter.options.max_wait_seconds:
+            return response
+        # Google said when to come back: wait in line once more and retry.
+        await response.aclose()
+        await _limiter.acquire(key, _priority.get())
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
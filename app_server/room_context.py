@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from metrics import ROOM_CONTEXT_LOOKUPS
+
+TTL_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class RoomContext:
+    room: Any
+    providers: list
+    credential_map: dict[str, str | None]
+    api_key: str | None
+    tools: list[dict]
+
+
+# room_id -> (context, loaded_at). Writes in this process invalidate entries
+# right away; the TTL bounds how long another worker's write goes unseen.
+_contexts: dict[str, tuple[RoomContext, float]] = {}
+
+
+def configure(settings) -> None:
+    global TTL_SECONDS
+    TTL_SECONDS = settings.chat_room_context_ttl_seconds
+    _contexts.clear()
+
+
+def get(room_id: str, load: Callable[[], RoomContext | None]) -> RoomContext | None:
+    cached = _contexts.get(room_id)
+    now = time.monotonic()
+    if cached and now - cached[1] < TTL_SECONDS:
+        ROOM_CONTEXT_LOOKUPS.labels(result="hit").inc()
+        return cached[0]
+    ROOM_CONTEXT_LOOKUPS.labels(result="expired" if cached else "miss").inc()
+    context = load()
+    if context is None:
+        _contexts.pop(room_id, None)
+    elif TTL_SECONDS > 0:
+        _contexts[room_id] = (context, now)
+    return context
+
+
+def invalidate_room(room_id: str) -> None:
+    _contexts.pop(room_id, None)
+
+
+def invalidate_credential(credential_id: str) -> None:
+    # Drops every room that uses the credential, as its LLM or for a tool provider.
+    for room_id, (context, _loaded_at) in list(_contexts.items()):
+        if context.room["llm_credential_id"] == credential_id or credential_id in context.credential_map.values():
+            del _contexts[room_id]
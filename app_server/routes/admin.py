@@ -8,6 +8,7 @@ from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 from auth.session import delete_session, get_session
+import room_context
 
 router = APIRouter()
 TEMPLATES = Jinja2Templates(directory="templates")
@@ -88,9 +89,14 @@ async def credential_detail(request: Request, credential_id: str, session=Depend
 
 @router.post("/credentials/{credential_id}/delete")
 async def credential_delete(request: Request, credential_id: str, session=Depends(require_session)):
+    request.app.state.db.execute(
+        "DELETE FROM blobs WHERE id = (SELECT extra_blob_id FROM oauth_tokens WHERE credential_id = ?)",
+        (credential_id,),
+    )
     request.app.state.db.execute("DELETE FROM oauth_tokens WHERE credential_id = ?", (credential_id,))
     request.app.state.db.execute("DELETE FROM credentials WHERE id = ?", (credential_id,))
     request.app.state.db.commit()
+    room_context.invalidate_credential(credential_id)
     return RedirectResponse("/credentials", status_code=302)
 
 
@@ -119,6 +125,7 @@ async def gemini_save(
         ("connected", now, credential_id),
     )
     request.app.state.db.commit()
+    room_context.invalidate_credential(credential_id)
     return RedirectResponse(f"/credentials/{credential_id}", status_code=302)
 
 
@@ -4,13 +4,29 @@ from typing import Any
 
 import time
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
-from auth.jwt import verify_jwt
-from providers import gemini, google_calendar
+from auth.jwt import CHAT_READ_SCOPE, has_scope, verify_jwt
+import chat_search
+from providers import gemini, google_calendar, rate_limit
 from shared.utils import extract_bearer_token
+from tracing import traced
 
-router = APIRouter(prefix="/api")
+
+async def request_priority(request: Request):
+    # Batch callers (sync jobs, backfills) send X-Request-Priority: batch so
+    # interactive chat gets Google quota first.
+    with rate_limit.priority(request.headers.get("x-request-priority", "interactive")):
+        yield
+
+
+async def request_credential(request: Request):
+    # Google quota is counted per credential, not per access token, which changes on every refresh.
+    with rate_limit.credential(request.path_params.get("credential_id")):
+        yield
+
+
+router = APIRouter(prefix="/api", dependencies=[Depends(request_priority), Depends(request_credential)])
 
 
 def require_jwt(request: Request) -> dict[str, Any]:
@@ -19,11 +35,12 @@ def require_jwt(request: Request) -> dict[str, Any]:
         raise HTTPException(status_code=401, detail="missing bearer token")
     settings = request.app.state.settings
     try:
-        return verify_jwt(token, settings.jwt_secret, settings.jwt_issuer)
+        return verify_jwt(token, request.app.state.signing_keys, settings.jwt_issuer)
     except Exception as exc:
         raise HTTPException(status_code=401, detail="invalid token") from exc
 
 
+@traced("api.get_token")
 async def _get_token(conn, settings, credential_id: str):
     row = conn.execute(
         "SELECT access_token, refresh_token, expiry FROM oauth_tokens WHERE credential_id = ?",
@@ -51,6 +68,29 @@ async def _get_token(conn, settings, credential_id: str):
     return row
 
 
+@router.post("/google_calendar/{credential_id}/access_token")
+async def vend_access_token(
+    request: Request,
+    response: Response,
+    credential_id: str,
+    claims=Depends(require_jwt),
+):
+    # Lets the MCP server call Google directly. The token is refreshed here when
+    # it is within 60 seconds of expiry, so callers should stop using it before that.
+    settings = request.app.state.settings
+    if not settings.token_vending_enabled:
+        raise HTTPException(status_code=404, detail="token vending disabled")
+    # A raw Google token carries everything its scopes allow, and anyone can
+    # register a client and get a JWT, so only the listed clients get one.
+    if claims.get("sub") not in settings.token_vending_client_ids:
+        raise HTTPException(status_code=403, detail="client may not fetch access tokens")
+    token_row = await _get_token(request.app.state.db, settings, credential_id)
+    if not token_row or not token_row["access_token"]:
+        raise HTTPException(status_code=404, detail="token not found")
+    response.headers["Cache-Control"] = "no-store"
+    return {"access_token": token_row["access_token"], "expires_at": token_row["expiry"]}
+
+
 @router.get("/google_calendar/{credential_id}/list_calendars")
 async def list_calendars(
     request: Request,
@@ -200,6 +240,21 @@ async def availability(
     )
 
 
+@router.get("/chat/search")
+async def chat_search_messages(
+    request: Request,
+    q: str,
+    room_id: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    claims=Depends(require_jwt),
+):
+    # Every room's history, tool results included: only for tokens an admin consented to.
+    if not has_scope(claims, CHAT_READ_SCOPE):
+        raise HTTPException(status_code=403, detail=f"{CHAT_READ_SCOPE} scope required")
+    return chat_search.search(request.app.state.db, q, room_id=room_id, limit=limit, offset=max(0, offset))
+
+
 @router.post("/gemini/{credential_id}/generate")
 async def gemini_generate(
     request: Request,
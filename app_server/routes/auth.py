@@ -7,7 +7,7 @@ import time
 
 from fastapi import APIRouter, HTTPException, Request
 
-from auth.jwt import issue_jwt
+from auth.jwt import CHAT_READ_SCOPE, issue_jwt
 from shared.models import AuthTokenResponse
 
 router = APIRouter()
@@ -181,11 +181,14 @@ async def issue_token(request: Request) -> AuthTokenResponse:
             conn, settings, client_id, subject, token_scope
         )
 
+    if grant_type == "client_credentials":
+        token_scope = " ".join(s for s in token_scope.split() if s != CHAT_READ_SCOPE) or "mcp"
     token, _exp = issue_jwt(
-        settings.jwt_secret,
+        request.app.state.signing_keys,
         settings.jwt_issuer,
         settings.jwt_ttl_seconds,
         subject,
+        scope=token_scope,
     )
     return AuthTokenResponse(
         access_token=token,
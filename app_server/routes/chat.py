@@ -1,18 +1,29 @@
 from __future__ import annotations
 
+import asyncio
 import time
 import uuid
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Request
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 import json
 
 from auth.session import get_session
 from auth.jwt import issue_jwt
+import admission
+import chat_hub
+import chat_jobs
+import chat_search
+import deadline
+import mcp_local
+import room_context
 from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
 from providers import gemini
+from providers.calendar_render import render_tool_result
+from tracing import inject, span
 
 router = APIRouter(prefix="/chat")
 TEMPLATES = Jinja2Templates(directory="templates")
@@ -44,6 +55,30 @@ def _get_token(conn, credential_id: str):
     return row["access_token"] if row and row["access_token"] else None
 
 
+def _load_room_context(conn, room_id: str) -> room_context.RoomContext | None:
+    room = conn.execute("SELECT * FROM chat_rooms WHERE id = ?", (room_id,)).fetchone()
+    if not room:
+        return None
+    providers = conn.execute(
+        "SELECT provider, credential_id FROM chat_room_providers WHERE room_id = ? ORDER BY provider",
+        (room_id,),
+    ).fetchall()
+    api_key = None
+    if room["llm_provider"] == "gemini" and room["llm_credential_id"]:
+        api_key = _get_token(conn, room["llm_credential_id"])
+    return room_context.RoomContext(
+        room=room,
+        providers=providers,
+        credential_map={row["provider"]: row["credential_id"] for row in providers},
+        api_key=api_key,
+        tools=_build_tools(providers),
+    )
+
+
+def _room_context(conn, room_id: str) -> room_context.RoomContext | None:
+    return room_context.get(room_id, lambda: _load_room_context(conn, room_id))
+
+
 def _build_tools(providers: list[dict]) -> list[dict]:
     declarations = []
     for provider in providers:
@@ -182,6 +217,25 @@ def _make_jsonable(value):
         return str(value)
 
 
+async def _cached_llm_call(cache, api_key, settings, prompt: str, tools: list[dict], context, call) -> dict:
+    if cache is None:
+        return await call()
+    embed = None
+    if cache.semantic_enabled and not tools:
+
+        async def embed(text: str):
+            return await gemini.embed(api_key, settings.gemini_base_url, settings.gemini_embedding_model, text)
+
+    return await cache.get_or_call(
+        model=settings.gemini_model,
+        tools=tools,
+        prompt=prompt,
+        context=context,
+        call=call,
+        embed=embed,
+    )
+
+
 @router.get("")
 async def chat_list(request: Request, session=Depends(require_session)):
     rooms = request.app.state.db.execute(
@@ -209,6 +263,24 @@ async def chat_list(request: Request, session=Depends(require_session)):
     )
 
 
+@router.get("/search")
+async def chat_search_page(
+    request: Request,
+    q: str = "",
+    room_id: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    session=Depends(require_session),
+):
+    page = chat_search.search(request.app.state.db, q, room_id=room_id or None, limit=limit, offset=max(0, offset))
+    if "text/html" not in request.headers.get("accept", ""):
+        return page
+    return TEMPLATES.TemplateResponse(
+        "chat_search.html",
+        {"request": request, "session": session, "q": q, "room_id": room_id, **page},
+    )
+
+
 @router.post("")
 async def chat_create(
     request: Request,
@@ -217,6 +289,7 @@ async def chat_create(
     llm_credential_id: str = Form(""),
     mcp_providers: list[str] = Form([]),
     mcp_credential_google_calendar: str = Form(""),
+    llm_cache_enabled: bool = Form(False),
     session=Depends(require_session),
 ):
     if not name:
@@ -224,8 +297,8 @@ async def chat_create(
     room_id = str(uuid.uuid4())
     now = int(time.time())
     request.app.state.db.execute(
-        "INSERT INTO chat_rooms (id, name, llm_provider, llm_credential_id, created_at) VALUES (?, ?, ?, ?, ?)",
-        (room_id, name, llm_provider, llm_credential_id or None, now),
+        "INSERT INTO chat_rooms (id, name, llm_provider, llm_credential_id, llm_cache_enabled, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (room_id, name, llm_provider, llm_credential_id or None, int(llm_cache_enabled), now),
     )
     for provider in mcp_providers:
         credential_id = None
@@ -236,9 +309,48 @@ async def chat_create(
             (room_id, provider, credential_id, now),
         )
     request.app.state.db.commit()
+    room_context.invalidate_room(room_id)
     return RedirectResponse(f"/chat/{room_id}", status_code=302)
 
 
+# Listing columns: bodies are cut in SQL so long messages are never read in full.
+MESSAGE_COLUMNS = "rowid AS seq, id, role, substr(content, 1, ?) AS content, coalesce(content_length, length(content)) AS length, created_at"
+
+
+def _frames(rows) -> list[dict]:
+    return [
+        chat_hub.message_frame(row["seq"], row["id"], row["role"], row["content"], row["created_at"], row["length"])
+        for row in rows
+    ]
+
+
+def _message_page(conn, room_id: str, limit: int, before: tuple[int, int] | None = None) -> tuple[list[dict], str | None]:
+    # Keyset pagination on (created_at, rowid), newest first, so a page costs
+    # the same however far back it is. Returned oldest first for display.
+    sql = f"SELECT {MESSAGE_COLUMNS} FROM chat_messages WHERE room_id = ?"
+    params: list = [chat_hub.PREVIEW_CHARS + 1, room_id]
+    if before:
+        sql += " AND (created_at, rowid) < (?, ?)"
+        params.extend(before)
+    sql += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    params.append(limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit][::-1]
+    cursor = f"{rows[0]['created_at']}:{rows[0]['seq']}" if more and rows else None
+    return _frames(rows), cursor
+
+
+def _parse_cursor(value: str | None) -> tuple[int, int] | None:
+    if not value:
+        return None
+    try:
+        created_at, seq = value.split(":", 1)
+        return int(created_at), int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor") from None
+
+
 @router.get("/{room_id}")
 async def chat_room(request: Request, room_id: str, session=Depends(require_session)):
     room = request.app.state.db.execute(
@@ -251,124 +363,312 @@ async def chat_room(request: Request, room_id: str, session=Depends(require_sess
         "SELECT provider, credential_id FROM chat_room_providers WHERE room_id = ? ORDER BY provider",
         (room_id,),
     ).fetchall()
-    messages = request.app.state.db.execute(
-        "SELECT role, content, created_at FROM chat_messages WHERE room_id = ? ORDER BY created_at ASC",
+    messages, before = _message_page(request.app.state.db, room_id, request.app.state.settings.chat_history_page_size)
+    after = request.app.state.db.execute(
+        "SELECT max(rowid) FROM chat_messages WHERE room_id = ?",
         (room_id,),
-    ).fetchall()
+    ).fetchone()[0]
+    pending_jobs = chat_jobs.pending(request.app.state.db, room_id)
     return TEMPLATES.TemplateResponse(
         "chat_room.html",
-        {"request": request, "room": room, "providers": providers, "messages": messages, "session": session},
+        {
+            "request": request,
+            "room": room,
+            "providers": providers,
+            "messages": messages,
+            "before": before,
+            "after": after or 0,
+            "pending_jobs": pending_jobs,
+            "session": session,
+        },
     )
 
 
-@router.post("/{room_id}/message")
-async def chat_message(
+@router.get("/{room_id}/messages")
+async def chat_history(
     request: Request,
     room_id: str,
-    prompt: str = Form(""),
+    before: str | None = None,
+    limit: int = 0,
     session=Depends(require_session),
 ):
-    if not prompt:
-        raise HTTPException(status_code=400, detail="prompt required")
+    settings = request.app.state.settings
+    limit = min(limit, settings.chat_history_max_page_size) if limit > 0 else settings.chat_history_page_size
+    messages, cursor = _message_page(request.app.state.db, room_id, limit, _parse_cursor(before))
+    return {"messages": messages, "before": cursor}
 
-    conn = request.app.state.db
-    room = conn.execute("SELECT * FROM chat_rooms WHERE id = ?", (room_id,)).fetchone()
-    if not room:
-        raise HTTPException(status_code=404, detail="room not found")
-    providers = conn.execute(
-        "SELECT provider, credential_id FROM chat_room_providers WHERE room_id = ? ORDER BY provider",
-        (room_id,),
+
+@router.get("/{room_id}/messages/{message_id}")
+async def chat_message_body(request: Request, room_id: str, message_id: str, session=Depends(require_session)):
+    row = request.app.state.db.execute(
+        "SELECT rowid AS seq, id, role, content, content_blob_id, created_at FROM chat_messages WHERE room_id = ? AND id = ?",
+        (room_id, message_id),
+    ).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="message not found")
+    content = chat_hub.message_body(request.app.state.db, row)
+    return chat_hub.message_frame(row["seq"], row["id"], row["role"], content, row["created_at"], full=True)
+
+
+def _messages_after(conn, room_id: str, seq: int) -> list[dict]:
+    rows = conn.execute(
+        f"SELECT {MESSAGE_COLUMNS} FROM chat_messages WHERE room_id = ? AND rowid > ? ORDER BY rowid",
+        (chat_hub.PREVIEW_CHARS + 1, room_id, seq),
     ).fetchall()
-    credential_map = {row["provider"]: row["credential_id"] for row in providers}
+    return _frames(rows)
 
-    now = int(time.time())
-    user_id = str(uuid.uuid4())
-    conn.execute(
-        "INSERT INTO chat_messages (id, room_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
-        (user_id, room_id, "user", prompt, now),
+
+@router.websocket("/{room_id}/ws")
+async def chat_room_ws(websocket: WebSocket, room_id: str, after: int = 0):
+    conn = websocket.app.state.db
+    settings = websocket.app.state.settings
+    session_id = websocket.cookies.get(COOKIE_NAME)
+    if not session_id or not get_session(conn, session_id):
+        await websocket.close(code=1008)
+        return
+    if not conn.execute("SELECT 1 FROM chat_rooms WHERE id = ?", (room_id,)).fetchone():
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    queue = chat_hub.HUB.subscribe(room_id)
+    # The hub only sees this process's turns; with several workers, messages
+    # written by the others are picked up from the database every few seconds.
+    poll_seconds = settings.chat_ws_poll_seconds if settings.app_workers > 1 else None
+    receiver = asyncio.create_task(websocket.receive())
+    try:
+        # Anything written between rendering the page and connecting.
+        frames = _messages_after(conn, room_id, after)
+        while True:
+            for frame in frames:
+                if frame["type"] == "message":
+                    if frame["seq"] <= after:
+                        continue
+                    after = frame["seq"]
+                await websocket.send_json(frame)
+            getter = asyncio.ensure_future(queue.get())
+            done, _pending = await asyncio.wait(
+                {getter, receiver}, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver in done:
+                getter.cancel()
+                message = receiver.result()
+                if message["type"] == "websocket.disconnect":
+                    return
+                # The page never sends anything; ignore it and keep listening.
+                receiver = asyncio.create_task(websocket.receive())
+                frames = [getter.result()] if getter.done() and not getter.cancelled() else []
+            elif getter in done:
+                frames = [getter.result()]
+            else:
+                getter.cancel()
+                frames = _messages_after(conn, room_id, after)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        chat_hub.HUB.unsubscribe(room_id, queue)
+
+
+@router.get("/jobs/{job_id}")
+async def chat_job_status(
+    request: Request,
+    job_id: str,
+    wait: float = 0.0,
+    session=Depends(require_session),
+):
+    # wait > 0 long-polls: the response is held until the job finishes or the wait runs out.
+    job = await chat_jobs.wait_for(
+        request.app.state.db, job_id, min(max(wait, 0.0), 30.0), request.app.state.settings.chat_job_poll_seconds
     )
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return chat_jobs.describe(request.app.state.db, job)
 
-    tool_note = ""
-    settings = request.app.state.settings
-    jwt, _exp = issue_jwt(settings.jwt_secret, settings.jwt_issuer, settings.jwt_ttl_seconds, "app-server")
-    tools = _build_tools(providers)
-
-    llm_text = ""
-    if room["llm_provider"] == "gemini":
-        api_key = None
-        if room["llm_credential_id"]:
-            api_key = _get_token(conn, room["llm_credential_id"])
-        response = await gemini.generate_with_tools(
-            api_key,
-            settings.gemini_base_url,
-            settings.gemini_model,
-            prompt,
-            tools,
-        )
-        function_call_part = response.get("function_call_part")
-        if function_call_part and tools:
-            if "thoughtSignature" not in function_call_part:
-                function_call_part["thoughtSignature"] = "skip_thought_signature_validator"
-            try:
-                async with Client(settings.mcp_server_url, auth=jwt) as client:
-                    tool_name = function_call_part.get("functionCall", {}).get("name")
-                    args = function_call_part.get("functionCall", {}).get("args") or {}
-                    if tool_name:
-                        if tool_name.startswith("gcal."):
-                            args["credential_id"] = credential_map.get("google_calendar")
-                        if tool_name == "gcal.list_events":
-                            args.setdefault("max_results", 10)
-                            args.setdefault("order_by", "startTime")
-                            args.setdefault("single_events", True)
-                        if tool_name == "gcal.create_event":
-                            args = {
-                                "credential_id": args.get("credential_id"),
-                                "jwt": args.get("jwt"),
-                                "payload": {
-                                    "calendar_id": args.get("calendar_id"),
-                                    "event": args.get("event") or {},
-                                },
-                            }
-                        if tool_name == "gcal.update_event":
-                            args = {
-                                "credential_id": args.get("credential_id"),
-                                "calendar_id": args.get("calendar_id"),
-                                "event_id": args.get("event_id"),
-                                "payload": args.get("payload") or {},
-                            }
-                        if tool_name.startswith("gcal.") and not args.get("credential_id"):
-                            raise ValueError("google_calendar credential not set for this room")
-                    tool_result = await client.call_tool(tool_name, args)
-                    safe_result = _make_jsonable(tool_result)
-                follow = await gemini.generate_with_function_result(
+
+async def run_turn(state, room_id: str, prompt: str) -> str:
+    # Answers one user prompt: the model call, an optional MCP tool call and the
+    # follow-up. Inserts the assistant message and returns its id; the caller
+    # commits right away. Nothing is written before the last await.
+    conn = state.db
+    settings = state.settings
+    context = _room_context(conn, room_id)
+    if not context:
+        raise ValueError("room not found")
+    room = context.room
+    credential_map = context.credential_map
+    tools = context.tools
+    chat_hub.publish_status(room_id, "thinking")
+    try:
+        tool_note = ""
+        jwt = None
+        if not settings.mcp_colocated:
+            jwt, _exp = issue_jwt(
+                state.signing_keys, settings.jwt_issuer, settings.jwt_ttl_seconds, "app-server"
+            )
+
+        llm_text = ""
+        if room["llm_provider"] == "gemini":
+            api_key = context.api_key
+            cache = state.llm_cache if room["llm_cache_enabled"] else None
+            response = await _cached_llm_call(
+                cache,
+                api_key,
+                settings,
+                prompt,
+                tools,
+                # The model resolves relative dates ("today") into tool arguments.
+                time.strftime("%Y-%m-%d"),
+                lambda: gemini.generate_with_tools(
                     api_key,
                     settings.gemini_base_url,
                     settings.gemini_model,
                     prompt,
-                    function_call_part,
-                    {"result": safe_result},
                     tools,
-                )
-                llm_text = follow.get("text")
-                if not llm_text:
-                    raw_json = json.dumps(safe_result, ensure_ascii=False)
-                    summary = await gemini.generate(
+                ),
+            )
+            function_call_part = response.get("function_call_part")
+            if function_call_part and tools:
+                if "thoughtSignature" not in function_call_part:
+                    function_call_part["thoughtSignature"] = "skip_thought_signature_validator"
+                try:
+                    # Co-located: in-memory transport to the same tools, no HTTP hop.
+                    if settings.mcp_colocated:
+                        client = Client(mcp_local.server)
+                    else:
+                        client = Client(
+                            StreamableHttpTransport(settings.mcp_server_url, headers=deadline.headers(), auth=jwt)
+                        )
+                    async with client:
+                        tool_name = function_call_part.get("functionCall", {}).get("name")
+                        args = function_call_part.get("functionCall", {}).get("args") or {}
+                        if tool_name:
+                            if tool_name.startswith("gcal."):
+                                args["credential_id"] = credential_map.get("google_calendar")
+                            if tool_name == "gcal.list_events":
+                                args.setdefault("max_results", 10)
+                                args.setdefault("order_by", "startTime")
+                                args.setdefault("single_events", True)
+                            if tool_name == "gcal.create_event":
+                                args = {
+                                    "credential_id": args.get("credential_id"),
+                                    "payload": {
+                                        "calendar_id": args.get("calendar_id"),
+                                        "event": args.get("event") or {},
+                                    },
+                                }
+                            if tool_name == "gcal.update_event":
+                                args = {
+                                    "credential_id": args.get("credential_id"),
+                                    "calendar_id": args.get("calendar_id"),
+                                    "event_id": args.get("event_id"),
+                                    "payload": args.get("payload") or {},
+                                }
+                            if tool_name.startswith("gcal.") and not args.get("credential_id"):
+                                raise ValueError("google_calendar credential not set for this room")
+                        chat_hub.publish_status(room_id, "tool_call", tool=tool_name)
+                        with span("mcp.call_tool", {"mcp.tool.name": tool_name or ""}):
+                            # _meta carries the W3C trace context so the MCP server's spans nest
+                            # here, and the remaining deadline budget at the time of the call.
+                            left = deadline.remaining()
+                            tool_result = await client.call_tool(
+                                tool_name,
+                                args,
+                                meta={**inject(), **deadline.headers()},
+                                timeout=max(left, 0.001) if left is not None else None,
+                            )
+                        safe_result = _make_jsonable(tool_result)
+                    follow = await _cached_llm_call(
+                        cache,
                         api_key,
-                        settings.gemini_base_url,
-                        settings.gemini_model,
-                        {"prompt": f"Summarize the following JSON result for the user in plain Japanese:\\n{raw_json}"},
+                        settings,
+                        prompt,
+                        tools,
+                        [function_call_part, safe_result],
+                        lambda: gemini.generate_with_function_result(
+                            api_key,
+                            settings.gemini_base_url,
+                            settings.gemini_model,
+                            prompt,
+                            function_call_part,
+                            {"result": safe_result},
+                            tools,
+                        ),
                     )
-                    summary_text = summary.get("text") or "(no summary)"
-                    llm_text = f"{summary_text}\n\n---\nDebug JSON:\n{raw_json}"
-            except Exception as exc:
-                llm_text = f"Tool call failed: {exc}"
-        else:
-            llm_text = response.get("text") or str(response)
-
-    assistant_content = llm_text if llm_text else tool_note or "(no response)"
-    conn.execute(
-        "INSERT INTO chat_messages (id, room_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
-        (str(uuid.uuid4()), room_id, "assistant", assistant_content, int(time.time())),
-    )
-    conn.commit()
+                    llm_text = follow.get("text")
+                    if not llm_text and not settings.chat_llm_summary_enabled:
+                        llm_text = render_tool_result(tool_name, safe_result)
+                    if not llm_text:
+                        raw_json = json.dumps(safe_result, ensure_ascii=False)
+                        summary_text = "(no summary)"
+                        if settings.chat_llm_summary_enabled:
+                            summary = await gemini.generate(
+                                api_key,
+                                settings.gemini_base_url,
+                                settings.gemini_model,
+                                {"prompt": f"Summarize the following JSON result for the user in plain Japanese:\\n{raw_json}"},
+                            )
+                            summary_text = summary.get("text") or summary_text
+                        llm_text = f"{summary_text}\n\n---\nDebug JSON:\n{raw_json}"
+                except Exception as exc:
+                    llm_text = f"Tool call failed: {exc}"
+            else:
+                llm_text = response.get("text") or str(response)
+
+        assistant_content = llm_text if llm_text else tool_note or "(no response)"
+        return chat_hub.store_message(conn, room_id, "assistant", assistant_content)
+    finally:
+        # Also on failure or cancellation, so no tab is left showing "Thinking…".
+        chat_hub.publish_status(room_id, "idle")
+
+
+@router.post("/{room_id}/message")
+async def chat_message(
+    request: Request,
+    room_id: str,
+    prompt: str = Form(""),
+    session=Depends(require_session),
+):
+    if not prompt:
+        raise HTTPException(status_code=400, detail="prompt required")
+
+    conn = request.app.state.db
+    if not _room_context(conn, room_id):
+        raise HTTPException(status_code=404, detail="room not found")
+
+    if request.app.state.settings.chat_jobs_enabled:
+        user_id = chat_hub.store_message(conn, room_id, "user", prompt)
+        job_id = chat_jobs.enqueue(conn, room_id, user_id, prompt)
+        chat_hub.commit(conn)
+        chat_hub.publish_status(room_id, "queued", job_id=job_id)
+        chat_jobs.notify()
+        if "text/html" in request.headers.get("accept", ""):
+            # Browsers go back to the room, which polls until the answer is in.
+            return RedirectResponse(f"/chat/{room_id}", status_code=303)
+        return JSONResponse(
+            {"job_id": job_id, "status": "queued", "status_url": f"/chat/jobs/{job_id}"},
+            status_code=202,
+            headers={"Location": f"/chat/jobs/{job_id}"},
+        )
+
+    # Admitted before the message is stored, so a shed request leaves nothing behind.
+    async with admission.slot(room_id):
+        # Committed before the turn awaits Gemini and MCP: the connection is
+        # shared, and an open transaction would hold the database's write
+        # lock against every other request and worker for the whole turn.
+        chat_hub.store_message(conn, room_id, "user", prompt)
+        chat_hub.commit(conn)
+        try:
+            await run_turn(request.app.state, room_id, prompt)
+        except BaseException as exc:
+            # The prompt is already stored. Answer it anyway, also when the
+            # client disconnected and DeadlineMiddleware cancelled the turn,
+            # so the room is not left waiting for a reply that never comes.
+            if isinstance(exc, asyncio.CancelledError):
+                note = "(cancelled)"
+            else:
+                note = f"Request failed: {str(exc) or type(exc).__name__}"
+            chat_hub.store_message(conn, room_id, "assistant", note)
+            chat_hub.commit(conn)
+            raise
+        chat_hub.commit(conn)
     return RedirectResponse(f"/chat/{room_id}", status_code=302)
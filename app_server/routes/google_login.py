@@ -5,6 +5,7 @@ import uuid
 from urllib.parse import urlencode
 
 import httpx
+import jwt
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
 
@@ -16,7 +17,7 @@ COOKIE_NAME = "admin_session"
 POST_LOGIN_REDIRECT_COOKIE = "post_login_redirect"
 GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
-GOOGLE_TOKENINFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
 STATE_PROVIDER = "google_admin"
 
 
@@ -72,16 +73,23 @@ async def _exchange_code_for_tokens(
     return response.json()
 
 
-async def _verify_id_token(id_token: str, expected_audience: str) -> dict:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(GOOGLE_TOKENINFO_URL, params={"id_token": id_token})
-    if response.status_code >= 400:
-        raise HTTPException(status_code=400, detail="google id token verification failed")
-    payload = response.json()
-    if payload.get("aud") != expected_audience:
-        raise HTTPException(status_code=400, detail="google id token audience mismatch")
-    if payload.get("iss") not in {"accounts.google.com", "https://accounts.google.com"}:
-        raise HTTPException(status_code=400, detail="google id token issuer mismatch")
+async def _verify_id_token(certs, id_token: str, expected_audience: str) -> dict:
+    try:
+        kid = jwt.get_unverified_header(id_token).get("kid")
+        key = await certs.get_key(kid)
+        payload = jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            audience=expected_audience,
+            issuer=GOOGLE_ISSUERS,
+        )
+    except jwt.InvalidAudienceError as exc:
+        raise HTTPException(status_code=400, detail="google id token audience mismatch") from exc
+    except jwt.InvalidIssuerError as exc:
+        raise HTTPException(status_code=400, detail="google id token issuer mismatch") from exc
+    except (jwt.PyJWTError, KeyError, httpx.HTTPError) as exc:
+        raise HTTPException(status_code=400, detail="google id token verification failed") from exc
     if payload.get("email_verified") not in {"true", True}:
         raise HTTPException(status_code=403, detail="google email is not verified")
     return payload
@@ -126,7 +134,9 @@ async def google_callback(request: Request, code: str, state: str):
     id_token = token_payload.get("id_token")
     if not id_token:
         raise HTTPException(status_code=400, detail="google id token missing")
-    identity = await _verify_id_token(id_token, settings.google_login_client_id)
+    identity = await _verify_id_token(
+        request.app.state.google_certs, id_token, settings.google_login_client_id
+    )
     email = identity.get("email")
     hosted_domain = identity.get("hd")
     if not email:
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import sqlite3
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz() -> dict:
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz(request: Request) -> JSONResponse:
+    checks = {}
+    try:
+        request.app.state.db.execute("SELECT 1").fetchone()
+        checks["database"] = "ok"
+    except sqlite3.Error as exc:
+        checks["database"] = str(exc)
+    try:
+        request.app.state.signing_keys.active_key()
+        checks["signing_keys"] = "ok"
+    except (sqlite3.Error, ValueError) as exc:
+        checks["signing_keys"] = str(exc)
+    ready = all(value == "ok" for value in checks.values())
+    return JSONResponse({"status": "ok" if ready else "unavailable", "checks": checks}, status_code=200 if ready else 503)
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from metrics import latest
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics() -> Response:
+    return Response(latest(), media_type=CONTENT_TYPE_LATEST)
@@ -9,10 +9,12 @@ import httpx
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
 
+import blobs
+import room_context
+
 router = APIRouter()
 
 GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
-GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
 
 
 def _create_state(conn, credential_id: str, provider: str) -> str:
@@ -91,13 +93,20 @@ async def oauth_callback(request: Request, provider: str, code: str, state: str)
         "grant_type": "authorization_code",
     }
     async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.post(GOOGLE_TOKEN_URL, data=data)
+        response = await client.post(settings.google_token_url, data=data)
     if response.status_code >= 400:
         raise HTTPException(status_code=400, detail="token exchange failed")
     payload = response.json()
     now = int(time.time())
+    previous = conn.execute(
+        "SELECT extra_blob_id FROM oauth_tokens WHERE credential_id = ?",
+        (credential_id,),
+    ).fetchone()
+    if previous:
+        blobs.delete(conn, previous["extra_blob_id"])
+    extra_json, extra_blob_id = blobs.split(conn, json.dumps(payload))
     conn.execute(
-        "REPLACE INTO oauth_tokens (credential_id, access_token, refresh_token, expiry, scope, token_type, extra_json, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        "REPLACE INTO oauth_tokens (credential_id, access_token, refresh_token, expiry, scope, token_type, extra_json, extra_blob_id, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
         (
             credential_id,
             payload.get("access_token"),
@@ -105,7 +114,8 @@ async def oauth_callback(request: Request, provider: str, code: str, state: str)
             now + int(payload.get("expires_in", 0)),
             payload.get("scope"),
             payload.get("token_type"),
-            json.dumps(payload),
+            extra_json,
+            extra_blob_id,
             now,
         ),
     )
@@ -114,4 +124,5 @@ async def oauth_callback(request: Request, provider: str, code: str, state: str)
         ("connected", now, credential_id),
     )
     conn.commit()
+    room_context.invalidate_credential(credential_id)
     return RedirectResponse(f"/credentials/{credential_id}")
@@ -13,6 +13,7 @@ async def oauth_authorization_server_metadata(request: Request) -> dict:
         "authorization_endpoint": f"{base_url}/oauth/authorize",
         "token_endpoint": f"{base_url}/auth/token",
         "registration_endpoint": f"{base_url}/oauth/register",
+        "jwks_uri": f"{base_url}/.well-known/jwks.json",
         "response_types_supported": ["code"],
         "grant_types_supported": [
             "authorization_code",
@@ -23,5 +24,5 @@ async def oauth_authorization_server_metadata(request: Request) -> dict:
             "client_secret_post",
             "client_secret_basic",
         ],
-        "scopes_supported": ["mcp"],
+        "scopes_supported": ["mcp", "chat:read"],
     }
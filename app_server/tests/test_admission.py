@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionOptions, Overloaded
+
+
+async def _hold(controller: AdmissionController, room_id: str, release: asyncio.Event, shed: bool = True) -> None:
+    async with controller.slot(room_id, shed):
+        await release.wait()
+
+
+def test_full_queue_is_shed():
+    async def scenario() -> None:
+        controller = AdmissionController(AdmissionOptions(max_concurrent=1, max_queue=1))
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, "a", release))
+        queued = asyncio.create_task(_hold(controller, "b", release))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as exc_info:
+            async with controller.slot("c"):
+                pass
+        assert exc_info.value.reason == "queue full"
+        assert exc_info.value.retry_after >= 1.0
+        release.set()
+        await asyncio.gather(running, queued)
+        assert controller.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiter_past_max_wait_is_shed():
+    async def scenario() -> None:
+        controller = AdmissionController(AdmissionOptions(max_concurrent=1, max_wait_seconds=0.05))
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, "a", release))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as exc_info:
+            async with controller.slot("b"):
+                pass
+        assert exc_info.value.reason == "queue timeout"
+        assert not controller._waiters
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_unshed_waiter_outlasts_max_wait():
+    async def scenario() -> None:
+        controller = AdmissionController(AdmissionOptions(max_concurrent=1, max_wait_seconds=0.05))
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, "a", release))
+        await asyncio.sleep(0)
+        job = asyncio.create_task(_hold(controller, "b", asyncio.Event(), shed=False))
+        await asyncio.sleep(0.1)
+        assert not job.done()
+        release.set()
+        await running
+        await asyncio.sleep(0)
+        assert controller.per_room == {"b": 1}
+        job.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_room_cap_does_not_block_other_rooms():
+    async def scenario() -> None:
+        controller = AdmissionController(AdmissionOptions(max_concurrent=2, max_per_room=1))
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, "a", release))
+        await asyncio.sleep(0)
+        same_room = asyncio.create_task(_hold(controller, "a", release))
+        await asyncio.sleep(0)
+        async with controller.slot("b"):
+            assert controller.per_room == {"a": 1, "b": 1}
+            assert len(controller._waiters) == 1
+        release.set()
+        await asyncio.gather(running, same_room)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_after_admission_hands_the_slot_on():
+    async def scenario() -> None:
+        controller = AdmissionController(AdmissionOptions(max_concurrent=1))
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, "a", release))
+        await asyncio.sleep(0)
+        first = asyncio.create_task(_hold(controller, "b", release))
+        second = asyncio.create_task(_hold(controller, "c", release))
+        await asyncio.sleep(0)
+        release.set()
+        # Cancelled in the same loop iteration in which its slot was granted.
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(running, second)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert controller.running == 0
+        assert controller.per_room == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from providers import google_calendar
+
+URL = "https://google.test/calendar/v3/users/me/calendarList"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # Holds every upstream call until the test sets the event.
+    calls: list[httpx.Request] = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await release.wait()
+        return httpx.Response(200, json={"items": [len(calls)]})
+
+    monkeypatch.setattr(google_calendar, "COALESCE_READS", True)
+    monkeypatch.setattr(google_calendar, "_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    google_calendar._in_flight.clear()
+    yield calls, release
+    google_calendar._in_flight.clear()
+
+
+def _read() -> asyncio.Task:
+    return asyncio.create_task(google_calendar._read("list_calendars", "token", "GET", URL))
+
+
+def test_identical_reads_share_one_call(upstream):
+    calls, release = upstream
+
+    async def scenario() -> list[dict]:
+        readers = [_read() for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(*readers)
+
+    assert asyncio.run(scenario()) == [{"items": [1]}] * 3
+    assert len(calls) == 1
+    assert not google_calendar._in_flight
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call(upstream):
+    calls, release = upstream
+
+    async def scenario() -> dict:
+        first, second = _read(), _read()
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == {"items": [1]}
+    assert len(calls) == 1
+
+
+def test_call_is_cancelled_once_every_waiter_is_gone(upstream):
+    calls, _release = upstream
+
+    async def scenario() -> asyncio.Task:
+        readers = [_read() for _ in range(2)]
+        await asyncio.sleep(0.01)
+        shared = next(iter(google_calendar._in_flight.values()))[0]
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return shared
+
+    assert asyncio.run(scenario()).cancelled()
+    assert len(calls) == 1
+    assert not google_calendar._in_flight
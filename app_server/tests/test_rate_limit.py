@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from providers import rate_limit
+from providers.rate_limit import RateLimited, RateLimiter, RateLimitOptions, RateLimitTransport
+
+
+async def _acquire_in_order(limiter: RateLimiter, order: list[str], key: str, priority: str) -> None:
+    await limiter.acquire(key, priority)
+    order.append(f"{key}/{priority}")
+
+
+def test_interactive_waiters_go_before_batch_ones():
+    async def scenario() -> list[str]:
+        limiter = RateLimiter(RateLimitOptions(global_rate=20, global_burst=1))
+        await limiter.acquire("a", "interactive")
+        order: list[str] = []
+        batch = asyncio.create_task(_acquire_in_order(limiter, order, "b", "batch"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(_acquire_in_order(limiter, order, "c", "interactive"))
+        await asyncio.gather(batch, interactive)
+        return order
+
+    assert asyncio.run(scenario()) == ["c/interactive", "b/batch"]
+
+
+def test_waiter_held_back_by_its_credential_does_not_block_others():
+    async def scenario() -> list[str]:
+        limiter = RateLimiter(RateLimitOptions(per_credential_rate=100, global_rate=20, global_burst=1))
+        await limiter.acquire("a", "interactive")
+        # "a" has a token in its own bucket but Google told it to wait; the
+        # global token that comes free first goes to the batch request for "b".
+        limiter.back_off("a", 0.3)
+        order: list[str] = []
+        held = asyncio.create_task(_acquire_in_order(limiter, order, "a", "interactive"))
+        await asyncio.sleep(0)
+        other = asyncio.create_task(_acquire_in_order(limiter, order, "b", "batch"))
+        await asyncio.gather(held, other)
+        return order
+
+    assert asyncio.run(scenario()) == ["b/batch", "a/interactive"]
+
+
+def test_full_queue_is_rejected():
+    async def scenario() -> None:
+        limiter = RateLimiter(RateLimitOptions(global_rate=10, global_burst=1, max_queue=1))
+        await limiter.acquire("a", "interactive")
+        waiter = asyncio.create_task(limiter.acquire("b", "interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimited) as exc_info:
+            await limiter.acquire("c", "interactive")
+        assert exc_info.value.reason == "queue full"
+        assert exc_info.value.retry_after >= 1.0
+        await waiter
+
+    asyncio.run(scenario())
+
+
+def test_waiter_overtaken_past_max_wait_times_out():
+    async def scenario() -> None:
+        limiter = RateLimiter(RateLimitOptions(global_rate=4, global_burst=1, max_wait_seconds=0.4))
+        await limiter.acquire("a", "interactive")
+        # Both expect a token in 0.25s, but the interactive one takes it and
+        # the next arrives after the batch waiter has given up.
+        batch = asyncio.create_task(limiter.acquire("b", "batch"))
+        await asyncio.sleep(0)
+        await limiter.acquire("c", "interactive")
+        with pytest.raises(RateLimited) as exc_info:
+            await batch
+        assert exc_info.value.reason == "queue timeout"
+
+    asyncio.run(scenario())
+
+
+def test_back_off_longer_than_max_wait_is_rejected_with_retry_after():
+    async def scenario() -> None:
+        limiter = RateLimiter(RateLimitOptions(per_credential_rate=10, max_wait_seconds=1.0))
+        limiter.back_off("a", 30)
+        with pytest.raises(RateLimited) as exc_info:
+            await limiter.acquire("a", "interactive")
+        assert exc_info.value.reason == "backing off"
+        assert 29 < exc_info.value.retry_after <= 30
+        # Other credentials are not affected.
+        await limiter.acquire("b", "interactive")
+
+    asyncio.run(scenario())
+
+
+def _send(transport: httpx.AsyncBaseTransport) -> httpx.Response:
+    async def scenario() -> httpx.Response:
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.get("https://google.test/calendar", headers={"Authorization": "Bearer t"})
+
+    return asyncio.run(scenario())
+
+
+def test_transport_retries_once_after_a_short_retry_after(monkeypatch):
+    limiter = RateLimiter(RateLimitOptions(per_credential_rate=10, max_wait_seconds=1.0))
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    statuses = iter([429, 200])
+    upstream = httpx.MockTransport(lambda request: httpx.Response(next(statuses), headers={"Retry-After": "0"}))
+
+    assert _send(RateLimitTransport(upstream)).status_code == 200
+    assert list(statuses) == []
+
+
+def test_transport_returns_a_long_retry_after_and_backs_off(monkeypatch):
+    limiter = RateLimiter(RateLimitOptions(per_credential_rate=10, max_wait_seconds=1.0))
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "30"})
+
+    assert _send(RateLimitTransport(httpx.MockTransport(handler))).status_code == 429
+    assert len(calls) == 1
+    with pytest.raises(RateLimited):
+        _send(RateLimitTransport(httpx.MockTransport(handler)))
+    assert len(calls) == 1
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import argparse
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from config import DEFAULT_TRACE_FILE
+
+BAR_WIDTH = 40
+
+
+def load_spans(paths: list[str]) -> list[dict]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    spans.append(json.loads(line))
+    return spans
+
+
+def pick_trace(spans: list[dict], trace_id: str | None, match: str) -> str | None:
+    if trace_id:
+        return trace_id
+    roots = [span for span in spans if span["parent_id"] is None and match in span["name"]]
+    if not roots:
+        return None
+    return max(roots, key=lambda span: span["start_ns"])["trace_id"]
+
+
+def build_tree(spans: list[dict]) -> tuple[list[dict], dict[str, list[dict]]]:
+    ids = {span["span_id"] for span in spans}
+    children: dict[str, list[dict]] = defaultdict(list)
+    roots = []
+    for span in sorted(spans, key=lambda span: span["start_ns"]):
+        if span["parent_id"] in ids:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+    return roots, children
+
+
+def _ms(span: dict) -> float:
+    return (span["end_ns"] - span["start_ns"]) / 1e6
+
+
+def print_waterfall(roots: list[dict], children: dict[str, list[dict]]) -> None:
+    start = min(span["start_ns"] for span in roots)
+    end = max(span["end_ns"] for span in roots)
+    scale = BAR_WIDTH / max(end - start, 1)
+
+    def walk(span: dict, depth: int) -> None:
+        offset = int((span["start_ns"] - start) * scale)
+        width = max(1, int((span["end_ns"] - span["start_ns"]) * scale))
+        bar = " " * offset + "#" * width
+        label = f"{'  ' * depth}{span['name']} [{span['service']}]"
+        flag = " !" if span["status"] == "ERROR" else ""
+        print(f"{label:<70} {_ms(span):>10.1f} ms |{bar:<{BAR_WIDTH}}|{flag}")
+        for child in children[span["span_id"]]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+
+# Collapsed-stack output ("a;b;c <self time in us>") for flamegraph.pl or speedscope.
+def print_folded(roots: list[dict], children: dict[str, list[dict]]) -> None:
+    def walk(span: dict, stack: list[str]) -> None:
+        stack = [*stack, span["name"].replace(";", ",")]
+        nested = sum(child["end_ns"] - child["start_ns"] for child in children[span["span_id"]])
+        self_ns = max(0, span["end_ns"] - span["start_ns"] - nested)
+        print(f"{';'.join(stack)} {self_ns // 1000}")
+        for child in children[span["span_id"]]:
+            walk(child, stack)
+
+    for root in roots:
+        walk(root, [])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Break down one trace from JSONL span exports.")
+    parser.add_argument("files", nargs="*", default=[DEFAULT_TRACE_FILE])
+    parser.add_argument("--trace", help="trace id (defaults to the latest matching request)")
+    parser.add_argument("--match", default="/message", help="root span name to pick the latest trace by")
+    parser.add_argument("--folded", action="store_true", help="print collapsed stacks instead of a waterfall")
+    args = parser.parse_args()
+
+    spans = load_spans([path for path in args.files if Path(path).exists()])
+    trace_id = pick_trace(spans, args.trace, args.match)
+    selected = [span for span in spans if span["trace_id"] == trace_id]
+    if not selected:
+        raise SystemExit("no matching trace found")
+    roots, children = build_tree(selected)
+    if args.folded:
+        print_folded(roots, children)
+        return
+    print(f"trace {trace_id} ({len(selected)} spans)")
+    print_waterfall(roots, children)
+
+
+if __name__ == "__main__":
+    main()
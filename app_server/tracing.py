@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import functools
+from contextlib import nullcontext
+
+from common import tracing as common_tracing
+from common.tracing import TracingTransport
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+SERVICE_NAME = "app-server"
+MAX_STATEMENT_LENGTH = 200
+
+TRACER = trace.get_tracer(SERVICE_NAME)
+
+
+def configure(exporter: str, file_path: str, sample_ratio: float = 1.0) -> bool:
+    return common_tracing.configure(SERVICE_NAME, exporter, file_path, sample_ratio)
+
+
+def span(name: str, attributes: dict | None = None):
+    return TRACER.start_as_current_span(name, attributes=attributes)
+
+
+def traced(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with TRACER.start_as_current_span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def inject(headers: dict | None = None) -> dict:
+    headers = dict(headers or {})
+    propagate.inject(headers)
+    return headers
+
+
+def db_span(sql: str):
+    # Only trace statements issued inside a sampled request; startup migrations
+    # and background work would otherwise each become a root trace.
+    if not trace.get_current_span().is_recording():
+        return nullcontext()
+    statement = " ".join(sql.split())
+    verb = statement.split(" ", 1)[0].upper() if statement else "SQL"
+    return TRACER.start_as_current_span(
+        f"sqlite {verb}",
+        kind=SpanKind.CLIENT,
+        attributes={"db.system": "sqlite", "db.statement": statement[:MAX_STATEMENT_LENGTH]},
+    )
+
+
+class TracingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        method = scope["method"]
+        with TRACER.start_as_current_span(
+            f"{method} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as current:
+            trace_id = f"{current.get_span_context().trace_id:032x}".encode("latin-1")
+
+            async def send_with_trace(message) -> None:
+                if message["type"] == "http.response.start":
+                    current.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        current.set_status(Status(StatusCode.ERROR))
+                    message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                if route is not None and hasattr(route, "path"):
+                    current.update_name(f"{method} {route.path}")
+                    current.set_attribute("http.route", route.path)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+MAX_BODY_BYTES = 64 * 1024
+SCRUBBED = "[scrubbed]"
+SECRET_HEADERS = frozenset(
+    {"authorization", "proxy-authorization", "cookie", "set-cookie", "x-goog-api-key", "x-api-key"}
+)
+SECRET_FIELDS = frozenset(
+    {
+        "access_token",
+        "refresh_token",
+        "id_token",
+        "client_secret",
+        "code",
+        "code_verifier",
+        "api_key",
+        "key",
+        "password",
+        "jwt",
+    }
+)
+
+
+class CaptureWriter:
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+
+_writer: CaptureWriter | None = None
+_service = ""
+_skip_prefixes: tuple[str, ...] = ()
+
+
+def configure(service: str, path: str, skip_prefixes: tuple[str, ...] = ("/metrics",)) -> bool:
+    global _writer, _service, _skip_prefixes
+    _writer = CaptureWriter(path) if path else None
+    _service = service
+    _skip_prefixes = skip_prefixes
+    return _writer is not None
+
+
+def scrub_headers(headers) -> dict:
+    return {
+        name.lower(): SCRUBBED if name.lower() in SECRET_HEADERS else value
+        for name, value in headers
+    }
+
+
+def scrub_value(value):
+    if isinstance(value, dict):
+        return {
+            key: SCRUBBED if key.lower() in SECRET_FIELDS and value[key] else scrub_value(value[key])
+            for key in value
+        }
+    if isinstance(value, list):
+        return [scrub_value(item) for item in value]
+    return value
+
+
+def scrub_query(query: str) -> str:
+    return urlencode(list(scrub_value(dict(parse_qsl(query, keep_blank_values=True))).items()))
+
+
+def decode_body(content: bytes, content_type: str, size: int | None = None):
+    # JSON and form bodies are stored parsed so secrets can be scrubbed field by
+    # field. One that was cut off (size is the full length when content is only
+    # a prefix) or does not parse may still hold secrets, so only its size is
+    # kept. Anything else is kept as (possibly truncated) text.
+    if not content:
+        return None
+    size = len(content) if size is None else size
+    structured = "json" in content_type or "x-www-form-urlencoded" in content_type
+    if structured and size > len(content):
+        return {"truncated": True, "bytes": size}
+    if "json" in content_type:
+        try:
+            return scrub_value(json.loads(content))
+        except ValueError:
+            return {"unparsed": True, "bytes": size}
+    if "x-www-form-urlencoded" in content_type:
+        return scrub_value(dict(parse_qsl(content.decode("utf-8", "replace"), keep_blank_values=True)))
+    text = content[:MAX_BODY_BYTES].decode("utf-8", "replace")
+    if size > MAX_BODY_BYTES:
+        return {"truncated": True, "bytes": size, "text": text}
+    return text
+
+
+def _record(kind: str, started: float, request: dict, response: dict) -> None:
+    if _writer is None:
+        return
+    _writer.write(
+        {
+            "kind": kind,
+            "service": _service,
+            "ts": started,
+            "duration_ms": (time.time() - started) * 1000,
+            "request": request,
+            "response": response,
+        }
+    )
+
+
+class CaptureMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or _writer is None or scope["path"].startswith(_skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+        started = time.time()
+        request_body = bytearray()
+        response_body = bytearray()
+        # Full body lengths; only the first MAX_BODY_BYTES or so are kept.
+        sizes = {"request": 0, "response": 0}
+        response_start: dict = {}
+
+        async def receive_and_record():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                sizes["request"] += len(chunk)
+                if len(request_body) < MAX_BODY_BYTES:
+                    request_body.extend(chunk)
+            return message
+
+        async def send_and_record(message) -> None:
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                sizes["response"] += len(chunk)
+                if len(response_body) < MAX_BODY_BYTES:
+                    response_body.extend(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_record, send_and_record)
+        finally:
+            request_headers = scrub_headers((k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"])
+            response_headers = scrub_headers(
+                (k.decode("latin-1"), v.decode("latin-1")) for k, v in response_start.get("headers", [])
+            )
+            _record(
+                "inbound",
+                started,
+                {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(scope.get("route"), "path", None),
+                    "query": scrub_query(scope["query_string"].decode("latin-1")),
+                    "headers": request_headers,
+                    "body": decode_body(
+                        bytes(request_body), request_headers.get("content-type", ""), sizes["request"]
+                    ),
+                },
+                {
+                    "status": response_start.get("status", 500),
+                    "headers": response_headers,
+                    "body": decode_body(
+                        bytes(response_body), response_headers.get("content-type", ""), sizes["response"]
+                    ),
+                },
+            )
+
+
+class CaptureTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if _writer is None:
+            return await self._transport.handle_async_request(request)
+        started = time.time()
+        response = await self._transport.handle_async_request(request)
+        # Buffer the raw body so it can be both recorded and handed back unchanged.
+        try:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        decoded = httpx.Response(response.status_code, headers=response.headers, content=raw).content
+        _record(
+            "upstream",
+            started,
+            {
+                "method": request.method,
+                "url": str(request.url.copy_with(query=None)),
+                "query": scrub_query(request.url.query.decode("ascii")),
+                "headers": scrub_headers(request.headers.items()),
+                "body": decode_body(request.content, request.headers.get("content-type", "")),
+            },
+            {
+                "status": response.status_code,
+                "headers": scrub_headers(response.headers.items()),
+                "body": decode_body(decoded, response.headers.get("content-type", "")),
+            },
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(raw),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpen(Exception):
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(f"{host} is unavailable (circuit open, retry in {math.ceil(retry_after)}s)")
+        self.host = host
+        self.retry_after = retry_after
+
+
+@dataclass
+class CircuitOptions:
+    failure_threshold: int = 5
+    open_seconds: float = 30.0
+    adaptive_timeouts: bool = True
+    timeout_multiplier: float = 3.0
+    timeout_floor_seconds: float = 2.0
+    min_samples: int = 20
+
+
+@dataclass(frozen=True)
+class CircuitMetrics:
+    # Each server registers its own prometheus metrics and passes them in.
+    state: Any  # Gauge by host
+    rejections: Any  # Counter by host
+    timeout_seconds: Any  # Gauge by host and operation
+
+
+class Circuit:
+    # closed: requests flow, consecutive failures are counted.
+    # open: requests fail fast until open_seconds have passed.
+    # half_open: one probe request goes through; its outcome closes or reopens.
+    def __init__(self, host: str, options: CircuitOptions, metrics: CircuitMetrics | None = None) -> None:
+        self.host = host
+        self.options = options
+        self.metrics = metrics
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        # Per operation: one host can serve calls of very different speeds
+        # (Gemini's embedContent and generateContent).
+        self.latencies: dict[str, deque[float]] = {}
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        if self.metrics:
+            self.metrics.state.labels(self.host).set(STATES[state])
+
+    def allow(self) -> None:
+        if self.state == "closed":
+            return
+        remaining = self.opened_at + self.options.open_seconds - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self._set_state("half_open")
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return
+        if self.metrics:
+            self.metrics.rejections.labels(self.host).inc()
+        raise CircuitOpen(self.host, max(remaining, 1.0))
+
+    def success(self, latency: float, operation: str) -> None:
+        self.latencies.setdefault(operation, deque(maxlen=200)).append(latency)
+        self.failures = 0
+        self.probing = False
+        if self.state != "closed":
+            self._set_state("closed")
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.options.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state("open")
+
+    def release(self) -> None:
+        # The request ended without an upstream verdict (cancelled, rate limited).
+        self.probing = False
+
+    def read_timeout(self, configured: float | None, operation: str) -> float | None:
+        latencies = self.latencies.get(operation, ())
+        if not self.options.adaptive_timeouts or len(latencies) < self.options.min_samples:
+            return configured
+        ordered = sorted(latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        adaptive = max(self.options.timeout_floor_seconds, p99 * self.options.timeout_multiplier)
+        timeout = adaptive if configured is None else min(configured, adaptive)
+        if self.metrics:
+            self.metrics.timeout_seconds.labels(self.host, operation).set(timeout)
+        return timeout
+
+
+_options = CircuitOptions()
+_metrics: CircuitMetrics | None = None
+_circuits: dict[str, Circuit] = {}
+
+
+def configure(options: CircuitOptions, metrics: CircuitMetrics | None = None) -> None:
+    global _options, _metrics
+    _options = options
+    _metrics = metrics
+    _circuits.clear()
+
+
+def circuit_for(host: str) -> Circuit:
+    circuit = _circuits.get(host)
+    if circuit is None:
+        circuit = Circuit(host, _options, _metrics)
+        _circuits[host] = circuit
+    return circuit
+
+
+def _operation(request: httpx.Request) -> str:
+    # Callers name the operation in the request's "operation" extension. Gemini
+    # URLs carry it after the colon (models/...:generateContent).
+    tagged = request.extensions.get("operation")
+    if tagged:
+        return tagged
+    last = request.url.path.rsplit("/", 1)[-1]
+    return last.split(":", 1)[1] if ":" in last else request.method
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        circuit = circuit_for(request.url.netloc.decode("ascii"))
+        circuit.allow()
+        operation = _operation(request)
+        timeouts = dict(request.extensions.get("timeout") or {})
+        if timeouts:
+            timeouts["read"] = circuit.read_timeout(timeouts.get("read"), operation)
+            request.extensions["timeout"] = timeouts
+        started = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            circuit.failure()
+            raise
+        except BaseException:
+            circuit.release()
+            raise
+        if response.status_code >= 500 and "x-circuit-open" in response.headers:
+            # Our own server failing fast for a different upstream; not this host's fault.
+            circuit.release()
+        elif response.status_code >= 500:
+            circuit.failure()
+        else:
+            circuit.success(time.monotonic() - started, operation)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
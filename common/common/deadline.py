@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+# Remaining budget in milliseconds. Relative rather than an absolute time so
+# clock skew between hosts does not matter; each hop re-derives it on send.
+HEADER = "x-deadline-ms"
+
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining() -> float | None:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clear() -> None:
+    # For work shared by several requests; each of them enforces its own deadline.
+    _deadline.set(None)
+
+
+@contextmanager
+def budget(seconds: float | None):
+    # Only ever shortens the current deadline.
+    deadline = _deadline.get()
+    if seconds is not None and seconds > 0:
+        candidate = time.monotonic() + seconds
+        deadline = candidate if deadline is None else min(deadline, candidate)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def headers() -> dict:
+    left = remaining()
+    if left is None:
+        return {}
+    return {HEADER: str(max(0, int(left * 1000)))}
+
+
+def parse_header(value: str | None) -> float | None:
+    try:
+        return max(0.0, float(value) / 1000) if value else None
+    except ValueError:
+        return None
+
+
+class DeadlineTransport(httpx.AsyncBaseTransport):
+    # Caps every timeout of an outgoing request at the remaining budget.
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        left = remaining()
+        if left is None:
+            return await self._transport.handle_async_request(request)
+        if left <= 0:
+            raise DeadlineExceeded(f"deadline exceeded before {request.method} {request.url.host}")
+        timeouts = request.extensions.get("timeout") or dict.fromkeys(("connect", "read", "write", "pool"))
+        request.extensions["timeout"] = {
+            key: left if value is None else min(value, left) for key, value in timeouts.items()
+        }
+        try:
+            return await self._transport.handle_async_request(request)
+        except httpx.TimeoutException as exc:
+            if (remaining() or 0) <= 0:
+                raise DeadlineExceeded(f"deadline exceeded waiting for {request.url.host}") from exc
+            raise
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from typing import Sequence
+
+import httpx
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+EXPORTERS = {"", "file", "otlp", "console"}
+
+TRACER = trace.get_tracer(__name__)
+
+
+def span_record(span: ReadableSpan) -> dict:
+    context = span.get_span_context()
+    return {
+        "trace_id": f"{context.trace_id:032x}",
+        "span_id": f"{context.span_id:016x}",
+        "parent_id": f"{span.parent.span_id:016x}" if span.parent else None,
+        "name": span.name,
+        "service": span.resource.attributes.get("service.name", ""),
+        "kind": span.kind.name,
+        "start_ns": span.start_time,
+        "end_ns": span.end_time,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+# One JSON object per line so several processes and both servers can append to
+# files that app_server/trace_report.py merges afterwards.
+class JsonlSpanExporter(SpanExporter):
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(span_record(span)) + "\n" for span in spans)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _exporter(kind: str, file_path: str) -> SpanExporter:
+    if kind == "file":
+        return JsonlSpanExporter(file_path)
+    if kind == "console":
+        return ConsoleSpanExporter()
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError as exc:
+        raise RuntimeError(
+            "TRACE_EXPORT=otlp requires the opentelemetry-exporter-otlp-proto-http package"
+        ) from exc
+    # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables.
+    return OTLPSpanExporter()
+
+
+def configure(service_name: str, exporter: str, file_path: str, sample_ratio: float = 1.0) -> bool:
+    if exporter not in EXPORTERS:
+        raise ValueError(f"unsupported trace exporter: {exporter}")
+    if not exporter:
+        return False
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_exporter(exporter, file_path)))
+    trace.set_tracer_provider(provider)
+    return True
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    # Spans are named after the host, or after the path for clients that only
+    # talk to one host (the MCP server's app server client).
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        inject_context: bool = False,
+        name_by_path: bool = False,
+    ) -> None:
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._inject_context = inject_context
+        self._name_by_path = name_by_path
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        target = request.url.path if self._name_by_path else request.url.host
+        with TRACER.start_as_current_span(
+            f"{request.method} {target}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "http.request.method": request.method,
+                "server.address": request.url.host,
+                "url.path": request.url.path,
+            },
+        ) as current:
+            if self._inject_context:
+                propagate.inject(request.headers)
+            response = await self._transport.handle_async_request(request)
+            current.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                current.set_status(Status(StatusCode.ERROR))
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
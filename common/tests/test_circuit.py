@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from common import circuit
+from common.circuit import Circuit, CircuitBreakerTransport, CircuitOpen, CircuitOptions
+
+
+def _tripped() -> Circuit:
+    breaker = Circuit("google.test", CircuitOptions(failure_threshold=2, open_seconds=0))
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = _tripped()
+    breaker.allow()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.success(0.1, "GET")
+    assert breaker.state == "closed"
+    breaker.allow()
+    breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = _tripped()
+    breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+
+
+def test_released_probe_frees_the_slot():
+    breaker = _tripped()
+    breaker.allow()
+    breaker.release()
+    breaker.allow()
+    assert breaker.state == "half_open"
+
+
+def test_open_circuit_fails_fast():
+    breaker = Circuit("google.test", CircuitOptions(failure_threshold=1, open_seconds=30))
+    breaker.failure()
+    with pytest.raises(CircuitOpen) as exc_info:
+        breaker.allow()
+    assert 29 < exc_info.value.retry_after <= 30
+
+
+def test_adaptive_timeouts_are_kept_per_operation():
+    breaker = Circuit("google.test", CircuitOptions(min_samples=3, timeout_floor_seconds=0.5))
+    for _ in range(3):
+        breaker.success(1.0, "slow")
+        breaker.success(0.01, "fast")
+    assert breaker.read_timeout(10.0, "slow") == 3.0
+    assert breaker.read_timeout(10.0, "fast") == 0.5
+    assert breaker.read_timeout(10.0, "other") == 10.0
+
+
+def test_transport_opens_after_server_errors():
+    circuit.configure(CircuitOptions(failure_threshold=2))
+    statuses = iter([503, 503])
+
+    async def scenario() -> None:
+        transport = CircuitBreakerTransport(httpx.MockTransport(lambda request: httpx.Response(next(statuses))))
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(2):
+                await client.get("https://google.test/events", extensions={"operation": "list_events"})
+            with pytest.raises(CircuitOpen):
+                await client.get("https://google.test/events")
+
+    asyncio.run(scenario())
+    assert circuit.circuit_for("google.test").state == "open"
+    circuit.configure(CircuitOptions())
@@ -1,6 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import time
+
+import httpx
+from authlib.jose import JsonWebKey
 from fastmcp import Context
+from fastmcp.server.auth import JWTVerifier
+
+from metrics import JWKS_LOOKUPS
 
 
 def _extract_bearer_token(authorization: str | None) -> str | None:
@@ -29,3 +37,97 @@ def require_jwt(jwt: str | None = None, ctx: Context | None = None) -> str:
     if not token:
         raise ValueError("missing jwt")
     return token
+
+
+class CachedJWKSVerifier(JWTVerifier):
+    # Serves verification keys from memory. Once the cached set is older than
+    # refresh_seconds it is refetched in the background while the current keys
+    # keep answering; a failed refresh leaves the stale set in place. Only an
+    # unknown kid (a key rotation) waits on the network, at most once per
+    # min_refetch_seconds.
+    def __init__(
+        self,
+        *,
+        jwks_uri: str,
+        issuer: str,
+        algorithm: str = "ES256",
+        refresh_seconds: float = 300.0,
+        min_refetch_seconds: float = 10.0,
+    ) -> None:
+        super().__init__(jwks_uri=jwks_uri, issuer=issuer, algorithm=algorithm)
+        self._refresh_seconds = refresh_seconds
+        self._min_refetch_seconds = min_refetch_seconds
+        self._last_fetch_attempt = 0.0
+        self._refresh_task: asyncio.Task | None = None
+        self._fetch_lock = asyncio.Lock()
+
+    def _cached_key(self, kid: str | None):
+        if kid:
+            return self._jwks_cache.get(kid)
+        if len(self._jwks_cache) == 1:
+            return next(iter(self._jwks_cache.values()))
+        return None
+
+    async def _load(self) -> None:
+        # Callers hold _fetch_lock.
+        self._last_fetch_attempt = time.monotonic()
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.jwks_uri)
+        response.raise_for_status()
+        keys = {}
+        for key_data in response.json().get("keys", []):
+            public_key = JsonWebKey.import_key(key_data).get_public_key()
+            keys[key_data.get("kid") or "_default"] = public_key
+        self._jwks_cache = keys
+        self._jwks_cache_time = time.monotonic()
+
+    async def _fetch(self) -> None:
+        async with self._fetch_lock:
+            await self._load()
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self._fetch()
+        except Exception as exc:
+            self.logger.warning("JWKS background refresh failed, keeping cached keys: %s", exc)
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def ensure_keys(self) -> bool:
+        if not self._jwks_cache and time.monotonic() - self._last_fetch_attempt >= self._min_refetch_seconds:
+            try:
+                await self._fetch()
+            except httpx.HTTPError as exc:
+                self.logger.warning("JWKS fetch failed: %s", exc)
+        return bool(self._jwks_cache)
+
+    async def _get_jwks_key(self, kid: str | None):
+        key = self._cached_key(kid)
+        now = time.monotonic()
+        if key is not None:
+            JWKS_LOOKUPS.labels("hit").inc()
+            if now - self._jwks_cache_time >= self._refresh_seconds:
+                self._schedule_refresh()
+            return key
+        JWKS_LOOKUPS.labels("miss").inc()
+        # Misses queue on the fetch lock. One that arrives while another fetch
+        # is in flight (the first requests after startup, or right after a key
+        # rotation) gets that fetch's keys instead of failing the
+        # min_refetch_seconds check, and concurrent misses fetch only once.
+        async with self._fetch_lock:
+            key = self._cached_key(kid)
+            if key is not None:
+                return key
+            if time.monotonic() - self._last_fetch_attempt < self._min_refetch_seconds:
+                raise ValueError(f"Key ID '{kid}' not found in cached JWKS")
+            try:
+                await self._load()
+            except httpx.HTTPError as exc:
+                raise ValueError(f"Failed to fetch JWKS: {exc}") from exc
+        key = self._cached_key(kid)
+        if key is None:
+            raise ValueError(f"Key ID '{kid}' not found in JWKS")
+        return key
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from common import circuit as common_circuit
+from common.circuit import CircuitBreakerTransport, CircuitMetrics, CircuitOpen, CircuitOptions
+
+from metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE, UPSTREAM_TIMEOUT_SECONDS
+
+
+def configure(
+    failure_threshold: int,
+    open_seconds: float,
+    adaptive_timeouts: bool,
+    timeout_multiplier: float,
+    timeout_floor_seconds: float,
+) -> None:
+    common_circuit.configure(
+        CircuitOptions(
+            failure_threshold=failure_threshold,
+            open_seconds=open_seconds,
+            adaptive_timeouts=adaptive_timeouts,
+            timeout_multiplier=timeout_multiplier,
+            timeout_floor_seconds=timeout_floor_seconds,
+        ),
+        CircuitMetrics(CIRCUIT_STATE, CIRCUIT_REJECTIONS, UPSTREAM_TIMEOUT_SECONDS),
+    )
@@ -1,10 +1,42 @@
 from __future__ import annotations
 
+from common.capture import CaptureTransport
 import httpx
 
+import deadline
+from circuit import CircuitBreakerTransport, CircuitOpen
+from deadline import DeadlineTransport
+from metrics import MetricsTransport
+from tracing import TracingTransport
+
 
 def _headers(jwt: str) -> dict:
-    return {"Authorization": f"Bearer {jwt}"}
+    return {"Authorization": f"Bearer {jwt}", **deadline.headers()}
+
+
+def _client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=15.0,
+        transport=TracingTransport(
+            CircuitBreakerTransport(DeadlineTransport(MetricsTransport(CaptureTransport()))),
+            inject_context=True,
+            name_by_path=True,
+        ),
+    )
+
+
+def _operation(url: str) -> dict:
+    # /api/<provider>/<credential_id>/<operation> and /auth/token: the circuit
+    # keeps one adaptive timeout window per operation.
+    return {"operation": url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]}
+
+
+def _raise_for_status(resp: httpx.Response) -> None:
+    host = resp.headers.get("x-circuit-open")
+    if resp.status_code == 503 and host:
+        # The app server failed fast on one of its upstreams; pass that on as is.
+        raise CircuitOpen(host, float(resp.headers.get("retry-after") or 1))
+    resp.raise_for_status()
 
 
 def _clean_params(params: dict | None) -> dict | None:
@@ -15,18 +47,28 @@ def _clean_params(params: dict | None) -> dict | None:
 
 
 async def get(app_server_url: str, path: str, jwt: str, params: dict | None = None) -> dict:
-    async with httpx.AsyncClient(timeout=15.0) as client:
+    async with _client() as client:
         resp = await client.get(
             f"{app_server_url}{path}",
             headers=_headers(jwt),
             params=_clean_params(params),
+            extensions=_operation(path),
         )
-    resp.raise_for_status()
+    _raise_for_status(resp)
+    return resp.json()
+
+
+async def post_form(url: str, data: dict) -> dict:
+    async with _client() as client:
+        resp = await client.post(url, data=data, extensions=_operation(url))
+    _raise_for_status(resp)
     return resp.json()
 
 
 async def post(app_server_url: str, path: str, jwt: str, payload: dict) -> dict:
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.post(f"{app_server_url}{path}", headers=_headers(jwt), json=payload)
-    resp.raise_for_status()
+    async with _client() as client:
+        resp = await client.post(
+            f"{app_server_url}{path}", headers=_headers(jwt), json=payload, extensions=_operation(path)
+        )
+    _raise_for_status(resp)
     return resp.json()
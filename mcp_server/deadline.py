@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from common.deadline import HEADER, DeadlineExceeded, DeadlineTransport, budget, headers, parse_header, remaining
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from tracing import request_meta
+
+
+class DeadlineMiddleware(Middleware):
+    # The budget comes from the tool call's _meta (the app server's chat) or
+    # the HTTP header, capped by default_seconds. Tools run in the MCP session's
+    # task, so it is set here rather than in ASGI middleware.
+    def __init__(self, default_seconds: float = 0.0) -> None:
+        self.default_seconds = default_seconds
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        carrier = {**get_http_headers(include_all=True), **request_meta(context)}
+        seconds = [s for s in (parse_header(carrier.get(HEADER)), self.default_seconds or None) if s is not None]
+        with budget(min(seconds) if seconds else None):
+            return await call_next(context)
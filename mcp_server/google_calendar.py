@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from common.capture import CaptureTransport
+import httpx
+
+from circuit import CircuitBreakerTransport
+from deadline import DeadlineTransport
+from client import _clean_params, post, post_form
+from metrics import GOOGLE_TOKEN_LOOKUPS, MetricsTransport
+from tracing import TracingTransport
+
+BASE_URL = "https://www.googleapis.com/calendar/v3"
+ENABLED = False
+REFRESH_MARGIN_SECONDS = 30.0
+DEFAULT_TTL_SECONDS = 300.0
+TOKEN_URL = ""
+CLIENT_ID = ""
+CLIENT_SECRET = ""
+
+
+def configure(
+    enabled: bool,
+    base_url: str,
+    refresh_margin_seconds: float,
+    default_ttl_seconds: float,
+    token_url: str = "",
+    client_id: str = "",
+    client_secret: str = "",
+) -> None:
+    global ENABLED, BASE_URL, REFRESH_MARGIN_SECONDS, DEFAULT_TTL_SECONDS, TOKEN_URL, CLIENT_ID, CLIENT_SECRET
+    if enabled and not (client_id and client_secret):
+        raise RuntimeError("MCP_DIRECT_GOOGLE=true requires MCP_CLIENT_ID and MCP_CLIENT_SECRET")
+    ENABLED = enabled
+    BASE_URL = base_url.rstrip("/")
+    REFRESH_MARGIN_SECONDS = refresh_margin_seconds
+    DEFAULT_TTL_SECONDS = default_ttl_seconds
+    TOKEN_URL = token_url
+    CLIENT_ID = client_id
+    CLIENT_SECRET = client_secret
+
+
+class ServiceToken:
+    # The server's own JWT, from the app server's client_credentials grant.
+    # The app server vends Google tokens only to this client, never on the
+    # strength of a caller's JWT.
+    def __init__(self) -> None:
+        self._token: str | None = None
+        self._valid_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> str:
+        if self._token and time.time() < self._valid_until:
+            return self._token
+        async with self._lock:
+            if self._token and time.time() < self._valid_until:
+                return self._token
+            payload = await post_form(
+                TOKEN_URL,
+                {"grant_type": "client_credentials", "client_id": CLIENT_ID, "client_secret": CLIENT_SECRET},
+            )
+            self._token = payload["access_token"]
+            self._valid_until = time.time() + int(payload.get("expires_in") or 0) - REFRESH_MARGIN_SECONDS
+            return self._token
+
+    def invalidate(self) -> None:
+        self._token = None
+
+
+SERVICE_TOKEN = ServiceToken()
+
+
+class TokenCache:
+    # Google access tokens vended by the app server, keyed by credential. A
+    # token is reused until REFRESH_MARGIN_SECONDS before its expiry; the app
+    # server refreshes 60 seconds before expiry, so the margin must stay below
+    # that or every call inside the gap would refetch the same token.
+    def __init__(self) -> None:
+        self._tokens: dict[str, tuple[str, float]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _cached(self, credential_id: str) -> str | None:
+        entry = self._tokens.get(credential_id)
+        if entry and time.time() < entry[1]:
+            return entry[0]
+        return None
+
+    async def get(self, app_server_url: str, credential_id: str) -> str:
+        token = self._cached(credential_id)
+        if token:
+            GOOGLE_TOKEN_LOOKUPS.labels("hit").inc()
+            return token
+        # One fetch per credential; concurrent calls wait for it.
+        async with self._locks.setdefault(credential_id, asyncio.Lock()):
+            token = self._cached(credential_id)
+            if token:
+                GOOGLE_TOKEN_LOOKUPS.labels("hit").inc()
+                return token
+            GOOGLE_TOKEN_LOOKUPS.labels("miss").inc()
+            payload = await self._vend(app_server_url, credential_id)
+            expires_at = payload.get("expires_at")
+            valid_until = expires_at - REFRESH_MARGIN_SECONDS if expires_at else time.time() + DEFAULT_TTL_SECONDS
+            self._tokens[credential_id] = (payload["access_token"], valid_until)
+            return payload["access_token"]
+
+    async def _vend(self, app_server_url: str, credential_id: str) -> dict:
+        path = f"/api/google_calendar/{credential_id}/access_token"
+        try:
+            return await post(app_server_url, path, await SERVICE_TOKEN.get(), {})
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 401:
+                raise
+        # Signing key rotated under the cached service token: get a new one once.
+        SERVICE_TOKEN.invalidate()
+        return await post(app_server_url, path, await SERVICE_TOKEN.get(), {})
+
+    def invalidate(self, credential_id: str, token: str) -> None:
+        entry = self._tokens.get(credential_id)
+        if entry and entry[0] == token:
+            del self._tokens[credential_id]
+
+
+TOKENS = TokenCache()
+
+
+async def call(app_server_url: str, credential_id: str, request: Callable[[str], Awaitable[dict]]) -> dict:
+    token = await TOKENS.get(app_server_url, credential_id)
+    try:
+        return await request(token)
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code != 401:
+            raise
+    # Revoked or rotated before its expiry: fetch a fresh token once.
+    TOKENS.invalidate(credential_id, token)
+    return await request(await TOKENS.get(app_server_url, credential_id))
+
+
+def _client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=10.0,
+        transport=TracingTransport(CircuitBreakerTransport(DeadlineTransport(MetricsTransport(CaptureTransport())))),
+    )
+
+
+async def _request(
+    operation: str,
+    method: str,
+    path: str,
+    access_token: str,
+    params: dict | None = None,
+    json: dict | None = None,
+) -> httpx.Response:
+    async with _client() as client:
+        resp = await client.request(
+            method,
+            f"{BASE_URL}{path}",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params=_clean_params(params),
+            json=json,
+            # Event ids in the path would make per-operation timeout windows per event.
+            extensions={"operation": operation},
+        )
+    resp.raise_for_status()
+    return resp
+
+
+def _flag(value: bool | None) -> str | None:
+    return None if value is None else str(value).lower()
+
+
+async def list_calendars(
+    access_token: str,
+    max_results: int | None = None,
+    page_token: str | None = None,
+    min_access_role: str | None = None,
+    fields: str | None = None,
+) -> dict:
+    params = {
+        "maxResults": max_results,
+        "pageToken": page_token,
+        "minAccessRole": min_access_role,
+        "fields": fields,
+    }
+    return (await _request("list_calendars", "GET", "/users/me/calendarList", access_token, params=params)).json()
+
+
+async def list_events(
+    access_token: str,
+    calendar_id: str,
+    max_results: int | None = None,
+    page_token: str | None = None,
+    time_min: str | None = None,
+    time_max: str | None = None,
+    order_by: str | None = None,
+    single_events: bool | None = None,
+    q: str | None = None,
+    show_deleted: bool | None = None,
+    time_zone: str | None = None,
+    fields: str | None = None,
+) -> dict:
+    params = {
+        "maxResults": max_results,
+        "pageToken": page_token,
+        "timeMin": time_min,
+        "timeMax": time_max,
+        "orderBy": order_by,
+        "singleEvents": _flag(single_events),
+        "q": q,
+        "showDeleted": _flag(show_deleted),
+        "timeZone": time_zone,
+        "fields": fields,
+    }
+    resp = await _request("list_events", "GET", f"/calendars/{calendar_id}/events", access_token, params=params)
+    return resp.json()
+
+
+async def get_event(access_token: str, calendar_id: str, event_id: str, fields: str | None = None) -> dict:
+    resp = await _request(
+        "get_event", "GET", f"/calendars/{calendar_id}/events/{event_id}", access_token, params={"fields": fields}
+    )
+    return resp.json()
+
+
+async def create_event(access_token: str, payload: dict) -> dict:
+    calendar_id = payload.get("calendar_id")
+    if not calendar_id:
+        raise ValueError("calendar_id required")
+    body = payload.get("event") or payload
+    return (await _request("create_event", "POST", f"/calendars/{calendar_id}/events", access_token, json=body)).json()
+
+
+async def update_event(access_token: str, calendar_id: str, event_id: str, payload: dict) -> dict:
+    resp = await _request(
+        "update_event", "PATCH", f"/calendars/{calendar_id}/events/{event_id}", access_token, json=payload
+    )
+    return resp.json()
+
+
+async def delete_event(access_token: str, calendar_id: str, event_id: str) -> dict:
+    await _request("delete_event", "DELETE", f"/calendars/{calendar_id}/events/{event_id}", access_token)
+    return {"deleted": True}
+
+
+async def availability(access_token: str, calendar_id: str, time_min: str, time_max: str, time_zone: str | None = None) -> dict:
+    body = {"timeMin": time_min, "timeMax": time_max, "items": [{"id": calendar_id}]}
+    if time_zone:
+        body["timeZone"] = time_zone
+    return (await _request("availability", "POST", "/freeBusy", access_token, json=body)).json()
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastmcp import Client
+from fastmcp.client.auth import OAuth
+
+MCP_URL = os.getenv("MCP_URL", "http://127.0.0.1:9001/mcp")
+APP_SERVER_URL = os.getenv("APP_SERVER_URL", "http://127.0.0.1:8000")
+DEFAULT_MIX = "gcal.list_events=6,gcal.availability=3,gcal.list_calendars=1"
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition("=")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def tool_arguments(tool: str, args: argparse.Namespace) -> dict:
+    now = datetime.now(timezone.utc)
+    base = {"credential_id": args.credential_id}
+    if tool == "gcal.list_calendars":
+        return {**base, "max_results": 10}
+    if tool == "gcal.list_events":
+        return {**base, "calendar_id": args.calendar_id, "max_results": 10, "time_min": now.isoformat()}
+    if tool == "gcal.get_event":
+        return {**base, "calendar_id": args.calendar_id, "event_id": args.event_id}
+    if tool == "gcal.availability":
+        return {
+            **base,
+            "calendar_id": args.calendar_id,
+            "time_min": now.isoformat(),
+            "time_max": (now + timedelta(days=1)).isoformat(),
+        }
+    if tool == "gcal.create_event":
+        return {
+            **base,
+            "payload": {
+                "calendar_id": args.calendar_id,
+                "event": {
+                    "summary": "loadgen",
+                    "start": {"dateTime": now.isoformat()},
+                    "end": {"dateTime": (now + timedelta(minutes=30)).isoformat()},
+                },
+            },
+        }
+    raise ValueError(f"no argument template for {tool}")
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+async def fetch_token(args: argparse.Namespace) -> str | None:
+    if args.auth == "jwt":
+        if not args.jwt:
+            raise SystemExit("--jwt (or MCP_JWT) is required with --auth jwt")
+        return args.jwt
+    if args.auth == "client_credentials":
+        async with httpx.AsyncClient(base_url=args.app_server_url, timeout=15.0) as client:
+            client_id, client_secret = args.client_id, args.client_secret
+            if not client_id:
+                resp = await client.post("/oauth/register", json={"client_name": "mcp-loadgen"})
+                resp.raise_for_status()
+                client_id, client_secret = resp.json()["client_id"], resp.json()["client_secret"]
+            resp = await client.post(
+                "/auth/token",
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                },
+            )
+        resp.raise_for_status()
+        return resp.json()["access_token"]
+    return None
+
+
+async def server_cpu_seconds(url: str) -> float | None:
+    try:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            resp = await client.get(url)
+        resp.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    # app_worker_cpu_seconds / mcp_worker_cpu_seconds: unlike process_*, they
+    # are also exported by servers running several workers.
+    for line in resp.text.splitlines():
+        name, _, value = line.partition(" ")
+        if name.endswith("_worker_cpu_seconds"):
+            return float(value)
+    return None
+
+
+async def oauth_login(url: str) -> OAuth:
+    # One interactive flow up front; every session then shares its tokens.
+    auth = OAuth(url, client_name="mcp-loadgen")
+    async with Client(url, auth=auth):
+        pass
+    return auth
+
+
+class LoadRun:
+    def __init__(self, args: argparse.Namespace, auth: str | OAuth) -> None:
+        self.args = args
+        self.auth = auth
+        self.mix = parse_mix(args.mix)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.session_setup: list[float] = []
+        self.session_errors: dict[str, int] = defaultdict(int)
+
+    async def _open(self) -> Client | None:
+        client = Client(self.args.url, auth=self.auth)
+        start = time.perf_counter()
+        try:
+            await client.__aenter__()
+        except Exception as exc:
+            self.session_errors[type(exc).__name__] += 1
+            return None
+        self.session_setup.append((time.perf_counter() - start) * 1000)
+        return client
+
+    async def _close(self, client: Client) -> None:
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception as exc:
+            self.session_errors[f"close:{type(exc).__name__}"] += 1
+
+    async def session(self, deadline: float) -> None:
+        tools, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < deadline:
+            client = await self._open()
+            if client is None:
+                await asyncio.sleep(0.5)
+                continue
+            calls = 0
+            while time.perf_counter() < deadline:
+                if self.args.calls_per_session and calls >= self.args.calls_per_session:
+                    break
+                tool = random.choices(tools, weights)[0]
+                start = time.perf_counter()
+                try:
+                    await client.call_tool(tool, tool_arguments(tool, self.args))
+                except Exception as exc:
+                    self.errors[tool][type(exc).__name__] += 1
+                else:
+                    self.latencies[tool].append((time.perf_counter() - start) * 1000)
+                calls += 1
+            await self._close(client)
+
+    def report(self, elapsed: float, cpu: dict[str, float | None]) -> dict:
+        tools = {}
+        for tool in sorted(self.mix):
+            ok = len(self.latencies[tool])
+            failed = sum(self.errors[tool].values())
+            tools[tool] = {
+                **summarize(self.latencies[tool]),
+                "errors": dict(self.errors[tool]),
+                "error_rate": failed / (ok + failed) if ok + failed else 0.0,
+            }
+        completed = sum(len(values) for values in self.latencies.values())
+        return {
+            "sessions": self.args.sessions,
+            "duration_seconds": elapsed,
+            "throughput_calls_per_second": completed / elapsed if elapsed else 0.0,
+            "tools": tools,
+            "session_setup_ms": summarize(self.session_setup),
+            "session_errors": dict(self.session_errors),
+            "server_cpu_seconds": cpu,
+            "server_cpu_utilization": {
+                name: seconds / elapsed if seconds is not None and elapsed else None
+                for name, seconds in cpu.items()
+            },
+        }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['sessions']} sessions, {report['duration_seconds']:.1f}s, "
+        f"{report['throughput_calls_per_second']:.1f} calls/s"
+    )
+    print(f"{'tool':<22} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>8}")
+    for tool, stats in report["tools"].items():
+        print(
+            f"{tool:<22} {stats['count']:>7} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+            f"{stats['p99']:>8.1f} {stats['max']:>8.1f} {stats['error_rate']:>8.1%}"
+        )
+    setup = report["session_setup_ms"]
+    print(f"{'session setup':<22} {setup['count']:>7} {setup['p50']:>8.1f} {setup['p95']:>8.1f} {setup['p99']:>8.1f} {setup['max']:>8.1f}")
+    for name, utilization in report["server_cpu_utilization"].items():
+        if utilization is not None:
+            print(f"{name} CPU: {report['server_cpu_seconds'][name]:.2f}s ({utilization:.0%} of one core)")
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    token = await fetch_token(args)
+    run = LoadRun(args, token or await oauth_login(args.url))
+    metrics_urls = {
+        "mcp_server": args.url.rsplit("/mcp", 1)[0] + "/metrics",
+        "app_server": f"{args.app_server_url}/metrics",
+    }
+    cpu_before = {name: await server_cpu_seconds(url) for name, url in metrics_urls.items()}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(run.session(deadline) for _ in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    cpu_after = {name: await server_cpu_seconds(url) for name, url in metrics_urls.items()}
+    cpu = {
+        name: cpu_after[name] - cpu_before[name]
+        if cpu_before[name] is not None and cpu_after[name] is not None
+        else None
+        for name in metrics_urls
+    }
+    return run.report(elapsed, cpu)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive concurrent MCP sessions with a weighted gcal.* tool mix.")
+    parser.add_argument("--url", default=MCP_URL)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma separated tool=weight pairs")
+    parser.add_argument("--calls-per-session", type=int, default=0, help="reconnect after this many calls (0 = never)")
+    parser.add_argument("--auth", choices=["jwt", "client_credentials", "oauth"], default="jwt")
+    parser.add_argument("--jwt", default=os.getenv("MCP_JWT"))
+    parser.add_argument("--app-server-url", default=APP_SERVER_URL)
+    parser.add_argument("--client-id", default=os.getenv("OAUTH_CLIENT_ID"), help="registers a new client when omitted")
+    parser.add_argument("--client-secret", default=os.getenv("OAUTH_CLIENT_SECRET"))
+    parser.add_argument("--credential-id", default=os.getenv("TEST_GOOGLE_CREDENTIAL_ID"), required=not os.getenv("TEST_GOOGLE_CREDENTIAL_ID"))
+    parser.add_argument("--calendar-id", default="primary")
+    parser.add_argument("--event-id", help="required when the mix includes gcal.get_event")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError:
+        parser.error(f"invalid --mix: {args.mix}")
+    if "gcal.get_event" in mix and not args.event_id:
+        parser.error("--event-id is required for gcal.get_event")
+    for tool in mix:
+        try:
+            tool_arguments(tool, args)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
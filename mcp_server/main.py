@@ -1,36 +1,146 @@
 from __future__ import annotations
 
+import asyncio
 import os
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
 
+from common import capture
 from dotenv import load_dotenv
 from fastmcp import Context, FastMCP
 from fastmcp.server.auth import JWTVerifier, RemoteAuthProvider
+from prometheus_client import CONTENT_TYPE_LATEST
 from pydantic import AnyHttpUrl
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
 
+import circuit
+import deadline
+import google_calendar
 import tools
+import tracing
+from auth import CachedJWKSVerifier
+from metrics import (
+    HTTPMetricsMiddleware,
+    ToolMetricsMiddleware,
+    latest,
+    mark_process_dead,
+    monitor_event_loop_lag,
+    prepare_multiprocess,
+)
 
 load_dotenv()
 APP_SERVER_URL = os.getenv("APP_SERVER_URL", "http://127.0.0.1:8000")
 MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
 MCP_PORT = int(os.getenv("MCP_PORT", "9001"))
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))
+MCP_STATELESS = os.getenv("MCP_STATELESS", "false").strip().lower() in {"1", "true", "yes", "on"}
+MCP_LOOP = os.getenv("MCP_LOOP", "auto")
+MCP_HTTP = os.getenv("MCP_HTTP", "auto")
+MCP_LIMIT_CONCURRENCY = int(os.getenv("MCP_LIMIT_CONCURRENCY", "0"))
+MCP_BACKLOG = int(os.getenv("MCP_BACKLOG", "2048"))
+MCP_KEEPALIVE_SECONDS = int(os.getenv("MCP_KEEPALIVE_SECONDS", "5"))
+# Open SSE streams only end when the client goes away, so the drain window is short.
+MCP_GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("MCP_GRACEFUL_SHUTDOWN_SECONDS", "5"))
 JWT_SECRET = os.getenv("JWT_SECRET", "change-me")
 JWT_ISSUER = os.getenv("JWT_ISSUER", "app-server")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "ES256")
 AUTH_SERVER_URL = os.getenv("AUTH_SERVER_URL", APP_SERVER_URL)
+JWKS_URL = os.getenv("JWKS_URL", f"{AUTH_SERVER_URL}/.well-known/jwks.json")
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "300"))
 MCP_PUBLIC_URL = os.getenv("MCP_PUBLIC_URL", f"http://{MCP_HOST}:{MCP_PORT}")
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "").strip().lower()
+TRACE_FILE = os.getenv("TRACE_FILE", str(Path(__file__).resolve().parent / "traces.jsonl"))
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+CAPTURE_FILE = os.getenv("CAPTURE_FILE", "").strip()
+MCP_DIRECT_GOOGLE = os.getenv("MCP_DIRECT_GOOGLE", "false").strip().lower() in {"1", "true", "yes", "on"}
+GOOGLE_CALENDAR_BASE_URL = os.getenv("GOOGLE_CALENDAR_BASE_URL", "https://www.googleapis.com/calendar/v3")
+GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS", "30"))
+GOOGLE_TOKEN_CACHE_SECONDS = float(os.getenv("GOOGLE_TOKEN_CACHE_SECONDS", "300"))
+# This server's own OAuth client on the app server; with MCP_DIRECT_GOOGLE it
+# must be listed in the app server's TOKEN_VENDING_CLIENT_IDS.
+MCP_CLIENT_ID = os.getenv("MCP_CLIENT_ID", "")
+MCP_CLIENT_SECRET = os.getenv("MCP_CLIENT_SECRET", "")
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+ADAPTIVE_TIMEOUTS_ENABLED = os.getenv("ADAPTIVE_TIMEOUTS_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3"))
+ADAPTIVE_TIMEOUT_FLOOR_SECONDS = float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR_SECONDS", "2"))
+
+
+def _token_verifier() -> JWTVerifier:
+    if JWT_ALGORITHM.startswith("HS"):
+        return JWTVerifier(public_key=JWT_SECRET, issuer=JWT_ISSUER, algorithm=JWT_ALGORITHM)
+    return CachedJWKSVerifier(
+        jwks_uri=JWKS_URL,
+        issuer=JWT_ISSUER,
+        algorithm=JWT_ALGORITHM,
+        refresh_seconds=JWKS_REFRESH_SECONDS,
+    )
 
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    yield {}
+    lag_monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await lag_monitor
+    mark_process_dead()
+
+
+TOKEN_VERIFIER = _token_verifier()
 mcp = FastMCP(
     "mcp-server",
+    lifespan=lifespan,
     auth=RemoteAuthProvider(
-        token_verifier=JWTVerifier(
-            public_key=JWT_SECRET,
-            issuer=JWT_ISSUER,
-            algorithm="HS256",
-        ),
+        token_verifier=TOKEN_VERIFIER,
         authorization_servers=[AnyHttpUrl(AUTH_SERVER_URL)],
         base_url=MCP_PUBLIC_URL,
         resource_name="mcp-server",
     ),
 )
+mcp.add_middleware(ToolMetricsMiddleware())
+mcp.add_middleware(deadline.DeadlineMiddleware(REQUEST_DEADLINE_SECONDS))
+if tracing.configure(TRACE_EXPORT, TRACE_FILE, TRACE_SAMPLE_RATIO):
+    mcp.add_middleware(tracing.TracingMiddleware())
+capture.configure("mcp-server", CAPTURE_FILE)
+circuit.configure(
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    ADAPTIVE_TIMEOUTS_ENABLED,
+    ADAPTIVE_TIMEOUT_MULTIPLIER,
+    ADAPTIVE_TIMEOUT_FLOOR_SECONDS,
+)
+google_calendar.configure(
+    MCP_DIRECT_GOOGLE,
+    GOOGLE_CALENDAR_BASE_URL,
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS,
+    GOOGLE_TOKEN_CACHE_SECONDS,
+    token_url=f"{AUTH_SERVER_URL}/auth/token",
+    client_id=MCP_CLIENT_ID,
+    client_secret=MCP_CLIENT_SECRET,
+)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    return Response(latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@mcp.custom_route("/healthz", methods=["GET"])
+async def healthz(request: Request) -> Response:
+    return JSONResponse({"status": "ok"})
+
+
+@mcp.custom_route("/readyz", methods=["GET"])
+async def readyz(request: Request) -> Response:
+    # Not ready until tokens can be verified, which needs the app server's JWKS.
+    if isinstance(TOKEN_VERIFIER, CachedJWKSVerifier) and not await TOKEN_VERIFIER.ensure_keys():
+        return JSONResponse({"status": "unavailable", "checks": {"jwks": "no keys"}}, status_code=503)
+    return JSONResponse({"status": "ok", "checks": {"jwks": "ok"}})
 
 
 @mcp.tool(name="gcal.list_calendars")
@@ -141,13 +251,80 @@ async def gcal_availability(
     )
 
 
+@mcp.tool(name="chat.search")
+async def chat_search(
+    query: str,
+    ctx: Context,
+    room_id: str | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+):
+    return await tools.chat_search(
+        APP_SERVER_URL, query, ctx=ctx, room_id=room_id, limit=limit, offset=offset
+    )
+
+
 @mcp.tool(name="gemini.generate")
 async def gemini_generate(credential_id: str, prompt: str, ctx: Context):
     return await tools.gemini_generate(APP_SERVER_URL, credential_id, prompt, ctx=ctx)
 
 
+def _http_middleware() -> list[Middleware]:
+    middleware = [Middleware(HTTPMetricsMiddleware)]
+    if CAPTURE_FILE:
+        middleware.append(Middleware(capture.CaptureMiddleware))
+    return middleware
+
+
+def _uvicorn_config() -> dict:
+    return {
+        "loop": MCP_LOOP,
+        "http": MCP_HTTP,
+        "limit_concurrency": MCP_LIMIT_CONCURRENCY or None,
+        "backlog": MCP_BACKLOG,
+        "timeout_keep_alive": MCP_KEEPALIVE_SECONDS,
+        "timeout_graceful_shutdown": MCP_GRACEFUL_SHUTDOWN_SECONDS,
+    }
+
+
+def http_app():
+    # Factory for uvicorn worker processes (`uvicorn main:http_app --factory`).
+    return mcp.http_app(
+        middleware=_http_middleware(),
+        stateless_http=MCP_STATELESS,
+        json_response=MCP_STATELESS,
+    )
+
+
 def main() -> None:
-    mcp.run(transport="http", host=MCP_HOST, port=MCP_PORT)
+    if MCP_WORKERS > 1 and not MCP_STATELESS:
+        raise SystemExit(
+            "MCP_WORKERS > 1 requires MCP_STATELESS=true: stateful MCP sessions live in process memory. "
+            "Otherwise run one process per port behind a load balancer with session affinity."
+        )
+    if MCP_WORKERS > 1:
+        import uvicorn
+
+        prepare_multiprocess("mcp-metrics-")
+        uvicorn.run(
+            "main:http_app",
+            factory=True,
+            host=MCP_HOST,
+            port=MCP_PORT,
+            workers=MCP_WORKERS,
+            lifespan="on",
+            **_uvicorn_config(),
+        )
+        return
+    mcp.run(
+        transport="http",
+        host=MCP_HOST,
+        port=MCP_PORT,
+        middleware=_http_middleware(),
+        stateless_http=MCP_STATELESS,
+        json_response=MCP_STATELESS,
+        uvicorn_config=_uvicorn_config(),
+    )
 
 
 if __name__ == "__main__":
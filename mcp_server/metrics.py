@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LAG_INTERVAL_SECONDS = 0.5
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "mcp_http_request_duration_seconds",
+    "HTTP request latency by path.",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "mcp_http_requests_in_flight", "HTTP requests currently being served.", multiprocess_mode="livesum"
+)
+TOOL_SECONDS = Histogram(
+    "mcp_tool_duration_seconds",
+    "Tool call latency by tool name.",
+    ["tool", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_IN_FLIGHT = Gauge(
+    "mcp_tool_calls_in_flight", "Tool calls currently running.", ["tool"], multiprocess_mode="livesum"
+)
+UPSTREAM_SECONDS = Histogram(
+    "mcp_upstream_request_duration_seconds",
+    "Latency of requests forwarded to the app server.",
+    ["method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+JWKS_LOOKUPS = Counter("mcp_jwks_lookups", "Verification key lookups by cache result.", ["result"])
+CIRCUIT_STATE = Gauge(
+    "mcp_circuit_state",
+    "Upstream circuit breaker state by host (0 closed, 1 half-open, 2 open).",
+    ["host"],
+    multiprocess_mode="max",
+)
+CIRCUIT_REJECTIONS = Counter(
+    "mcp_circuit_rejections", "Upstream requests failed fast by an open circuit.", ["host"]
+)
+UPSTREAM_TIMEOUT_SECONDS = Gauge(
+    "mcp_upstream_timeout_seconds",
+    "Current adaptive read timeout by upstream host and operation.",
+    ["host", "operation"],
+    multiprocess_mode="max",
+)
+GOOGLE_TOKEN_LOOKUPS = Counter("mcp_google_token_lookups", "Vended Google access token lookups by cache result.", ["result"])
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "mcp_event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer.",
+    buckets=LAG_BUCKETS,
+)
+# Summed over workers, including exited ones; process_cpu_seconds_total is
+# missing in multiprocess mode.
+WORKER_CPU_SECONDS = Gauge(
+    "mcp_worker_cpu_seconds", "CPU time used by the server's worker processes.", multiprocess_mode="sum"
+)
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            UPSTREAM_SECONDS.labels(request.method, status).observe(time.perf_counter() - start)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ToolMetricsMiddleware(Middleware):
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        outcome = "error"
+        start = time.perf_counter()
+        TOOL_IN_FLIGHT.labels(tool).inc()
+        try:
+            result = await call_next(context)
+            outcome = "ok"
+            return result
+        finally:
+            TOOL_IN_FLIGHT.labels(tool).dec()
+            TOOL_SECONDS.labels(tool, outcome).observe(time.perf_counter() - start)
+
+
+class HTTPMetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # MCP routes have no path parameters; anything unrouted shares one label.
+            path = scope["path"] if "endpoint" in scope else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], path, str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+async def monitor_event_loop_lag(interval: float = LAG_INTERVAL_SECONDS) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
+        WORKER_CPU_SECONDS.set(time.process_time())
+
+
+# With several workers each process keeps its own samples; prometheus_client
+# shares them through files in PROMETHEUS_MULTIPROC_DIR, which has to be set
+# before the workers import this module.
+def prepare_multiprocess(prefix: str) -> None:
+    directory = Path(os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix=prefix)))
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.db"):
+        stale.unlink()
+
+
+def latest() -> bytes:
+    WORKER_CPU_SECONDS.set(time.process_time())
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead() -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
@@ -4,6 +4,7 @@ from typing import Any
 
 from fastmcp import Context
 
+import google_calendar
 from auth import require_jwt
 from client import get, post
 
@@ -19,6 +20,18 @@ async def gcal_list_calendars(
     fields: str | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        return await google_calendar.call(
+            app_server_url,
+            credential_id,
+            lambda token: google_calendar.list_calendars(
+                token,
+                max_results=max_results,
+                page_token=page_token,
+                min_access_role=min_access_role,
+                fields=fields,
+            ),
+        )
     return await get(
         app_server_url,
         f"/api/google_calendar/{credential_id}/list_calendars",
@@ -50,6 +63,25 @@ async def gcal_list_events(
     fields: str | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        return await google_calendar.call(
+            app_server_url,
+            credential_id,
+            lambda token: google_calendar.list_events(
+                token,
+                calendar_id,
+                max_results=max_results,
+                page_token=page_token,
+                time_min=time_min,
+                time_max=time_max,
+                order_by=order_by,
+                single_events=single_events,
+                q=q,
+                show_deleted=show_deleted,
+                time_zone=time_zone,
+                fields=fields,
+            ),
+        )
     return await get(
         app_server_url,
         f"/api/google_calendar/{credential_id}/list_events",
@@ -78,6 +110,10 @@ async def gcal_create_event(
     ctx: Context | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        return await google_calendar.call(
+            app_server_url, credential_id, lambda token: google_calendar.create_event(token, payload)
+        )
     return await post(
         app_server_url,
         f"/api/google_calendar/{credential_id}/create_event",
@@ -96,6 +132,12 @@ async def gcal_get_event(
     fields: str | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        return await google_calendar.call(
+            app_server_url,
+            credential_id,
+            lambda token: google_calendar.get_event(token, calendar_id, event_id, fields=fields),
+        )
     return await get(
         app_server_url,
         f"/api/google_calendar/{credential_id}/get_event",
@@ -114,6 +156,14 @@ async def gcal_update_event(
     ctx: Context | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        # Same unwrapping as the app server's update_event route.
+        event_payload = payload.get("payload") or payload.get("event") or {}
+        return await google_calendar.call(
+            app_server_url,
+            credential_id,
+            lambda token: google_calendar.update_event(token, calendar_id, event_id, event_payload),
+        )
     return await post(
         app_server_url,
         f"/api/google_calendar/{credential_id}/update_event",
@@ -131,6 +181,12 @@ async def gcal_delete_event(
     ctx: Context | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        return await google_calendar.call(
+            app_server_url,
+            credential_id,
+            lambda token: google_calendar.delete_event(token, calendar_id, event_id),
+        )
     return await post(
         app_server_url,
         f"/api/google_calendar/{credential_id}/delete_event",
@@ -150,6 +206,12 @@ async def gcal_availability(
     time_zone: str | None = None,
 ) -> dict:
     jwt = require_jwt(jwt, ctx)
+    if google_calendar.ENABLED:
+        return await google_calendar.call(
+            app_server_url,
+            credential_id,
+            lambda token: google_calendar.availability(token, calendar_id, time_min, time_max, time_zone=time_zone),
+        )
     return await post(
         app_server_url,
         f"/api/google_calendar/{credential_id}/availability",
@@ -163,6 +225,20 @@ async def gcal_availability(
     )
 
 
+async def chat_search(
+    app_server_url: str,
+    query: str,
+    jwt: str | None = None,
+    ctx: Context | None = None,
+    room_id: str | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
+) -> dict:
+    jwt = require_jwt(jwt, ctx)
+    params = {"q": query, "room_id": room_id, "limit": limit, "offset": offset}
+    return await get(app_server_url, "/api/chat/search", jwt, params=params)
+
+
 async def gemini_generate(
     app_server_url: str,
     credential_id: str,
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from common import tracing as common_tracing
+from common.tracing import TracingTransport
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind
+
+SERVICE_NAME = "mcp-server"
+
+TRACER = trace.get_tracer(SERVICE_NAME)
+
+
+def configure(exporter: str, file_path: str, sample_ratio: float = 1.0) -> bool:
+    return common_tracing.configure(SERVICE_NAME, exporter, file_path, sample_ratio)
+
+
+# The app server sends its trace context in the tool call's _meta; clients that
+# only set a traceparent header on the HTTP request are picked up as well.
+def request_meta(context: MiddlewareContext) -> dict:
+    try:
+        meta = context.fastmcp_context.request_context.meta
+    except (AttributeError, LookupError, RuntimeError, ValueError):
+        return {}
+    if meta is None:
+        return {}
+    return {key: str(value) for key, value in meta.model_dump(exclude_none=True).items()}
+
+
+class TracingMiddleware(Middleware):
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        carrier = {**get_http_headers(include_all=True), **request_meta(context)}
+        with TRACER.start_as_current_span(
+            f"mcp.tool {context.message.name}",
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"mcp.tool.name": context.message.name},
+        ):
+            return await call_next(context)